@@ -0,0 +1,232 @@
+"""
+Benchmarks of every step between the database and the plots, run with asv
+(see asv.conf.json at the root of the repository) :
+
+    asv run                 # benchmark the latest commit
+    asv continuous master HEAD  # compare two commits
+    asv publish && asv preview
+
+They can also be run once in the current environment with `asv run --python=same`.
+"""
+
+from __future__ import annotations
+
+import os
+
+from pathlib import Path
+
+# must be set before Qt or matplotlib get imported
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("MPLBACKEND", "Agg")
+# generated files are kept between runs
+os.environ.setdefault("EMSAPP_BENCH_DATA", str(Path(__file__).parent / ".data"))
+
+from emsapp.config import ProcessConfig
+from emsapp.data.loading import load_data
+from emsapp.data.process import Process  # registers the builtin stages
+from emsapp.testing import SIZES, SyntheticData
+
+DEFAULT_PROCESS = ProcessConfig.default()
+
+_data: dict[str, SyntheticData] = {}
+
+
+def synthetic(size: str) -> SyntheticData:
+    """shares generated rows between benchmarks of the same process"""
+    if size not in _data:
+        _data[size] = SyntheticData(SIZES[size])
+    return _data[size]
+
+
+class Pipeline:
+    params = list(SIZES)
+    param_names = ["rows"]
+    timeout = 600
+
+    def setup(self, size: str):
+        self.data = synthetic(size)
+        self.settings = self.data.settings()
+        self.process = Process.from_config(self.settings, DEFAULT_PROCESS)
+        self.entries = load_data(self.data.loader(), self.settings)
+        self.filtered = self.process.filter(self.entries)
+        self.split = self.process.split(self.filtered)
+        self.final_data = self.process.transform(self.split)
+
+    def time_load_data(self, size: str):
+        load_data(self.data.loader(), self.settings)
+
+    def time_filter(self, size: str):
+        self.process.filter(self.entries)
+
+    def time_split(self, size: str):
+        self.process.split(self.filtered)
+
+    def time_transform(self, size: str):
+        self.process.transform(self.split)
+
+    def time_group(self, size: str):
+        self.process.group(self.final_data)
+
+    def time_process(self, size: str):
+        self.process(self.entries)
+
+    def peakmem_load_and_process(self, size: str):
+        self.process(load_data(self.data.loader(), self.settings))
+
+
+class Stages:
+    """each stage of the default process on its own, on 100k rows"""
+
+    params = [
+        [f"filter:{n}" for n in DEFAULT_PROCESS.filters]
+        + [f"splitter:{n}" for n in DEFAULT_PROCESS.splitters]
+        + [f"transformer:{n}" for n in DEFAULT_PROCESS.transformers]
+        + [f"grouper:{n}" for n in DEFAULT_PROCESS.groupers]
+    ]
+    param_names = ["stage"]
+    timeout = 300
+
+    def setup(self, stage: str):
+        data = synthetic("100k")
+        self.process = Process.from_config(data.settings(), DEFAULT_PROCESS)
+        kind, name = stage.split(":")
+        stages = {s.name: s for s in getattr(self.process, f"{kind}s")}
+        self.stage = stages[name]
+        entries = load_data(data.loader(), data.settings())
+        if kind == "filter":
+            self.run = lambda: [e for e in entries if self.stage(e)]
+            return
+        filtered = self.process.filter(entries)
+        if kind == "splitter":
+            self.run = lambda: self.stage(filtered)
+            return
+        split = self.process.split(filtered)
+        if kind == "transformer":
+            self.run = lambda: [self.stage(entries) for entries in split]
+            return
+        final_data = self.process.transform(split)
+        self.run = lambda: self.stage(final_data)
+
+    def time_stage(self, stage: str):
+        self.run()
+
+
+class LoadExcel:
+    """reading the same data from an actual excel file"""
+
+    params = ["10k", "100k"]
+    param_names = ["rows"]
+    timeout = 900
+
+    def setup_cache(self):
+        return {size: str(synthetic(size).cached_xlsx()) for size in self.params}
+
+    def setup(self, paths: dict[str, str], size: str):
+        from emsapp.data.loading import DataLoaderFactory
+
+        self.data = synthetic(size)
+        self.path = paths[size]
+        self.settings = self.data.settings()
+        self.factory = DataLoaderFactory
+
+    def time_load_xlsx(self, paths: dict[str, str], size: str):
+        load_data(self.factory.create(self.path), self.settings)
+
+
+class LoadCsv:
+    """reading the same data from a csv file"""
+
+    params = ["100k", "1M"]
+    param_names = ["rows"]
+    timeout = 900
+
+    def setup_cache(self):
+        return {size: str(synthetic(size).cached_csv()) for size in self.params}
+
+    def setup(self, paths: dict[str, str], size: str):
+        from emsapp.data.loading import DataLoaderFactory
+
+        self.data = synthetic(size)
+        self.path = paths[size]
+        self.settings = self.data.settings()
+        self.factory = DataLoaderFactory
+
+    def time_open_csv(self, paths: dict[str, str], size: str):
+        self.factory.create(self.path).headers(self.settings.data)
+
+    def time_load_csv(self, paths: dict[str, str], size: str):
+        load_data(self.factory.create(self.path), self.settings)
+
+
+class LoadParquet:
+    """reading the same data from a parquet file, with and without the predicates
+    of the default process. Skipped if pyarrow isn't installed"""
+
+    params = ["100k", "1M"]
+    param_names = ["rows"]
+    timeout = 900
+
+    def setup_cache(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return {}
+        return {size: str(synthetic(size).cached_parquet()) for size in self.params}
+
+    def setup(self, paths: dict[str, str], size: str):
+        if size not in paths:
+            raise NotImplementedError("pyarrow is not installed")
+        from emsapp.data.loaders.arrow_loader import ArrowDataLoader
+        from emsapp.data.process import Process
+
+        self.settings = synthetic(size).settings()
+        self.loader = ArrowDataLoader(paths[size])
+        self.predicates = Process.from_config(self.settings).predicates()
+
+    def time_load_parquet(self, paths: dict[str, str], size: str):
+        load_data(self.loader, self.settings)
+
+    def time_load_parquet_pushdown(self, paths: dict[str, str], size: str):
+        load_data(self.loader, self.settings, self.predicates)
+
+
+class Rendering:
+    """headless rendering of the data sets of the default process"""
+
+    params = ["new", "cumulative", "periods"]
+    param_names = ["transformer"]
+    timeout = 300
+
+    def setup(self, transformer: str):
+        from emsapp.plotting.plotter import rendering
+
+        data = synthetic("10k")
+        self.settings = data.settings()
+        process = Process.from_config(self.settings, DEFAULT_PROCESS)
+        data_sets = process(load_data(data.loader(), self.settings))
+        self.data_set = next(
+            ds
+            for ds in data_sets
+            if any(d.report.transformer == transformer for d in ds)
+        )
+        self.rendering = rendering
+
+    def time_render(self, transformer: str):
+        with self.rendering(self.data_set, settings=self.settings) as plotter:
+            plotter.as_rgba()
+
+
+class ExportPdf:
+    timeout = 600
+
+    def setup(self):
+        from emsapp.plotting.report import export_pdf
+
+        data = synthetic("10k")
+        self.settings = data.settings()
+        process = Process.from_config(self.settings, DEFAULT_PROCESS)
+        self.data_sets = process(load_data(data.loader(), self.settings))[:10]
+        self.export_pdf = export_pdf
+
+    def time_export_10_plots(self):
+        self.export_pdf(self.data_sets, os.devnull, settings=self.settings)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import collections.abc
+import dataclasses
 import json
 import os
 from collections import defaultdict
@@ -9,10 +10,11 @@ from dataclasses import dataclass
 from datetime import date, timedelta
 from enum import Enum
 from pathlib import Path
-from typing import Any, Callable, Literal, Optional, TypeVar
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Literal, Mapping, Optional, TypeVar
 
-import pkg_resources
 import tomli
+from PyQt5.QtCore import QCoreApplication, QTimer
 from pydantic import BaseModel, PrivateAttr, confloat, root_validator
 
 from emsapp.const import (
@@ -20,15 +22,32 @@ from emsapp.const import (
     PLOT_MAX_WIDTH,
     PLOT_MIN_HEIGHT,
     PLOT_MIN_WIDTH,
+    OUTBREAK_WINDOW,
 )
 from emsapp.i18n import N_, _
-from emsapp.utils import AutoList, auto_repr, get_logger
-from emsapp.validators import column_validator, validate
+from emsapp.plugin import REGISTRY
+from emsapp.utils import (
+    DEFAULT_LOG_LEVEL,
+    AutoList,
+    DebouncedWriter,
+    atomic_write,
+    auto_repr,
+    get_logger,
+    package_path,
+)
+from emsapp.validators import column_validator, district_validator, validate
 from emsapp.widgets.common import get_user_input
 
 logger = get_logger()
 T = TypeVar("T")
 
+EXCEL_EPOCHS = {1900: date(1899, 12, 30), 1904: date(1904, 1, 1)}
+CURRENT_CONFIG_PATH = package_path("package_data/current_config.json")
+CONFIG_SAVE_DELAY = 1.0
+# saves are debounced by _save_timer, in the thread where the config is modified
+_config_writer = DebouncedWriter(CURRENT_CONFIG_PATH, delay=0.0)
+_save_timer: Optional[QTimer] = None
+
 
 class ConfigurationValueError(ValueError):
     pass
@@ -63,8 +82,24 @@ class DataConfig(BaseModel):
         ]
 
 
+class FrozenDataConfig(DataConfig, allow_mutation=False):
+    """DataConfig whose fields cannot be reassigned, as held by RunSettings"""
+
+
 class PluginConfig(BaseModel):
-    data_loader: list[str]
+    data_loader: list[str] = []
+    filter: list[str] = []
+    splitter: list[str] = []
+    transformer: list[str] = []
+    grouper: list[str] = []
+
+
+class LogConfig(BaseModel):
+    level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = DEFAULT_LOG_LEVEL
+
+
+class ProcessesConfig(BaseModel):
+    paths: list[Path] = []
 
 
 class LegendLoc(Enum):
@@ -140,10 +175,16 @@ class SplitterConfig:
 class TransformerConfig:
     name: str
     type: str
+    window: int = OUTBREAK_WINDOW
 
-    def __init__(self, name: str, type: str):
+    def __init__(self, name: str, type: str, window: int = OUTBREAK_WINDOW):
         self.name = name
         self.type = validate("transformer_type", type)
+        self.window = int(window)
+        if self.window <= 0:
+            raise ValueError(
+                _("window of transformer {name!r} must be positive").format(name=name)
+            )
 
 
 @auto_repr
@@ -195,14 +236,11 @@ class ProcessConfig:
 
     @classmethod
     def default(cls) -> ProcessConfig:
-        return cls.from_file(
-            pkg_resources.resource_filename(
-                "emsapp", "package_data/default_process.toml"
-            )
-        )
+        return cls.from_file(package_path("package_data/default_process.toml"))
 
     @classmethod
     def from_file(cls, path: os.PathLike) -> ProcessConfig:
+        REGISTRY.discover()
         with open(path, "rb") as file:
             root = tomli.load(file)
 
@@ -221,6 +259,46 @@ class ProcessConfig:
         return cls(name, flt, spl, trs, grp)
 
 
+@dataclass(frozen=True)
+class RunSettings:
+    """
+    Immutable snapshot of everything loading, processing and plotting data depends on,
+    taken with `Config().snapshot()` at the start of a run. Inner loops read from it
+    instead of going through the Config singleton, and changes made in the UI while
+    data is being processed don't affect the current run. Its DataConfig is a
+    FrozenDataConfig copy, whose fields cannot be reassigned either.
+    """
+
+    data: DataConfig
+    date_formats: tuple[str, ...]
+    excel_epoch: date
+    districts: Mapping[str, str]
+    lims: Optional[tuple[date, date]]
+    figsize: tuple[float, float]
+    legend_loc: LegendLoc
+    show_periods_info: bool
+    show_today: bool
+
+    def district(self, location: str) -> Optional[str]:
+        """district corresponding to the location, None if unknown"""
+        return self.districts.get(location)
+
+    def with_districts(self, locations: Iterable[str]) -> RunSettings:
+        """returns settings knowing the district of every location. The user is
+        asked, once per location, for the ones that were never provided before"""
+        missing = set(locations) - set(self.districts)
+        if not missing:
+            return self
+        districts = dict(self.districts)
+        for location in sorted(missing):
+            district = Config().user_data.get(
+                N_("district"), location, district_validator
+            )
+            if district:
+                districts[location] = district
+        return dataclasses.replace(self, districts=MappingProxyType(districts))
+
+
 class UserData:
     """
     The goal of this class is to store information entered by the user that should never change.
@@ -232,9 +310,7 @@ class UserData:
     def __init__(self):
         self.d = defaultdict(dict)
         try:
-            with open(
-                pkg_resources.resource_filename("emsapp", "package_data/user_data.json")
-            ) as file:
+            with open(package_path("package_data/user_data.json")) as file:
                 self.d.update(json.load(file))
         except Exception:
             logger.error(
@@ -289,18 +365,19 @@ class UserData:
                 return validator(raw_val)
             except ValueError:
                 logger.warning(
-                    f"Could not parse already stored value for {value_descr}:{key} = {raw_val!r}",
+                    "Could not parse already stored value for %s:%s = %r",
+                    value_descr,
+                    key,
+                    raw_val,
                     exc_info=True,
                 )
                 return None
 
     def update(self, value_descr: str, key: str, raw_value: str):
         self.d[value_descr][key] = raw_value
-        with open(
-            pkg_resources.resource_filename("emsapp", "package_data/user_data.json"),
-            "w",
-        ) as file:
-            json.dump(self.d, file, indent=4)
+        atomic_write(
+            package_path("package_data/user_data.json"), json.dumps(self.d, indent=4)
+        )
 
     def ask_user(
         self,
@@ -319,7 +396,7 @@ class UserData:
         error_msg = ""
         while True:
             raw_val = get_user_input(f"{msg}\n{error_msg}")
-            logger.debug(f"UserData input : {raw_val = }")
+            logger.debug("UserData input : raw_val = %r", raw_val)
             if raw_val is None:
                 return raw_val
             try:
@@ -327,7 +404,10 @@ class UserData:
             except ValueError as e:
                 error_msg = str(e)
                 logger.debug(
-                    f"invalid value {raw_val} entered by user for {value_descr}:{key}",
+                    "invalid value %s entered by user for %s:%s",
+                    raw_val,
+                    value_descr,
+                    key,
                     exc_info=True,
                 )
                 continue
@@ -340,7 +420,9 @@ class RootConfig(BaseModel):
     data: DataConfig
     plugins: PluginConfig
     plot: PlotConfig
-    _process: ProcessConfig = PrivateAttr(default_factory=ProcessConfig.default)
+    log: LogConfig = LogConfig()
+    processes: ProcessesConfig = ProcessesConfig()
+    _process_configs: Optional[dict[str, ProcessConfig]] = PrivateAttr(None)
     _user_data: UserData = PrivateAttr(default_factory=UserData)
     _commit_flag: bool = PrivateAttr(True)
 
@@ -364,14 +446,57 @@ class RootConfig(BaseModel):
     def dump(self):
         print(self.json(indent=2))
 
+    def snapshot(self) -> RunSettings:
+        """returns an immutable copy of the current settings, see RunSettings"""
+        districts = {}
+        for location, raw_district in self.user_data.d.get(N_("district"), {}).items():
+            try:
+                districts[location] = district_validator(raw_district)
+            except ValueError:
+                continue
+        plot = self.plot
+        return RunSettings(
+            data=FrozenDataConfig.construct(**self.data.dict()),
+            date_formats=tuple(self.data.date_formats),
+            excel_epoch=EXCEL_EPOCHS[self.data.excel_start_year],
+            districts=MappingProxyType(districts),
+            lims=None if plot.show_everything else (plot.date_start, plot.date_end),
+            figsize=plot.figsize,
+            legend_loc=plot.legend_loc,
+            show_periods_info=plot.show_periods_info,
+            show_today=plot.show_today,
+        )
+
     def save(self):
-        with open(
-            pkg_resources.resource_filename(
-                "emsapp", "package_data/current_config.json"
-            ),
-            "w",
-        ) as file:
-            file.write(self.json(indent=4))
+        """writes the config to disk right away, discarding any pending write"""
+        if _save_timer is not None:
+            _save_timer.stop()
+        _config_writer.write_now(self.json(indent=4))
+
+    def save_later(self):
+        """marks the config as modified. Once it hasn't been modified for
+        CONFIG_SAVE_DELAY seconds, it's serialized by the event loop, in the thread
+        that modifies it, and the text is written to disk by a background thread.
+        Without an event loop, it's serialized right away"""
+        global _save_timer
+        if QCoreApplication.instance() is None:
+            _config_writer.schedule(self.json(indent=4))
+            return
+        if _save_timer is None:
+            _save_timer = QTimer()
+            _save_timer.setSingleShot(True)
+            _save_timer.setInterval(int(CONFIG_SAVE_DELAY * 1000))
+            _save_timer.timeout.connect(
+                lambda: _config_writer.schedule(Config().json(indent=4))
+            )
+        _save_timer.start()
+
+    def flush(self):
+        """writes pending modifications to disk right away"""
+        if _save_timer is not None and _save_timer.isActive():
+            self.save()
+        else:
+            _config_writer.flush()
 
     @property
     def user_data(self) -> UserData:
@@ -379,7 +504,29 @@ class RootConfig(BaseModel):
 
     @property
     def process(self) -> ProcessConfig:
-        return self._process
+        """first of the configured processes"""
+        return next(iter(self.process_configs.values()))
+
+    @property
+    def process_configs(self) -> dict[str, ProcessConfig]:
+        """configurations of the processes to run, by name. They are parsed on first
+        access so that plugins providing process stages can be registered beforehand.
+        The default process is used if no path is configured"""
+        if self._process_configs is None:
+            if self.processes.paths:
+                configs = [ProcessConfig.from_file(p) for p in self.processes.paths]
+            else:
+                configs = [ProcessConfig.default()]
+            self._process_configs = {}
+            for conf in configs:
+                if conf.name in self._process_configs:
+                    raise ConfigurationValueError(
+                        _("There are several processes named {name!r}").format(
+                            name=conf.name
+                        )
+                    )
+                self._process_configs[conf.name] = conf
+        return self._process_configs
 
 
 class Config:
@@ -411,21 +558,13 @@ class Config:
 
 
 def default_config_dict() -> dict[str, Any]:
-    with open(
-        pkg_resources.resource_filename("emsapp", "package_data/default_config.toml"),
-        "rb",
-    ) as file:
+    with open(package_path("package_data/default_config.toml"), "rb") as file:
         return tomli.load(file)
 
 
 def current_config_dict() -> dict[str, Any]:
     try:
-        with open(
-            pkg_resources.resource_filename(
-                "emsapp", "package_data/current_config.json"
-            ),
-            "r",
-        ) as file:
+        with open(CURRENT_CONFIG_PATH, "r") as file:
             return json.load(file)
     except (FileNotFoundError, tomli.TOMLDecodeError):
         logger.warning("could not load current config")
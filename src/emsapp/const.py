@@ -34,11 +34,16 @@ DISTRICTS = [
 ]
 
 MSG_DURATION = 3000
+# rows of the data source shown in the preview of the import dialog
+PREVIEW_ROWS = 200
 PLOT_MIN_HEIGHT = 3.0
 PLOT_MAX_HEIGHT = 40.0
 PLOT_MIN_WIDTH = 3.0
 PLOT_MAX_WIDTH = 40.0
 
+# days without new case after which an outbreak is considered over
+OUTBREAK_WINDOW = 9
+
 ALL_COLUMNS = ENTRY_FIELDS + ["district"]
 
 DATE_OUTPUT_FMT = N_("{dt.day} {dt:%b} {dt.year}")
@@ -1,17 +1,26 @@
 from __future__ import annotations
 
 import datetime
-from dataclasses import dataclass, field, fields
+import sys
+from dataclasses import dataclass, field, replace
 from enum import Enum
 from pydoc import describe
-from typing import Any, Iterator, Optional, Union
+from typing import Any, Iterable, Iterator, Optional, Union
 
 import numpy as np
 
-from emsapp.config import Config
+from emsapp.config import EXCEL_EPOCHS, Config, RunSettings
 from emsapp.i18n import N_, _
 from emsapp.validators import district_validator
 
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+MISSING_VALUE = N_("missing value")
+INVALID_DATE = N_("invalid date")
+REJECTION_REASONS = [MISSING_VALUE, INVALID_DATE]
+MAX_REJECTION_SAMPLES = 10
+DATE_DTYPE = np.dtype("datetime64[D]")
+COUNT_DTYPE = np.dtype(np.int64)
+
 
 class DataType(Enum):
     LINE = "line"
@@ -40,16 +49,53 @@ class DataReport:
 
     splitters: dict[str, str] = field(default_factory=dict)
     transformer: str = None
-    final_label: str = ""
 
     def copy(self) -> DataReport:
         """returns a deep copy of self"""
         spl = self.splitters.copy()
-        return DataReport(spl, self.transformer, self.final_label)
+        return DataReport(spl, self.transformer)
 
 
-@dataclass
+def intern_value(value: Any) -> Any:
+    """interns strings so that equal values are the same object, which makes
+    comparisons between them an identity check. Other values are returned as is"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class SymbolTable:
+    """
+    Shares one string object between all the entries with the same value in a
+    column, instead of keeping one copy per row. Meant to be used during one loading
+    """
+
+    symbols: dict[Any, Any]
+
+    def __init__(self):
+        self.symbols = {}
+
+    def __call__(self, value: Any) -> Any:
+        try:
+            return self.symbols[value]
+        except KeyError:
+            return self.symbols.setdefault(value, intern_value(value))
+
+    def column(self, values: Iterable) -> list:
+        """interns a whole column, looking up each distinct value only once"""
+        values = list(values)
+        mapping = {v: self(v) for v in set(values)}
+        return [mapping[v] for v in values]
+
+
+@dataclass(frozen=True)
 class Entry:
+    __slots__ = (
+        "date_start",
+        "date_end",
+        "role",
+        "institution",
+        "institution_type",
+        "location",
+    )
     date_start: datetime.date
     date_end: datetime.date
     role: str
@@ -58,7 +104,7 @@ class Entry:
     location: str
 
     def __post_init__(self):
-        for f in self.fields():
+        for f in self.__slots__:
             if not getattr(self, f):
                 raise ValueError(
                     _(
@@ -66,12 +112,38 @@ class Entry:
                     ).format(f=f, entry=self)
                 )
 
-        self.date_start = parse_date(self.date_start)
-        self.date_end = parse_date(self.date_end)
+        # entries are mostly created from already parsed dates
+        if type(self.date_start) is not datetime.date:
+            object.__setattr__(self, "date_start", parse_date(self.date_start))
+        if type(self.date_end) is not datetime.date:
+            object.__setattr__(self, "date_end", parse_date(self.date_end))
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, f) for f in self.__slots__)
+
+    def __setstate__(self, state: tuple):
+        # the dataclass is frozen, so the slots are set like __post_init__ does
+        for f, value in zip(self.__slots__, state):
+            object.__setattr__(self, f, value)
 
     @classmethod
     def fields(cls) -> list[str]:
-        return [f.name for f in fields(cls)]
+        return list(cls.__slots__)
+
+    @classmethod
+    def from_valid_rows(cls, rows: Iterable[tuple]) -> list[Entry]:
+        """creates entries from rows of values in the order of `fields`, already
+        checked and with parsed dates, as `load_data` does. The checks of
+        __post_init__ are skipped"""
+        new = object.__new__
+        setters = [getattr(cls, f).__set__ for f in cls.__slots__]
+        entries = []
+        for row in rows:
+            entry = new(cls)
+            for set_field, value in zip(setters, row):
+                set_field(entry, value)
+            entries.append(entry)
+        return entries
 
     @property
     def district(self) -> Optional[str]:
@@ -79,13 +151,67 @@ class Entry:
         return Config().user_data.get(N_("district"), self.location, district_validator)
 
 
+@dataclass
+class RejectionReport:
+    """
+    Why rows of the data source could not be turned into entries. `counts` and
+    `samples` are keyed by (reason, column), where reason is one of REJECTION_REASONS.
+    Every missing value is counted, so counts may add up to more than the number of
+    rejected rows, but dates are only checked in rows without missing values.
+    Samples are indices of rows in the source table, not counting the header.
+    """
+
+    total: int = 0
+    accepted: int = 0
+    counts: dict[tuple[str, str], int] = field(default_factory=dict)
+    samples: dict[tuple[str, str], list[int]] = field(default_factory=dict)
+
+    @property
+    def rejected(self) -> int:
+        return self.total - self.accepted
+
+    def add(self, reason: str, column: str, mask: np.ndarray):
+        """records the rows where mask is True as rejected"""
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return
+        key = (reason, column)
+        self.counts[key] = self.counts.get(key, 0) + len(rows)
+        samples = self.samples.setdefault(key, [])
+        samples.extend(rows[: MAX_REJECTION_SAMPLES - len(samples)].tolist())
+
+    def summary(self) -> str:
+        """translated description of the rejections, one line per reason"""
+        if not self.rejected:
+            return _("All {total} rows are valid").format(total=self.total)
+        lines = [
+            _("{rejected} of {total} rows were rejected :").format(
+                rejected=self.rejected, total=self.total
+            )
+        ]
+        for (reason, column), count in sorted(
+            self.counts.items(), key=lambda el: -el[1]
+        ):
+            rows = ", ".join(str(i + 1) for i in self.samples[(reason, column)])
+            if count > len(self.samples[(reason, column)]):
+                rows += ", ..."
+            lines.append(
+                _("- {count} x {reason} in column {column} (rows {rows})").format(
+                    count=count, reason=_(reason), column=_(column), rows=rows
+                )
+            )
+        return "\n".join(lines)
+
+
 class Entries:
     l: list[Entry]
     report: DataReport
+    rejections: Optional[RejectionReport]
 
-    def __init__(self, l: list[Entry], report=None):
+    def __init__(self, l: list[Entry], report=None, rejections: RejectionReport = None):
         self.l = l
         self.report = report or DataReport()
+        self.rejections = rejections
 
     def __iter__(self) -> Iterator[Entry]:
         yield from self.l
@@ -94,31 +220,92 @@ class Entries:
         return self.l[index]
 
 
+def as_dates(x: Any) -> np.ndarray:
+    """converts x to an array of DATE_DTYPE, such as the arrays of datetime.date
+    objects transformers used to produce"""
+    x = np.asarray(x)
+    return x if x.dtype == DATE_DTYPE else x.astype(DATE_DTYPE)
+
+
+def as_counts(y: Any) -> np.ndarray:
+    """converts integer values, possibly in an object array, to COUNT_DTYPE. Other
+    values, such as floats, are kept as they are"""
+    y = np.asarray(y)
+    if y.dtype.kind == "O":
+        # the values decide of the type, as they would in a list
+        y = np.array(y.tolist()) if y.size else y.astype(COUNT_DTYPE)
+    if y.dtype.kind in "biu" and y.dtype != COUNT_DTYPE:
+        y = y.astype(COUNT_DTYPE)
+    return y
+
+
+def frozen_array(arr: Any) -> np.ndarray:
+    """returns a read-only view of arr, or arr itself if it's already read-only"""
+    arr = np.asarray(arr)
+    if arr.flags.writeable:
+        arr = arr.view()
+        arr.flags.writeable = False
+    return arr
+
+
 @dataclass
 class FinalData:
+    """
+    Output of a transformer. x holds dates as DATE_DTYPE and y integer values as
+    COUNT_DTYPE ; other types given by older transformers are converted. The arrays
+    are read-only, so that the same data can be shared by all the DataSets it
+    belongs to. `label` distinguishes a FinalData from the others of its DataSet
+    and is given by the grouper through `labelled`.
+    """
+
     x: np.ndarray
     y: np.ndarray
     data_type: DataType
     description: str
     report: DataReport
+    label: str = ""
+
+    def __post_init__(self):
+        self.x = frozen_array(as_dates(self.x))
+        self.y = frozen_array(as_counts(self.y))
+
+    def labelled(self, label: str) -> FinalData:
+        """returns the same data under another label. Arrays and report are shared,
+        not copied"""
+        return replace(self, label=label)
 
 
 @dataclass
 class DataSet:
     title: str
     data: list[FinalData]
+    grouper: Optional[str] = None
 
     def __iter__(self) -> Iterator[FinalData]:
         yield from self.data
 
 
-def parse_date(s: Union[int, str, datetime.date, datetime.datetime]) -> datetime.date:
+def to_datetime64(dates: Iterable[datetime.date], count: int = -1) -> np.ndarray:
+    """converts dates to a datetime64[D] array. Much faster than np.array(dates),
+    which goes through a slow generic conversion for each element"""
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=count)
+    return (ordinals - EPOCH_ORDINAL).astype(DATE_DTYPE)
+
+
+def parse_date(
+    s: Union[int, str, datetime.date, datetime.datetime],
+    settings: Optional[RunSettings] = None,
+) -> datetime.date:
     """Returns a datetime object, parsed from a variety of different sources
 
     Parameters
     ----------
     s : Union[int, str, datetime.date, datetime.datetime]
         input
+    settings : RunSettings, optional
+        settings of the current run, giving the date formats and the excel epoch.
+        The current config is used if not provided, which is much slower when
+        parsing many dates.
 
     Returns
     -------
@@ -135,9 +322,12 @@ def parse_date(s: Union[int, str, datetime.date, datetime.datetime]) -> datetime
         return s
     elif isinstance(s, int):
         if s > 40177 and s < 47482:
-            return datetime.date(
-                Config().data.excel_start_date, 1, 1
-            ) + datetime.timedelta(s - 1)
+            if settings is None:
+                epoch = EXCEL_EPOCHS[Config().data.excel_start_year]
+            else:
+                epoch = settings.excel_epoch
+            return epoch + datetime.timedelta(s)
+        raise ValueError(_("{0!r} cannot be interpreted as a date").format(s))
 
     s = s.strip()
 
@@ -146,9 +336,13 @@ def parse_date(s: Union[int, str, datetime.date, datetime.datetime]) -> datetime
     except ValueError:
         pass
 
-    for fmt in Config().data.date_formats:
+    if settings is None:
+        date_formats = Config().data.date_formats
+    else:
+        date_formats = settings.date_formats
+    for fmt in date_formats:
         try:
-            return datetime.date.strptime(s, fmt)
+            return datetime.datetime.strptime(s, fmt).date()
         except ValueError:
             pass
     raise ValueError(_("{0!r} cannot be interpreted as a date").format(s))
@@ -1,25 +1,91 @@
 from __future__ import annotations
 
+import datetime
 from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterable, NamedTuple, Optional
 
-from emsapp.config import FilterConfig
-from emsapp.data import Entry, parse_date
+from emsapp.config import FilterConfig, RunSettings
+from emsapp.data import Entry, intern_value, parse_date
 from emsapp.i18n import _
-from emsapp.validators import register_valid
+from emsapp.plugin import REGISTRY
+
+IN = "in"
+NOT_IN = "not in"
+BEFORE = "<="
+AFTER = ">="
+
+
+class Predicate(NamedTuple):
+    """
+    Condition on the raw values of a column, equivalent to a filter, that data
+    loaders can check before rows are loaded (see `load_data`). `column` is the
+    name of an Entry field, replaced by the name of the column in the data source
+    before being given to a loader.
+    """
+
+    column: str
+    op: str
+    values: tuple
+
+    def may_match(self, value: Any) -> bool:
+        """whether a row with this raw value may be kept by the filter. Dates that
+        are not yet parsed are always kept, the filter deciding after parsing"""
+        if self.op == IN:
+            return value in self.values
+        if self.op == NOT_IN:
+            return value not in self.values
+        if isinstance(value, datetime.datetime):
+            value = value.date()
+        elif not isinstance(value, datetime.date):
+            return True
+        if self.op == BEFORE:
+            return value <= self.values[0]
+        return value >= self.values[0]
+
+    def sql(self, quote: Callable[[str], str]) -> tuple[str, list]:
+        """returns a SQL condition with ? placeholders and its parameters
+
+        Parameters
+        ----------
+        quote : Callable[[str], str]
+            quotes a column name for the SQL dialect of the data source
+        """
+        column = quote(self.column)
+        if self.op in (IN, NOT_IN):
+            placeholders = ", ".join("?" * len(self.values))
+            return f"{column} {self.op} ({placeholders})", list(self.values)
+        if self.op == BEFORE:
+            # dates may be stored with a time, which must not exclude the last day
+            return f"{column} < ?", [self.values[0] + datetime.timedelta(1)]
+        return f"{column} >= ?", [self.values[0]]
+
+
+def where_clause(
+    predicates: Iterable[Predicate], quote: Callable[[str], str]
+) -> tuple[str, list]:
+    """returns a WHERE clause (or "" if there is no predicate) and its parameters"""
+    conditions = []
+    params = []
+    for predicate in predicates:
+        condition, predicate_params = predicate.sql(quote)
+        conditions.append(condition)
+        params.extend(predicate_params)
+    if not conditions:
+        return "", []
+    return " where " + " and ".join(conditions), params
 
 
 class Filter(ABC):
     name: str
-    _registered: dict[str, type[Filter]] = {}
+    settings: RunSettings = None
 
     @classmethod
     def register(cls, name, new_cls):
-        Filter._registered[name] = new_cls
-        register_valid("filter_type", name)
+        REGISTRY.register("filter", name, new_cls)
 
     @classmethod
     def create(cls, conf: FilterConfig) -> Filter:
-        cls = Filter._registered.get(conf.type)
+        cls = REGISTRY.get("filter", conf.type)
         if cls:
             return cls(conf)
 
@@ -34,6 +100,11 @@ class Filter(ABC):
     def __call__(self, entry: Entry) -> bool:
         ...
 
+    def predicate(self) -> Optional[Predicate]:
+        """the condition this filter puts on the raw data, if it can be checked
+        before entries are created"""
+        return None
+
 
 class NullFilter(Filter):
     def __call__(self, entry: Entry) -> bool:
@@ -44,18 +115,26 @@ class ValueFilter(Filter):
     def __init__(self, conf: FilterConfig):
         super().__init__(conf)
         self.col = conf.column
-        self.val = set(conf.values)
+        self.val = set(map(intern_value, conf.values))
 
 
 class IncludeFilter(ValueFilter):
     def __call__(self, entry: Entry) -> bool:
         return getattr(entry, self.col) in self.val
 
+    def predicate(self) -> Optional[Predicate]:
+        if self.col in Entry.fields():
+            return Predicate(self.col, IN, tuple(sorted(self.val)))
+
 
 class ExcludeFilter(ValueFilter):
     def __call__(self, entry: Entry) -> bool:
         return getattr(entry, self.col) not in self.val
 
+    def predicate(self) -> Optional[Predicate]:
+        if self.col in Entry.fields():
+            return Predicate(self.col, NOT_IN, tuple(sorted(self.val)))
+
 
 class DateFilter(Filter):
     def __init__(self, conf: FilterConfig):
@@ -68,11 +147,19 @@ class DateBeforeFilter(DateFilter):
     def __call__(self, entry: Entry) -> bool:
         return getattr(entry, self.col) <= self.val
 
+    def predicate(self) -> Optional[Predicate]:
+        if self.col in Entry.fields():
+            return Predicate(self.col, BEFORE, (self.val,))
+
 
 class DateAfterFilter(DateFilter):
     def __call__(self, entry: Entry) -> bool:
         return getattr(entry, self.col) >= self.val
 
+    def predicate(self) -> Optional[Predicate]:
+        if self.col in Entry.fields():
+            return Predicate(self.col, AFTER, (self.val,))
+
 
 Filter.register("include", IncludeFilter)
 Filter.register("exclude", ExcludeFilter)
@@ -2,25 +2,25 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from typing import Iterable
 
-from emsapp.config import GrouperConfig
-from emsapp.data import DataReport, DataSet, FinalData
+from emsapp.config import GrouperConfig, RunSettings
+from emsapp.data import DataSet, FinalData
 from emsapp.i18n import _
-from emsapp.validators import register_valid
+from emsapp.plugin import REGISTRY
 
 
 class Grouper(ABC):
     name: str
-    _registered: dict[str, type[Grouper]] = {}
+    settings: RunSettings = None
 
     @classmethod
     def register(cls, name, new_cls):
-        Grouper._registered[name] = new_cls
-        register_valid("grouper_type", name)
+        REGISTRY.register("grouper", name, new_cls)
 
     @classmethod
     def create(cls, conf: GrouperConfig) -> Grouper:
-        cls = Grouper._registered.get(conf.type)
+        cls = REGISTRY.get("grouper", conf.type)
         if cls:
             return cls(conf)
 
@@ -35,54 +35,128 @@ class Grouper(ABC):
     def __call__(self, data: list[FinalData]) -> list[DataSet]:
         ...
 
+    def group(self, index: GroupingIndex) -> list[DataSet]:
+        """groups the data of a shared index. Subclasses may use the index to avoid
+        going through all the data, by default this is the same as calling self"""
+        return self(index.data)
 
-class StepNameGrouper(Grouper):
+
+SplitterValues = tuple[tuple[str, str], ...]
+
+
+class GroupingIndex:
     """
-    Groups data according to the result of previous splitting and transforming
-    steps.
+    Index of all the FinalData of one run, built once and shared by every grouper
+    so that each of them doesn't have to go through and describe all the data again.
+    Data are indexed by the transformer that produced them and the values of the
+    splitters, given as the (name, value) pairs of `DataReport.splitters`. Items
+    are referred to by their position in `data`.
     """
 
-    def __init__(self, conf: GrouperConfig):
-        super().__init__(conf)
-        self.splitters = sorted(conf.splitters)
-        self.transformers = sorted(conf.transformers or [])
-
-    def __call__(self, data: list[FinalData]) -> list[DataSet]:
-        out: dict[str, list[FinalData]] = defaultdict(list)
-        for d in data:
-            if self.transformers and d.report.transformer not in self.transformers:
-                continue
-            key, label = self.key_and_label(d.report)
-            rep = d.report.copy()
-            rep.final_label = label
-            out[key].append(FinalData(d.x, d.y, d.data_type, d.description, rep))
+    data: list[FinalData]
+    positions: dict[tuple[str, SplitterValues], list[int]]
+    by_transformer: dict[str, list[SplitterValues]]
+
+    def __init__(self, data: list[FinalData]):
+        self.data = data
+        self.positions = {}
+        self.by_transformer = defaultdict(list)
+        for i, d in enumerate(data):
+            key = (d.report.transformer, tuple(d.report.splitters.items()))
+            positions = self.positions.get(key)
+            if positions is None:
+                positions = self.positions[key] = []
+                self.by_transformer[key[0]].append(key[1])
+            positions.append(i)
+
+    def lookup(self, transformer: str, splitters: SplitterValues) -> list[int]:
+        """positions of the data produced by a transformer for the given splitter
+        values, in the order of `DataReport.splitters`"""
+        return self.positions.get((transformer, tuple(splitters)), [])
+
+    def groups(
+        self, transformers: Iterable[str], splitters: tuple[str, ...]
+    ) -> dict[tuple[str, ...], list[tuple[int, str]]]:
+        """groups the data produced by the given transformers, or by any transformer
+        if none is given, by the values of the given splitters
 
-        return [DataSet(k, v) for k, v in out.items()]
+        Parameters
+        ----------
+        transformers : Iterable[str]
+            names of the transformers whose data is grouped
+        splitters : tuple[str, ...]
+            sorted names of the splitters identifying a group, all of them if empty
 
-    def key_and_label(self, report: DataReport) -> tuple[str, str]:
-        """returns a key identifying a group and a label that allows for distinction
-        within the group
+        Returns
+        -------
+        dict[tuple[str, ...], list[tuple[int, str]]]
+            position and label of the data of each group, see `key_and_label`.
+            Groups and the data within them are in the order of `data`
+        """
+        members = []
+        for transformer in transformers or list(self.by_transformer):
+            for values in self.by_transformer.get(transformer, ()):
+                key, label = self.key_and_label(values, splitters)
+                members.extend(
+                    (i, key, label) for i in self.positions[transformer, values]
+                )
+        members.sort(key=lambda member: member[0])
+        out: dict[tuple[str, ...], list[tuple[int, str]]] = defaultdict(list)
+        for i, key, label in members:
+            out[key].append((i, label))
+        return out
+
+    @staticmethod
+    def key_and_label(
+        values: SplitterValues, splitters: tuple[str, ...]
+    ) -> tuple[tuple[str, ...], str]:
+        """returns the values of the given splitters, identifying a group, and a
+        label made of the other splitter values that allows for distinction within
+        the group. All the splitters are used to identify the group if none is given
 
         Parameters
         ----------
-        report : DataReport
-            data report obj
+        values : SplitterValues
+            (name, value) pairs of the splitters of some data
+        splitters : tuple[str, ...]
+            sorted names of the splitters identifying a group
 
         Returns
         -------
-        str
-            key uniquely identifying a desired group
+        tuple[str, ...]
+            values uniquely identifying a group
         str
             label attempting to identify individual FinalData obj within one group
         """
+        by_name = dict(values)
+        group_splitters = splitters or sorted(by_name)
+        key = tuple(by_name[k] for k in group_splitters)
+        label = ", ".join(v for k, v in values if k not in group_splitters)
+        return key, label
+
 
-        splitters = self.splitters or sorted(report.splitters)
-        key = (self.name, *(report.splitters[k] for k in splitters))
-        key = ", ".join(key)
+class StepNameGrouper(Grouper):
+    """
+    Groups data according to the result of previous splitting and transforming
+    steps.
+    """
 
-        label = ", ".join(v for k, v in report.splitters.items() if k not in splitters)
+    def __init__(self, conf: GrouperConfig):
+        super().__init__(conf)
+        self.splitters = tuple(sorted(conf.splitters))
+        self.transformers = sorted(conf.transformers or [])
 
-        return key, label
+    def __call__(self, data: list[FinalData]) -> list[DataSet]:
+        return self.group(GroupingIndex(data))
+
+    def group(self, index: GroupingIndex) -> list[DataSet]:
+        return [
+            DataSet(
+                ", ".join((self.name, *k)),
+                [index.data[i].labelled(label) for i, label in members],
+            )
+            for k, members in index.groups(self.transformers, self.splitters).items()
+        ]
 
 
 Grouper.register("step_name", StepNameGrouper)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+from emsapp.i18n import _
+from emsapp.utils import atomic_write, get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class StageStats:
+    """
+    Figures about one stage of a run. `name` is the name given to the stage in the
+    process config, or "" for figures about all the stages of that kind together.
+    Times and item counts are cumulated over all the calls of the stage, while
+    `peak_memory` is the highest memory usage above what was already allocated when
+    a call started, in bytes.
+    """
+
+    kind: str
+    name: str = ""
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    items_in: int = 0
+    items_out: int = 0
+    peak_memory: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.kind}:{self.name}" if self.name else self.kind
+
+
+@dataclass
+class RunReport:
+    """
+    Where the time and memory went during one run of the pipeline, stage by stage.
+
+    Example
+    -------
+    ```
+    report = RunReport()
+    with report.measure("loading", items_in=1) as stats:
+        entries = load_data()
+        stats.items_out = len(entries.l)
+    data_sets = process(entries, report)
+    print(report.summary())
+    ```
+    """
+
+    trace_memory: bool = False
+    started: str = field(
+        default_factory=lambda: datetime.datetime.now().isoformat(timespec="seconds")
+    )
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    # highest traced memory seen so far by each open measure, innermost last
+    _open_peaks: list[int] = field(default_factory=list, repr=False, compare=False)
+
+    def stage(self, kind: str, name: str = "") -> StageStats:
+        """returns the figures of a stage, created empty if needed"""
+        stats = StageStats(kind, name)
+        return self.stages.setdefault(stats.label, stats)
+
+    @contextmanager
+    def measure(
+        self, kind: str, name: str = "", items_in: int = 0
+    ) -> Iterator[StageStats]:
+        """measures the code run inside the context. The yielded StageStats can be
+        used to record the number of items produced"""
+        stats = self.stage(kind, name)
+        stats.calls += 1
+        stats.items_in += items_in
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            start_memory, peak = tracemalloc.get_traced_memory()
+            if self._open_peaks:
+                # the peak is about to be reset, the enclosing measure keeps it
+                self._open_peaks[-1] = max(self._open_peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._open_peaks.append(start_memory)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.wall += time.perf_counter() - wall
+            stats.cpu += time.process_time() - cpu
+            if tracing:
+                peak = max(self._open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._open_peaks:
+                    self._open_peaks[-1] = max(self._open_peaks[-1], peak)
+                stats.peak_memory = max(stats.peak_memory or 0, peak - start_memory)
+
+    @contextmanager
+    def tracing(self) -> Iterator[RunReport]:
+        """starts tracemalloc for the duration of the context if memory is to be
+        traced and it isn't already running"""
+        must_stop = self.trace_memory and not tracemalloc.is_tracing()
+        if must_stop:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if must_stop:
+                tracemalloc.stop()
+
+    @property
+    def total_wall(self) -> float:
+        return sum(s.wall for s in self.stages.values() if not s.name)
+
+    @property
+    def total_cpu(self) -> float:
+        return sum(s.cpu for s in self.stages.values() if not s.name)
+
+    def to_dict(self) -> dict:
+        return dict(
+            started=self.started,
+            trace_memory=self.trace_memory,
+            total_wall=self.total_wall,
+            total_cpu=self.total_cpu,
+            stages=[asdict(s) for s in self.stages.values()],
+        )
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def dump(self, path: os.PathLike):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, self.to_json())
+
+    def summary(self) -> str:
+        """human readable table of the figures. Named stages are indented below
+        the total of their kind"""
+        lines = [
+            _("Run of {started}, {wall:.3f}s ({cpu:.3f}s CPU)").format(
+                started=self.started, wall=self.total_wall, cpu=self.total_cpu
+            ),
+            "",
+            f"{_('stage'):<40} {_('calls'):>7} {_('wall (s)'):>9} {_('CPU (s)'):>9}"
+            f" {_('in'):>9} {_('out'):>9}"
+            + (f" {_('peak (kB)'):>10}" if self.trace_memory else ""),
+        ]
+        for stats in self.stages.values():
+            label = f"  {stats.name}" if stats.name else stats.kind
+            line = (
+                f"{label[:40]:<40} {stats.calls:>7} {stats.wall:>9.3f} {stats.cpu:>9.3f}"
+                f" {stats.items_in:>9} {stats.items_out:>9}"
+            )
+            if self.trace_memory:
+                peak = stats.peak_memory
+                line += f" {peak // 1024:>10}" if peak is not None else f" {'-':>10}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def log(self):
+        logger.info(
+            "run took %.3fs (%.3fs CPU)\n%s",
+            self.total_wall,
+            self.total_cpu,
+            self.summary(),
+        )
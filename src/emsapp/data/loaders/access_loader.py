@@ -1,9 +1,24 @@
+from __future__ import annotations
+
+import datetime
 from pathlib import Path
+from typing import Sequence
 
 import pyodbc
 
+from emsapp.data.filters import IN, NOT_IN, Predicate, where_clause
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def quote(column: str) -> str:
+    return "[" + column.replace("]", "]]") + "]"
+
 
 class AccessDataLoader:
+    supports_pushdown = True
+
     class Cursor:
         def __init__(_self, path):
             _self.conn = pyodbc.connect(
@@ -22,6 +37,7 @@ class AccessDataLoader:
         self.rows = []
         self.path = path
         self.all_tables: dict[str, list[str]] = {}
+        self.column_types: dict[str, dict[str, type]] = {}
         with self.Cursor(self.path) as cursor:
             tables = [row.table_name for row in cursor.tables()]
             for table in tables:
@@ -31,17 +47,60 @@ class AccessDataLoader:
                 except (pyodbc.ProgrammingError, pyodbc.Error):
                     continue
                 self.all_tables[table] = headers
+                self.column_types[table] = {
+                    column[0]: column[1] for column in cursor.description
+                }
 
-    def load_data(self, config) -> tuple[list[str], list[list]]:
+    @staticmethod
+    def usable_predicates(
+        types: dict[str, type], predicates: Sequence[Predicate]
+    ) -> list[Predicate]:
+        """predicates that Access can check without dropping rows the filters would
+        keep. Access compares text regardless of case, so IN may keep too many rows,
+        which the filters then remove, but NOT IN would drop rows whose value only
+        differs by case. Dates stored as text can't be compared by the database"""
+        return [
+            p
+            for p in predicates
+            if p.column in types
+            and (
+                p.op == IN
+                or (
+                    p.op != NOT_IN
+                    and issubclass(types[p.column], (datetime.date, datetime.datetime))
+                )
+            )
+        ]
+
+    def load_data(
+        self, config, predicates: Sequence[Predicate] = ()
+    ) -> tuple[list[str], list[list]]:
         table_name = config.table_name
         if table_name in self.all_tables:
+            predicates = self.usable_predicates(
+                self.column_types[table_name], predicates
+            )
+            where, params = where_clause(predicates, quote)
+            logger.debug("loading %s%s %r", table_name, where, params)
             with self.Cursor(self.path) as cursor:
-                cursor.execute(f"select * from {table_name}")
+                cursor.execute(f"select * from {table_name}{where}", *params)
                 self.rows = cursor.fetchall()
                 headers = [column[0] for column in cursor.description]
                 return headers, list(self.rows)
         return [], []
 
+    def sample(self, config, n: int) -> tuple[list[str], list[list]]:
+        table_name = config.table_name
+        if table_name not in self.all_tables:
+            return [], []
+        # Cursor swallows query errors, which leave an empty sample
+        headers, rows = [], []
+        with self.Cursor(self.path) as cursor:
+            cursor.execute(f"select top {int(n)} * from {table_name}")
+            headers = [column[0] for column in cursor.description]
+            rows = list(cursor.fetchall())
+        return headers, rows
+
     def headers(self, config) -> list[str]:
         table_name = config.table_name
         return self.all_tables.get(table_name, [])
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import datetime
+import os
+from pathlib import Path
+from typing import Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from emsapp.config import DataConfig
+from emsapp.data.filters import BEFORE, IN, NOT_IN, Predicate
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def expression(
+    predicates: Sequence[Predicate], schema: pa.Schema
+) -> Optional[pc.Expression]:
+    """translates the predicates into an arrow expression. Date comparisons are
+    only kept for columns that actually hold dates"""
+    out = None
+    for p in predicates:
+        if p.column not in schema.names:
+            continue
+        column_type = schema.field(p.column).type
+        field = pc.field(p.column)
+        if p.op in (IN, NOT_IN):
+            if not pa.types.is_string(column_type):
+                continue
+            condition = field.isin(list(p.values))
+            if p.op == NOT_IN:
+                condition = ~condition
+        elif pa.types.is_date(column_type):
+            value = pa.scalar(p.values[0], column_type)
+            condition = field <= value if p.op == BEFORE else field >= value
+        elif pa.types.is_timestamp(column_type):
+            # values may have a time, which must not exclude the last day
+            day = p.values[0] + datetime.timedelta(1 if p.op == BEFORE else 0)
+            value = pa.scalar(
+                datetime.datetime.combine(day, datetime.time()), column_type
+            )
+            condition = field < value if p.op == BEFORE else field >= value
+        else:
+            continue
+        out = condition if out is None else out & condition
+    return out
+
+
+class ArrowDataLoader:
+    """
+    Loads a .parquet or .feather file, seen as a single table named after the file.
+    Only the configured columns are read, and the data is returned column by column
+    (see `load_columns`) instead of being turned into rows.
+
+    With parquet files, filters pushed down to the loader skip whole row groups
+    when the statistics of the row group show that none of its rows can match.
+    Files written with `write_table` are sorted by date so that date filters
+    benefit from it.
+    """
+
+    path: Path
+    schema: pa.Schema
+    supports_pushdown = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.is_parquet = self.path.suffix.lower() == ".parquet"
+        if self.is_parquet:
+            # only reads the footer of the file
+            self.schema = pq.read_schema(self.path)
+        else:
+            with pa.memory_map(str(self.path)) as source:
+                self.schema = pa.ipc.open_file(source).schema
+
+    def tables(self, config: DataConfig) -> list[str]:
+        return [self.path.stem]
+
+    def headers(self, config: DataConfig) -> list[str]:
+        return self.schema.names
+
+    def read(
+        self, config: DataConfig, predicates: Sequence[Predicate] = ()
+    ) -> pa.Table:
+        """reads the configured columns of the rows that may satisfy the
+        predicates as an arrow table"""
+        columns = [c for c in config.columns if c in self.schema.names]
+        condition = expression(predicates, self.schema)
+        if self.is_parquet:
+            return pq.read_table(
+                self.path, columns=columns, filters=condition, memory_map=True
+            )
+        table = feather.read_table(self.path, columns=columns, memory_map=True)
+        return table if condition is None else table.filter(condition)
+
+    def load_columns(
+        self, config: DataConfig, predicates: Sequence[Predicate] = ()
+    ) -> tuple[list[str], list[list]]:
+        """imports the data column by column
+
+        Returns
+        -------
+        list[str]
+            headers (column names)
+        list[list]
+            one list of values per header, all of the same length
+        """
+        table = self.read(config, predicates)
+        return table.column_names, [column.to_pylist() for column in table.columns]
+
+    def load_data(
+        self, config: DataConfig, predicates: Sequence[Predicate] = ()
+    ) -> tuple[list[str], list[list]]:
+        headers, columns = self.load_columns(config, predicates)
+        return headers, [list(row) for row in zip(*columns)]
+
+    def sample(self, config: DataConfig, n: int) -> tuple[list[str], list[list]]:
+        columns = [c for c in config.columns if c in self.schema.names]
+        if self.is_parquet:
+            # only reads the first row groups
+            batches = pq.ParquetFile(self.path).iter_batches(
+                batch_size=n, columns=columns
+            )
+            batch = next(batches, None)
+            if batch is None:
+                return columns, []
+            table = pa.Table.from_batches([batch])
+        else:
+            table = feather.read_table(self.path, columns=columns, memory_map=True)
+            table = table.slice(0, n)
+        headers = table.column_names
+        columns = [column.to_pylist() for column in table.columns]
+        return headers, [list(row) for row in zip(*columns)]
+
+
+def write_table(
+    path: os.PathLike,
+    headers: list[str],
+    rows: list[list],
+    sort_by: str = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> Path:
+    """writes rows to a .parquet or .feather file, for instance to convert another
+    data source once. Sorting by a date column makes the statistics of parquet row
+    groups selective, so that date filters can skip most of them"""
+    path = Path(path)
+    columns = list(zip(*rows)) if rows else [[] for _ in headers]
+    table = pa.table(dict(zip(headers, map(list, columns))))
+    if sort_by:
+        table = table.sort_by(sort_by)
+    if path.suffix.lower() == ".parquet":
+        pq.write_table(table, path, row_group_size=row_group_size)
+    else:
+        feather.write_feather(table, path)
+    logger.info("wrote %d rows to %s", len(table), path)
+    return path
+
+
+def register():
+    return (".parquet", ".feather"), ArrowDataLoader
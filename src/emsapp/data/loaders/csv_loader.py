@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import csv
+import datetime
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+from emsapp.config import DataConfig
+from emsapp.data.filters import Predicate
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+ENCODINGS = ("utf-8-sig", "cp1252")
+SNIFF_BYTES = 64 * 1024
+SNIFF_LINES = 20
+CHUNK_ROWS = 50_000
+DATE_SAMPLE_SIZE = 200
+DELIMITERS = ",;\t|"
+
+
+def sniff_encoding(path: Path) -> str:
+    """first of ENCODINGS in which the beginning of the file can be decoded.
+    cp1252 decodes almost anything, so it comes last"""
+    with open(path, "rb") as file:
+        sample = file.read(SNIFF_BYTES)
+    if len(sample) == SNIFF_BYTES:
+        # don't fail on a multibyte character cut at the end of the sample
+        sample = sample[:-4]
+    for encoding in ENCODINGS:
+        try:
+            sample.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    return ENCODINGS[-1]
+
+
+def date_parser(
+    sample: Sequence[str], date_formats: Sequence[str]
+) -> Optional[Callable[[str], datetime.date]]:
+    """returns a function parsing dates in the first format that fits all the
+    non empty values of the sample, or None if no format fits"""
+    sample = [s.strip() for s in sample if s and s.strip()]
+    if not sample:
+        return None
+    candidates: list[Callable[[str], datetime.date]] = [datetime.date.fromisoformat]
+    candidates += [
+        lambda s, fmt=fmt: datetime.datetime.strptime(s, fmt).date()
+        for fmt in date_formats
+    ]
+    for parse in candidates:
+        try:
+            for s in sample:
+                parse(s)
+        except ValueError:
+            continue
+        return parse
+    return None
+
+
+class CsvDataLoader:
+    """
+    Loads a .csv or .tsv file, seen as a single table named after the file.
+    The encoding and delimiter are guessed when the loader is created, which only
+    reads the beginning of the file. Rows are then streamed in chunks, keeping
+    only the configured columns, and date columns are parsed in the format
+    that fits a sample of their values.
+    """
+
+    path: Path
+    encoding: str
+    dialect: type[csv.Dialect]
+    header: list[str]
+    supports_pushdown = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.encoding = sniff_encoding(self.path)
+        with self.open() as file:
+            lines = list(islice(file, SNIFF_LINES))
+        if self.path.suffix.lower() == ".tsv":
+            self.dialect = csv.excel_tab
+        else:
+            try:
+                self.dialect = csv.Sniffer().sniff("".join(lines), DELIMITERS)
+            except csv.Error:
+                self.dialect = csv.excel
+        self.header = next(csv.reader(lines[:1], self.dialect), [])
+        logger.debug(
+            "%s : encoding %s, delimiter %r, %d columns",
+            self.path,
+            self.encoding,
+            self.dialect.delimiter,
+            len(self.header),
+        )
+
+    def open(self):
+        return open(self.path, "r", encoding=self.encoding, newline="")
+
+    def tables(self, config: DataConfig) -> list[str]:
+        return [self.path.stem]
+
+    def headers(self, config: DataConfig) -> list[str]:
+        return self.header
+
+    def load_data(
+        self,
+        config: DataConfig,
+        predicates: Sequence[Predicate] = (),
+        max_rows: Optional[int] = None,
+    ) -> tuple[list[str], list[list]]:
+        columns = [c for c in config.columns if c in self.header]
+        if not columns:
+            return [], []
+        project = itemgetter(*(self.header.index(c) for c in columns))
+        date_columns = [
+            i
+            for i, c in enumerate(columns)
+            if c in (config.col_date_start, config.col_date_end)
+        ]
+        checks = [
+            (columns.index(p.column), p) for p in predicates if p.column in columns
+        ]
+
+        rows = []
+        parsers = None
+        # dates repeat a lot, each distinct value is only parsed once
+        caches = {i: {} for i in date_columns}
+        for chunk in self.chunks(max_rows):
+            if len(columns) == 1:
+                chunk = [[project(row)] for row in chunk]
+            else:
+                chunk = [list(project(row)) for row in chunk]
+            if parsers is None:
+                parsers = {
+                    i: date_parser(
+                        [row[i] for row in chunk[:DATE_SAMPLE_SIZE]],
+                        config.date_formats,
+                    )
+                    for i in date_columns
+                }
+            for i, parse in parsers.items():
+                if parse is not None:
+                    self.parse_column(chunk, i, parse, caches[i])
+            if checks:
+                chunk = [
+                    row for row in chunk if all(p.may_match(row[i]) for i, p in checks)
+                ]
+            rows.extend(chunk)
+        return columns, rows
+
+    def sample(self, config: DataConfig, n: int) -> tuple[list[str], list[list]]:
+        return self.load_data(config, max_rows=n)
+
+    def chunks(self, max_rows: Optional[int] = None) -> Iterator[list[list[str]]]:
+        """yields the rows of the file, without the header, CHUNK_ROWS at a time,
+        stopping after max_rows rows if given. Incomplete rows are padded with empty
+        values"""
+        width = len(self.header)
+        with self.open() as file:
+            reader = csv.reader(file, self.dialect)
+            next(reader, None)
+            if max_rows is not None:
+                reader = islice(reader, max_rows)
+            while True:
+                chunk = list(islice(reader, CHUNK_ROWS))
+                if not chunk:
+                    return
+                yield [
+                    row if len(row) >= width else row + [""] * (width - len(row))
+                    for row in chunk
+                ]
+
+    @staticmethod
+    def parse_column(
+        chunk: list[list],
+        i: int,
+        parse: Callable[[str], datetime.date],
+        cache: dict[str, Any],
+    ):
+        """replaces the values of column i by dates, using and filling the cache of
+        already parsed values. Values that can't be parsed are left as they are"""
+        for row in chunk:
+            value = row[i]
+            try:
+                row[i] = cache[value]
+            except KeyError:
+                try:
+                    parsed = parse(value.strip())
+                except ValueError:
+                    parsed = value
+                row[i] = cache[value] = parsed
+
+
+def register():
+    return (".csv", ".tsv"), CsvDataLoader
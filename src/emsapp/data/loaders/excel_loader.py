@@ -1,36 +1,147 @@
+from __future__ import annotations
+
+import posixpath
+import zipfile
 from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
+from xml.etree import ElementTree
 
 import openpyxl
+from openpyxl.utils.cell import range_boundaries
+
+from emsapp.data.filters import Predicate
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+TABLE_REL_TYPE = f"{REL_NS}/table"
+
+
+class TableInfo(NamedTuple):
+    """where a table is in the workbook, as described in xl/tables/*.xml"""
+
+    sheet: str
+    headers: list[str]
+    min_col: int
+    min_row: int
+    max_col: int
+    max_row: int
+
+
+def relationships(archive: zipfile.ZipFile, part: str) -> dict[str, tuple[str, str]]:
+    """relationships of a part of the package, as {id: (type, path of the target)}"""
+    directory, name = posixpath.split(part)
+    rels_path = posixpath.join(directory, "_rels", name + ".rels")
+    try:
+        root = ElementTree.fromstring(archive.read(rels_path))
+    except KeyError:
+        return {}
+    out = {}
+    for rel in root.iter(f"{{{PACKAGE_REL_NS}}}Relationship"):
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(directory, target))
+        out[rel.get("Id")] = (rel.get("Type"), target)
+    return out
+
+
+def read_tables(path: Path) -> dict[str, TableInfo]:
+    """finds the tables of a workbook by reading only the workbook, relationship and
+    table parts of the file, not the content of the sheets"""
+    tables = {}
+    with zipfile.ZipFile(path) as archive:
+        workbook_part = "xl/workbook.xml"
+        sheet_targets = relationships(archive, workbook_part)
+        workbook = ElementTree.fromstring(archive.read(workbook_part))
+        for sheet in workbook.iter(f"{{{MAIN_NS}}}sheet"):
+            sheet_part = sheet_targets.get(sheet.get(f"{{{REL_NS}}}id"), (None, None))[
+                1
+            ]
+            if sheet_part is None:
+                continue
+            for rel_type, table_part in relationships(archive, sheet_part).values():
+                if rel_type != TABLE_REL_TYPE:
+                    continue
+                table = ElementTree.fromstring(archive.read(table_part))
+                min_col, min_row, max_col, max_row = range_boundaries(table.get("ref"))
+                # rows of headers and totals aren't data
+                min_row += int(table.get("headerRowCount", 1))
+                max_row -= int(table.get("totalsRowCount", 0))
+                headers = [
+                    column.get("name")
+                    for column in table.iter(f"{{{MAIN_NS}}}tableColumn")
+                ]
+                name = table.get("name") or table.get("displayName")
+                tables[name] = TableInfo(
+                    sheet.get("name"), headers, min_col, min_row, max_col, max_row
+                )
+    return tables
 
 
 class ExcelDataLoader:
-    wb: openpyxl.Workbook
+    """
+    Loads a table of an excel workbook. Tables and their headers are found when the
+    loader is created by reading only their description in the file, so that it
+    doesn't depend on the size of the sheets. The content of the sheet is only read
+    by `load_data`, in read-only mode and within the range of the table.
+    """
+
+    path: Path
+    all_tables: dict[str, TableInfo]
+    supports_pushdown = True
 
     def __init__(self, path: Path):
-        self.wb = openpyxl.load_workbook(str(path), data_only=True)
-        self.all_tables: dict[str, list[str]] = {}
-        self.table_ws_map: dict[str, str] = {}
-        for ws in self.wb:
-            for name in ws.tables:
-                self.table_ws_map[name] = ws.title
-                self.all_tables[name] = [
-                    col.name for col in ws.tables[name].tableColumns
-                ]
+        self.path = Path(path)
+        self.all_tables = read_tables(self.path)
+        logger.debug("tables of %s : %s", self.path, list(self.all_tables))
 
     def tables(self, config) -> list[str]:
         return list(self.all_tables)
 
     def headers(self, config) -> list[str]:
-        return self.all_tables.get(config.table_name, [])
+        table = self.all_tables.get(config.table_name)
+        return table.headers if table else []
 
-    def load_data(self, config) -> tuple[list[str], list[list]]:
+    def load_data(
+        self,
+        config,
+        predicates: Sequence[Predicate] = (),
+        max_rows: Optional[int] = None,
+    ) -> tuple[list[str], list[list]]:
         if config.table_name not in self.all_tables:
             return [], []
-        data = [
-            [cell.value for cell in row]
-            for row in list(self.wb[self.table_ws_map[config.table_name]])[1:]
+        table = self.all_tables[config.table_name]
+        headers = table.headers
+        checks = [
+            (headers.index(p.column), p) for p in predicates if p.column in headers
         ]
-        return self.all_tables[config.table_name], data
+        max_row = table.max_row
+        if max_rows is not None:
+            max_row = min(max_row, table.min_row + max_rows - 1)
+        wb = openpyxl.load_workbook(str(self.path), read_only=True, data_only=True)
+        try:
+            rows = wb[table.sheet].iter_rows(
+                min_row=table.min_row,
+                max_row=max_row,
+                min_col=table.min_col,
+                max_col=table.max_col,
+                values_only=True,
+            )
+            data = [
+                list(row) for row in rows if all(p.may_match(row[i]) for i, p in checks)
+            ]
+        finally:
+            # read-only workbooks keep the file open until closed
+            wb.close()
+        return headers, data
+
+    def sample(self, config, n: int) -> tuple[list[str], list[list]]:
+        return self.load_data(config, max_rows=n)
 
 
 def register():
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+from emsapp.config import Config, DataConfig, RunSettings
+from emsapp.data.filters import IN, NOT_IN, Predicate, where_clause
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+DATE_TYPE = "DATE"
+INDEXED_FIELDS = ("date_start", "institution", "location")
+INSERT_BATCH = 10_000
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sql_value(value: Any) -> Any:
+    """dates are stored as ISO text, which sorts and compares like the dates"""
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+class SqliteDataLoader:
+    """
+    Loads a table of a SQLite database, such as the ones written by `materialize`.
+    Predicates are turned into a WHERE clause. Date predicates are only kept for
+    columns declared as DATE, whose values are ISO text that compares like dates.
+    Rows are returned in insertion order, whatever index SQLite uses.
+    """
+
+    path: Path
+    all_tables: dict[str, list[str]]
+    column_types: dict[str, dict[str, str]]
+    has_rowid: dict[str, bool]
+    supports_pushdown = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.all_tables = {}
+        self.column_types = {}
+        self.has_rowid = {}
+        with self.connect() as conn:
+            tables = [
+                row[0]
+                for row in conn.execute(
+                    "select name from sqlite_master where type in ('table', 'view')"
+                    " and name not like 'sqlite_%' order by name"
+                )
+            ]
+            for table in tables:
+                info = conn.execute(f"pragma table_info({quote(table)})").fetchall()
+                self.all_tables[table] = [column[1] for column in info]
+                self.column_types[table] = {
+                    column[1]: column[2].upper() for column in info
+                }
+                try:
+                    conn.execute(f"select rowid from {quote(table)} limit 0")
+                    self.has_rowid[table] = True
+                except sqlite3.OperationalError:
+                    self.has_rowid[table] = False
+
+    def connect(self) -> sqlite3.Connection:
+        """read-only connection, closed when used as a context manager"""
+        return closing(
+            sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        )
+
+    def tables(self, config: DataConfig) -> list[str]:
+        return list(self.all_tables)
+
+    def headers(self, config: DataConfig) -> list[str]:
+        return self.all_tables.get(config.table_name, [])
+
+    def usable_predicates(
+        self, table_name: str, predicates: Sequence[Predicate]
+    ) -> list[Predicate]:
+        """predicates that SQLite can check on this table"""
+        types = self.column_types[table_name]
+        return [
+            p
+            for p in predicates
+            if p.column in types
+            and (p.op in (IN, NOT_IN) or types[p.column] == DATE_TYPE)
+        ]
+
+    def load_data(
+        self,
+        config: DataConfig,
+        predicates: Sequence[Predicate] = (),
+        max_rows: Optional[int] = None,
+    ) -> tuple[list[str], list[list]]:
+        table_name = config.table_name
+        if table_name not in self.all_tables:
+            return [], []
+        columns = [c for c in config.columns if c in self.all_tables[table_name]]
+        if not columns:
+            return [], []
+        where, params = where_clause(
+            self.usable_predicates(table_name, predicates), quote
+        )
+        order = " order by rowid" if self.has_rowid[table_name] else ""
+        limit = "" if max_rows is None else f" limit {int(max_rows)}"
+        query = (
+            f"select {', '.join(map(quote, columns))} from {quote(table_name)}"
+            f"{where}{order}{limit}"
+        )
+        logger.debug("loading %s %r", query, params)
+        with self.connect() as conn:
+            rows = conn.execute(query, [sql_value(p) for p in params]).fetchall()
+        return columns, rows
+
+    def sample(self, config: DataConfig, n: int) -> tuple[list[str], list[list]]:
+        return self.load_data(config, max_rows=n)
+
+
+def materialize(
+    path: os.PathLike,
+    loader=None,
+    settings: Optional[RunSettings] = None,
+    table_name: Optional[str] = None,
+) -> Path:
+    """copies the mapped columns of the configured data source into a new SQLite
+    database, to be loaded with SqliteDataLoader or queried by SqlBackend. Dates
+    that can be parsed are stored as ISO text in DATE columns, other values as they
+    are, so that loading the copy rejects the same rows as loading the source.
+    The columns most filtered and split by are indexed.
+
+    Parameters
+    ----------
+    path : os.PathLike
+        database to write, replaced if it exists
+    loader : DataLoader, optional
+        loader of the source, by default one is chosen according to the
+        configured db_path
+    settings : RunSettings, optional
+        settings giving the source table and its columns, by default a snapshot of
+        the current config
+    table_name : str, optional
+        name of the new table, by default the same as the source table, so that
+        only db_path needs to change in the config
+
+    Returns
+    -------
+    Path
+        path of the database
+    """
+    from emsapp.data.loading import DataLoaderFactory, parse_dates
+
+    settings = settings or Config().snapshot()
+    data_conf = settings.data
+    loader = loader or DataLoaderFactory.create(data_conf.db_path)
+    table_name = table_name or data_conf.table_name
+    headers, rows = loader.load_data(data_conf)
+    columns = [c for c in data_conf.columns if c in headers]
+    indices = [headers.index(c) for c in columns]
+    date_columns = {data_conf.col_date_start, data_conf.col_date_end}
+
+    values = []
+    for column, i in zip(columns, indices):
+        raw = [row[i] for row in rows]
+        if column in date_columns:
+            parsed = parse_dates(raw, settings)
+            raw = [r if p is None else p.isoformat() for r, p in zip(raw, parsed)]
+        values.append(raw)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    with closing(sqlite3.connect(tmp_path)) as conn:
+        # other columns have no type, so that values are kept as they are
+        definitions = ", ".join(
+            f"{quote(c)} {DATE_TYPE}" if c in date_columns else quote(c)
+            for c in columns
+        )
+        conn.execute(f"create table {quote(table_name)} ({definitions})")
+        insert = (
+            f"insert into {quote(table_name)} values"
+            f" ({', '.join('?' * len(columns))})"
+        )
+        all_rows = list(zip(*values))
+        for start in range(0, len(all_rows), INSERT_BATCH):
+            conn.executemany(insert, all_rows[start : start + INSERT_BATCH])
+        for field in INDEXED_FIELDS:
+            column = getattr(data_conf, f"col_{field}")
+            if column in columns:
+                conn.execute(
+                    f"create index {quote(f'{table_name}_{column}')}"
+                    f" on {quote(table_name)} ({quote(column)})"
+                )
+        conn.commit()
+    tmp_path.replace(path)
+    logger.info("%d rows of %s copied to %s", len(rows), data_conf.db_path, path)
+    return path
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """command line entry point, see `python -m emsapp.data.loaders.sqlite_loader -h`"""
+    parser = argparse.ArgumentParser(
+        description="copies the configured data source into an indexed SQLite database"
+    )
+    parser.add_argument("output", type=Path, help="SQLite database to write")
+    parser.add_argument(
+        "--source", type=Path, help="data source, by default the configured one"
+    )
+    parser.add_argument("--table", help="table to copy, by default the configured one")
+    args = parser.parse_args(argv)
+
+    from emsapp import startup
+
+    startup.configure_logging()
+    startup.load_plugins()
+    settings = Config().snapshot()
+    if args.source or args.table:
+        data_conf = settings.data.copy(
+            update={
+                k: v
+                for k, v in dict(db_path=args.source, table_name=args.table).items()
+                if v
+            }
+        )
+        settings = dataclasses.replace(settings, data=data_conf)
+    materialize(args.output, settings=settings)
+
+
+def register():
+    return (".sqlite", ".sqlite3", ".db"), SqliteDataLoader
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,36 @@
 from __future__ import annotations
 
+import importlib.util
 import os
+from datetime import date
+from itertools import compress
 from pathlib import Path
-from typing import Protocol, Union
+from typing import Any, Optional, Protocol, Sequence, Union
 
-from emsapp.config import Config, ConfigurationValueError, DataConfig
-from emsapp.data import DataReport, Entries, Entry, RawData
+import numpy as np
+
+from emsapp.config import Config, ConfigurationValueError, DataConfig, RunSettings
+from emsapp.data import (
+    INVALID_DATE,
+    MISSING_VALUE,
+    DataReport,
+    Entries,
+    Entry,
+    RawData,
+    RejectionReport,
+    SymbolTable,
+    parse_date,
+)
+from emsapp.data.filters import Predicate
 from emsapp.i18n import _
+from emsapp.plugin import REGISTRY
 from emsapp.utils import get_logger
 
 logger = get_logger()
 
+DATE_FIELDS = ("date_start", "date_end")
+CATEGORICAL_FIELDS = ("role", "institution", "institution_type", "location")
+
 
 class DataLoader(Protocol):
     def __init__(self, path: Path):
@@ -50,58 +70,263 @@ class DataLoader(Protocol):
         ...
 
 
-class DataLoaderFactory:
-    _registered: dict[str, type[DataLoader]] = {}
+class PushdownDataLoader(DataLoader, Protocol):
+    """
+    Optional capability of a DataLoader : rows that don't satisfy the predicates
+    are skipped by the data source itself, before being loaded. Loaders that have
+    it set `supports_pushdown = True`.
+    """
+
+    supports_pushdown: bool
+
+    def load_data(
+        self, config: DataConfig, predicates: Sequence[Predicate] = ()
+    ) -> tuple[list[str], list[list]]:
+        """imports the rows that satisfy all the predicates. Rows for which a
+        predicate can't be checked must be kept
+
+        Parameters
+        ----------
+        config: DataConfig
+            current data configuration
+        predicates : Sequence[Predicate]
+            conditions on the columns of the data source
+
+        Returns
+        -------
+        list[str]
+            headers (column names)
+        list[list]
+            list of rows of data. Rows must have the same len as headers
+        """
+        ...
+
+
+class ColumnarDataLoader(DataLoader, Protocol):
+    """
+    Optional capability of a DataLoader : data stored column by column is returned
+    as is, instead of being turned into rows that `load_data` turns back into
+    columns. If the loader also supports pushdown, `load_columns` accepts
+    predicates the same way `load_data` does.
+    """
+
+    def load_columns(self, config: DataConfig) -> tuple[list[str], list[list]]:
+        """imports the whole dataset column by column
+
+        Returns
+        -------
+        list[str]
+            headers (column names)
+        list[list]
+            one list of values per header, all of the same length
+        """
+        ...
+
+
+class SamplingDataLoader(DataLoader, Protocol):
+    """
+    Optional capability of a DataLoader : the first rows of the table are imported
+    without reading the rest, to preview the data (see `load_sample`).
+    """
+
+    def sample(self, config: DataConfig, n: int) -> tuple[list[str], list[list]]:
+        """imports at most the first n rows of the dataset
 
+        Returns
+        -------
+        list[str]
+            headers (column names)
+        list[list]
+            list of rows of data. Rows must have the same len as headers
+        """
+        ...
+
+
+class DataLoaderFactory:
     @classmethod
     def register(cls, specs: tuple[Union[str, tuple[str]], type[DataLoader]]):
-        ext, new_cls = specs
-        if isinstance(ext, str):
-            ext = (ext,)
-        for e in ext:
-            cls._registered[e] = new_cls
+        REGISTRY.registration_callback("data_loader")(specs)
 
     @classmethod
     def create(cls, path: os.PathLike) -> DataLoader:
         path = Path(path)
         ext = path.suffix.lower()
-        return cls._registered[ext](path)
+        loader_cls = REGISTRY.get("data_loader", ext)
+        if loader_cls is None:
+            raise ValueError(
+                _("No data loader available for {ext} files").format(ext=ext)
+            )
+        return loader_cls(path)
 
     @classmethod
     def all_extensions(cls) -> list[str]:
-        return list(cls._registered)
+        return REGISTRY.names("data_loader")
 
     @classmethod
     def valid(cls, path: Path) -> bool:
-        return path.suffix.lower() in cls._registered
+        return ("data_loader", path.suffix.lower()) in REGISTRY
 
 
-def load_data(loader: DataLoader = None) -> Entries:
+def load_data(
+    loader: DataLoader = None,
+    settings: RunSettings = None,
+    predicates: Sequence[Predicate] = (),
+) -> Entries:
+    """loads all entries from the data source
+
+    Parameters
+    ----------
+    loader : DataLoader, optional
+        loader to use, by default one is chosen according to the configured db_path
+    settings : RunSettings, optional
+        settings of the current run, by default a snapshot of the current config
+    predicates : Sequence[Predicate], optional
+        conditions on the entry fields that the loader can use to skip rows, if it
+        supports it (see PushdownDataLoader). Entries are still to be filtered
+        afterwards, and skipped rows don't appear in the rejection report.
+    """
+    settings = settings or Config().snapshot()
+    data_conf = settings.data
     try:
-        loader = loader or DataLoaderFactory.create(Config().data.db_path)
+        loader = loader or DataLoaderFactory.create(data_conf.db_path)
     except Exception as e:
         raise ValueError(e)
-    data = RawData(*loader.load_data(Config().data))
+    args = [data_conf]
+    if predicates and getattr(loader, "supports_pushdown", False):
+        args.append(
+            [
+                p._replace(column=getattr(data_conf, f"col_{p.column}"))
+                for p in predicates
+            ]
+        )
+        logger.debug("loading with predicates %r", args[1])
+    if hasattr(loader, "load_columns"):
+        headers, all_columns = loader.load_columns(*args)
+    else:
+        data = RawData(*loader.load_data(*args))
+        headers, all_columns = data.headers, list(zip(*data.rows))
+    num_rows = len(all_columns[0]) if all_columns else 0
     indices = {}
     for key in Entry.fields():
-        param = getattr(Config().data, f"col_{key}")
+        param = getattr(data_conf, f"col_{key}")
         try:
-            i = data.headers.index(param)
+            i = headers.index(param)
         except ValueError as e:
             raise ConfigurationValueError(
                 "Column name {col_name!r} not found in table {table_name!r}".format(
-                    col_name=param, table_name=Config().data.table_name
+                    col_name=param, table_name=data_conf.table_name
                 )
             ) from e
         indices[key] = i
 
-    l = []
-    for row in data.rows:
+    rejections = RejectionReport(total=num_rows)
+    if not num_rows:
+        return Entries([], rejections=rejections)
+    columns = {key: all_columns[i] for key, i in indices.items()}
+
+    valid = np.ones(num_rows, dtype=bool)
+    for key, column in columns.items():
+        missing = np.fromiter(map(is_missing, column), dtype=bool, count=num_rows)
+        rejections.add(MISSING_VALUE, key, missing)
+        valid &= ~missing
+
+    for key in DATE_FIELDS:
+        dates = parse_dates(columns[key], settings)
+        invalid = np.array([d is None for d in dates]) & valid
+        rejections.add(INVALID_DATE, key, invalid)
+        valid &= ~invalid
+        columns[key] = dates
+
+    symbols = SymbolTable()
+    for key in CATEGORICAL_FIELDS:
+        columns[key] = symbols.column(columns[key])
+
+    l = Entry.from_valid_rows(
+        compress(zip(*(columns[k] for k in Entry.fields())), valid)
+    )
+    rejections.accepted = len(l)
+    if rejections.rejected:
+        logger.warning("%s", rejections.summary())
+    return Entries(l, rejections=rejections)
+
+
+def load_sample(loader: DataLoader, config: DataConfig, n: int) -> RawData:
+    """imports the first n rows of the dataset, with `sample` if the loader has it
+    (see SamplingDataLoader), otherwise by loading everything"""
+    if hasattr(loader, "sample"):
+        return RawData(*loader.sample(config, n))
+    headers, rows = loader.load_data(config)
+    return RawData(headers, list(rows[:n]))
+
+
+class RawDataLoader:
+    """serves data that is already loaded, for instance to run `load_data` on a
+    sample"""
+
+    def __init__(self, data: RawData):
+        self.data = data
+
+    def tables(self, config: DataConfig) -> list[str]:
+        return [config.table_name]
+
+    def headers(self, config: DataConfig) -> list[str]:
+        return self.data.headers
+
+    def load_data(self, config: DataConfig) -> tuple[list[str], list[list]]:
+        return self.data.headers, self.data.rows
+
+
+def is_missing(value: Any) -> bool:
+    """empty values, like the ones Entry refuses, and NaN, which arrow and csv
+    sources may give for empty cells"""
+    return not value or value != value
+
+
+def parse_dates(column: Sequence, settings: RunSettings) -> list[Optional[date]]:
+    """parses a whole column of dates, each distinct value only once. Values that
+    cannot be parsed are replaced by None"""
+    cache = {}
+    out = []
+    for value in column:
         try:
-            entry = Entry(**{k: row[v] for k, v in indices.items()})
-        except ValueError as e:
-            logger.warning(_("invalid entry : {error}").format(error=e))
-            continue
+            parsed = cache[value]
+        except KeyError:
+            try:
+                parsed = None if is_missing(value) else parse_date(value, settings)
+            except ValueError:
+                parsed = None
+            cache[value] = parsed
+        except TypeError:
+            # unhashable value
+            parsed = None
+        out.append(parsed)
+    return out
+
 
-        l.append(entry)
-    return Entries(l)
+REGISTRY.register_lazy(
+    "data_loader", ".accdb", "emsapp.data.loaders.access_loader:AccessDataLoader"
+)
+REGISTRY.register_lazy(
+    "data_loader", ".xlsx", "emsapp.data.loaders.excel_loader:ExcelDataLoader"
+)
+REGISTRY.register_lazy(
+    "data_loader", ".xlsm", "emsapp.data.loaders.excel_loader:ExcelDataLoader"
+)
+REGISTRY.register_lazy(
+    "data_loader", ".csv", "emsapp.data.loaders.csv_loader:CsvDataLoader"
+)
+REGISTRY.register_lazy(
+    "data_loader", ".tsv", "emsapp.data.loaders.csv_loader:CsvDataLoader"
+)
+for suffix in (".sqlite", ".sqlite3", ".db"):
+    REGISTRY.register_lazy(
+        "data_loader", suffix, "emsapp.data.loaders.sqlite_loader:SqliteDataLoader"
+    )
+if importlib.util.find_spec("pyarrow") is not None:
+    # optional dependency, see the "arrow" extra
+    REGISTRY.register_lazy(
+        "data_loader", ".parquet", "emsapp.data.loaders.arrow_loader:ArrowDataLoader"
+    )
+    REGISTRY.register_lazy(
+        "data_loader", ".feather", "emsapp.data.loaders.arrow_loader:ArrowDataLoader"
+    )
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable, Sized, TypeVar, Union
 
-from emsapp.config import Config
-from emsapp.data import DataSet, Entries
-from emsapp.data.filters import Filter
-from emsapp.data.groupers import Grouper
+from emsapp.config import Config, ProcessConfig, RunSettings
+from emsapp.data import DataSet, Entries, FinalData
+from emsapp.data.filters import Filter, Predicate
+from emsapp.data.groupers import Grouper, GroupingIndex
+from emsapp.data.instrumentation import RunReport
 from emsapp.data.splitters import Splitter
 from emsapp.data.transformers import Transformer
+from emsapp.i18n import _
+
+T = TypeVar("T", bound=Sized)
 
 
 @dataclass
@@ -16,10 +21,25 @@ class Process:
     splitters: list[Splitter]
     transformers: list[Transformer]
     groupers: list[Grouper]
+    settings: RunSettings = None
+    last_report: RunReport = None
+    config: ProcessConfig = None
 
     @classmethod
-    def from_config(cls) -> Process:
-        p_conf = Config().process
+    def from_config(
+        cls, settings: RunSettings = None, p_conf: ProcessConfig = None
+    ) -> Process:
+        """creates the process described in the config
+
+        Parameters
+        ----------
+        settings : RunSettings, optional
+            settings used by every stage of the process, by default a snapshot of the
+            current config. Call `bind` to run the same process with new settings.
+        p_conf : ProcessConfig, optional
+            description of the process, by default the one of the current config
+        """
+        p_conf = p_conf or Config().process
 
         filters = [Filter.create(conf) for conf in p_conf.filters.values()]
         splitters = [Splitter.create(conf) for conf in p_conf.splitters.values()]
@@ -28,24 +48,379 @@ class Process:
         ]
         groupers = [Grouper.create(conf) for conf in p_conf.groupers.values()]
 
-        return Process(filters, splitters, transformers, groupers)
+        process = Process(filters, splitters, transformers, groupers, config=p_conf)
+        process.bind(settings or Config().snapshot())
+        return process
+
+    def stages(self) -> list[Union[Filter, Splitter, Transformer, Grouper]]:
+        return [*self.filters, *self.splitters, *self.transformers, *self.groupers]
+
+    def bind(self, settings: RunSettings):
+        """makes every stage of the process use these settings"""
+        self.settings = settings
+        for stage in self.stages():
+            stage.settings = settings
+
+    def predicates(self) -> list[Predicate]:
+        """conditions that the entries kept by the filters satisfy"""
+        predicates = (flt.predicate() for flt in self.filters)
+        return [p for p in predicates if p is not None]
+
+    @property
+    def needs_districts(self) -> bool:
+        """whether the entries are split by district"""
+        return any(getattr(s, "col", None) == "district" for s in self.splitters)
+
+    def __call__(self, raw_entries: Entries, report: RunReport = None) -> list[DataSet]:
+        """runs the whole process
+
+        Parameters
+        ----------
+        raw_entries : Entries
+            entries as loaded
+        report : RunReport, optional
+            where to record how long each stage took. A new one is created if not
+            given. In any case, it's available as `last_report` afterwards.
+        """
+        report = self.last_report = report or RunReport()
+        if self.settings is None:
+            self.bind(Config().snapshot())
+        with report.tracing():
+            filtered_entries = self.filter(raw_entries, report)
+            if self.needs_districts:
+                # ask the user for unknown districts up front, and only once each
+                locations = {e.location for e in filtered_entries}
+                with report.measure("districts", items_in=len(locations)):
+                    self.bind(self.settings.with_districts(locations))
+            entries_lists = self.split(filtered_entries, report)
+            final_data = self.transform(entries_lists, report)
+            data_sets = self.group(final_data, report)
+        report.log()
+        return data_sets
+
+    def filter(self, raw_entries: Entries, report: RunReport = None) -> Entries:
+        """keeps the entries accepted by every filter. Filters are applied one
+        after the other, each on the entries kept by the previous ones"""
+        report = report or RunReport()
+        entries = raw_entries.l
+        with report.measure("filter", items_in=len(entries)) as total:
+            for flt in self.filters:
+                with report.measure("filter", flt.name, len(entries)) as stats:
+                    entries = [e for e in entries if flt(e)]
+                    stats.items_out += len(entries)
+            total.items_out += len(entries)
+        return Entries(entries, raw_entries.report.copy())
+
+    def split(
+        self, filtered_entries: Entries, report: RunReport = None
+    ) -> list[Entries]:
+        """applies each splitter to the output of the previous one"""
+        report = report or RunReport()
+        entries_lists = [filtered_entries]
+        with report.measure("splitter", items_in=len(filtered_entries.l)) as total:
+            for splitter in self.splitters:
+                with report.measure(
+                    "splitter", splitter.name, len(entries_lists)
+                ) as stats:
+                    entries_lists = [
+                        new_entries
+                        for entries in entries_lists
+                        for new_entries in splitter(entries)
+                    ]
+                    stats.items_out += len(entries_lists)
+            total.items_out += len(entries_lists)
+        return entries_lists
+
+    def transform(
+        self, entries_lists: list[Entries], report: RunReport = None
+    ) -> list[FinalData]:
+        """applies every transformer to every group of entries"""
+        report = report or RunReport()
+        final_data = []
+        with report.measure("transformer", items_in=len(entries_lists)) as total:
+            for entries in entries_lists:
+                for trans in self.transformers:
+                    with report.measure("transformer", trans.name, 1) as stats:
+                        final_data.append(trans(entries))
+                        stats.items_out += 1
+            total.items_out += len(final_data)
+        return final_data
+
+    def group(
+        self, final_data: list[FinalData], report: RunReport = None
+    ) -> list[DataSet]:
+        report = report or RunReport()
+        data_sets = []
+        with report.measure("grouper", items_in=len(final_data)) as total:
+            index = GroupingIndex(final_data)
+            for grouper in self.groupers:
+                with report.measure("grouper", grouper.name, len(final_data)) as stats:
+                    new_data_sets = grouper.group(index)
+                    stats.items_out += len(new_data_sets)
+                for data_set in new_data_sets:
+                    data_set.grouper = grouper.name
+                    data_sets.append(data_set)
+            total.items_out += len(data_sets)
+        return data_sets
+
+
+def stage_spec(conf: Any, named: bool = True) -> tuple:
+    """hashable description of a stage config : stages with the same spec give the
+    same result for the same input. The name is left out if it doesn't appear in
+    the result, as is the case for filters"""
+    return (
+        type(conf).__name__,
+        *((k, repr(v)) for k, v in vars(conf).items() if named or k != "name"),
+    )
+
+
+class ProcessGraph:
+    """
+    Runs several processes on the same entries, computing what they have in common
+    only once. A result is shared when the same stage is applied to the same input :
+    - the same set of filters, in whatever order
+    - the same sequence of splitters after the same filters
+    - the same transformer after the same splitters
+    - the same grouper after the same splitters and transformers
+    Stages are compared by their config (see `stage_spec`), so that the processes
+    don't have to be described in the same file.
+
+    Example
+    -------
+    ```
+    graph = ProcessGraph.from_config()
+    for name, data_sets in graph(load_data()).items():
+        ...
+    ```
+    """
+
+    processes: dict[str, Process]
+    last_report: RunReport = None
+    _cache: dict[Hashable, Any]
 
-    def __call__(self, raw_entries: Entries) -> list[DataSet]:
-        filtered_entries = Entries(
-            [e for e in raw_entries if all(f(e) for f in self.filters)],
-            raw_entries.report.copy(),
+    def __init__(self, processes: dict[str, Process]):
+        for name, process in processes.items():
+            if process.config is None:
+                raise ValueError(
+                    _("process {name!r} must be created from a config").format(
+                        name=name
+                    )
+                )
+        self.processes = processes
+        self._cache = {}
+
+    @classmethod
+    def from_config(
+        cls, settings: RunSettings = None, p_confs: Iterable[ProcessConfig] = None
+    ) -> ProcessGraph:
+        """creates the processes described in the config
+
+        Parameters
+        ----------
+        settings : RunSettings, optional
+            settings used by every stage, by default a snapshot of the current config
+        p_confs : Iterable[ProcessConfig], optional
+            descriptions of the processes, by default the ones of the current config
+        """
+        settings = settings or Config().snapshot()
+        p_confs = p_confs or Config().process_configs.values()
+        return cls({conf.name: Process.from_config(settings, conf) for conf in p_confs})
+
+    def bind(self, settings: RunSettings):
+        """makes every stage of every process use these settings"""
+        for process in self.processes.values():
+            process.bind(settings)
+
+    def predicates(self) -> list[Predicate]:
+        """conditions satisfied by the entries kept by every process, so that rows
+        that no process keeps aren't loaded"""
+        common = None
+        for process in self.processes.values():
+            predicates = process.predicates()
+            if common is None:
+                common = predicates
+            else:
+                common = [p for p in common if p in predicates]
+        return common or []
+
+    def __call__(
+        self, raw_entries: Entries, report: RunReport = None
+    ) -> dict[str, list[DataSet]]:
+        """runs all the processes
+
+        Parameters
+        ----------
+        raw_entries : Entries
+            entries as loaded
+        report : RunReport, optional
+            where to record how long each stage took. Shared stages are only
+            recorded once. Available as `last_report` afterwards.
+
+        Returns
+        -------
+        dict[str, list[DataSet]]
+            data sets of each process, by process name
+        """
+        report = self.last_report = report or RunReport()
+        self._cache = {}
+        try:
+            with report.tracing():
+                filtered = {
+                    name: self.filter(process, raw_entries, report)
+                    for name, process in self.processes.items()
+                }
+                self.ask_districts(filtered, report)
+                out = {}
+                for name, process in self.processes.items():
+                    entries_lists, split_key = self.split(
+                        process, filtered[name], report
+                    )
+                    final_data, data_key = self.transform(
+                        process, entries_lists, split_key, report
+                    )
+                    out[name] = self.group(process, final_data, data_key, report)
+        finally:
+            self._cache = {}
+        report.log()
+        return out
+
+    def compute(
+        self,
+        key: Hashable,
+        kind: str,
+        name: str,
+        items_in: int,
+        func: Callable[[], T],
+        report: RunReport,
+    ) -> T:
+        """returns the result identified by key, calling func the first time"""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with report.measure(kind, items_in=items_in) as total, report.measure(
+            kind, name, items_in
+        ) as stats:
+            result = self._cache[key] = func()
+            total.items_out += len(result)
+            stats.items_out += len(result)
+        return result
+
+    def filter(
+        self, process: Process, raw_entries: Entries, report: RunReport
+    ) -> Entries:
+        entries = raw_entries.l
+        applied = frozenset()
+        for flt, conf in zip(process.filters, process.config.filters.values()):
+            applied = applied | {stage_spec(conf, named=False)}
+            entries = self.compute(
+                ("filter", applied),
+                "filter",
+                flt.name,
+                len(entries),
+                lambda: [e for e in entries if flt(e)],
+                report,
+            )
+        return Entries(entries, raw_entries.report.copy())
+
+    def ask_districts(self, filtered: dict[str, Entries], report: RunReport):
+        """asks the user for unknown districts up front, and only once each"""
+        names = [n for n, p in self.processes.items() if p.needs_districts]
+        if not names:
+            return
+        locations = {e.location for name in names for e in filtered[name]}
+        settings = self.processes[names[0]].settings
+        with report.measure("districts", items_in=len(locations)):
+            self.bind(settings.with_districts(locations))
+
+    def split(
+        self, process: Process, filtered_entries: Entries, report: RunReport
+    ) -> tuple[list[Entries], Hashable]:
+        filter_key = frozenset(
+            stage_spec(conf, named=False) for conf in process.config.filters.values()
         )
         entries_lists = [filtered_entries]
-        for splitter in self.splitters:
-            entries_lists = [
-                new_entries
-                for entries in entries_lists
-                for new_entries in splitter(entries)
-            ]
-
-        final_data = [
-            trans(entries) for entries in entries_lists for trans in self.transformers
-        ]
-        return [
-            data_set for grouper in self.groupers for data_set in grouper(final_data)
-        ]
+        applied = ()
+        for splitter, conf in zip(process.splitters, process.config.splitters.values()):
+            applied = (*applied, stage_spec(conf))
+            entries_lists = self.compute(
+                ("splitter", filter_key, applied),
+                "splitter",
+                splitter.name,
+                len(entries_lists),
+                lambda: [
+                    new_entries
+                    for entries in entries_lists
+                    for new_entries in splitter(entries)
+                ],
+                report,
+            )
+        return entries_lists, (filter_key, applied)
+
+    def transform(
+        self,
+        process: Process,
+        entries_lists: list[Entries],
+        split_key: Hashable,
+        report: RunReport,
+    ) -> tuple[list[FinalData], Hashable]:
+        results = []
+        specs = ()
+        for trans, conf in zip(
+            process.transformers, process.config.transformers.values()
+        ):
+            specs = (*specs, stage_spec(conf))
+            results.append(
+                self.compute(
+                    ("transformer", split_key, specs[-1]),
+                    "transformer",
+                    trans.name,
+                    len(entries_lists),
+                    lambda: [trans(entries) for entries in entries_lists],
+                    report,
+                )
+            )
+        # same order as Process.transform, as it determines the order of the groups
+        final_data = [data for datas in zip(*results) for data in datas]
+        return final_data, (split_key, specs)
+
+    def group(
+        self,
+        process: Process,
+        final_data: list[FinalData],
+        data_key: Hashable,
+        report: RunReport,
+    ) -> list[DataSet]:
+        index_key = ("index", data_key)
+        if index_key not in self._cache:
+            self._cache[index_key] = GroupingIndex(final_data)
+        index = self._cache[index_key]
+        data_sets = []
+        for grouper, conf in zip(process.groupers, process.config.groupers.values()):
+            data_sets.extend(
+                self.compute(
+                    ("grouper", data_key, stage_spec(conf)),
+                    "grouper",
+                    grouper.name,
+                    len(final_data),
+                    lambda: self.labelled(grouper, index),
+                    report,
+                )
+            )
+        return data_sets
+
+    @staticmethod
+    def labelled(grouper: Grouper, index: GroupingIndex) -> list[DataSet]:
+        data_sets = grouper.group(index)
+        for data_set in data_sets:
+            data_set.grouper = grouper.name
+        return data_sets
+
+
+def current_processes() -> dict[str, Process]:
+    """processes described in the current config, by name"""
+    settings = Config().snapshot()
+    return {
+        name: Process.from_config(settings, conf)
+        for name, conf in Config().process_configs.items()
+    }
@@ -1,25 +1,27 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from operator import attrgetter
+from typing import Any, Callable
 
-from emsapp.config import SplitterConfig
+from emsapp.config import RunSettings, SplitterConfig
+from emsapp.data import Entry
 from emsapp.data.loading import Entries
 from emsapp.i18n import _
-from emsapp.validators import register_valid
+from emsapp.plugin import REGISTRY
 
 
 class Splitter(ABC):
     name: str
-    _registered: dict[str, type[Splitter]] = {}
+    settings: RunSettings = None
 
     @classmethod
     def register(cls, name, new_cls):
-        Splitter._registered[name] = new_cls
-        register_valid("splitter_type", name)
+        REGISTRY.register("splitter", name, new_cls)
 
     @classmethod
     def create(cls, conf: SplitterConfig) -> Splitter:
-        cls = Splitter._registered.get(conf.type)
+        cls = REGISTRY.get("splitter", conf.type)
         if cls:
             return cls(conf)
 
@@ -45,10 +47,18 @@ class ColumnSplitter(Splitter):
         super().__init__(conf)
         self.col = conf.column
 
+    def key(self) -> Callable[[Entry], Any]:
+        """function giving the value an entry is split by"""
+        if self.col == "district" and self.settings is not None:
+            districts = self.settings.districts
+            return lambda entry: districts.get(entry.location) or entry.district
+        return attrgetter(self.col)
+
     def __call__(self, entries: Entries) -> list[Entries]:
         out: dict[str, Entries] = {}
+        key = self.key()
         for entry in entries:
-            val = getattr(entry, self.col)
+            val = key(entry)
             if val not in out:
                 new_entries = Entries([], entries.report.copy())
                 new_entries.report.splitters[self.name] = val
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+
+from emsapp.config import Config
+from emsapp.data import (
+    COUNT_DTYPE,
+    DATE_DTYPE,
+    DataReport,
+    DataSet,
+    Entry,
+    FinalData,
+)
+from emsapp.data.filters import NullFilter
+from emsapp.data.instrumentation import RunReport
+from emsapp.data.loaders.sqlite_loader import quote, sql_value
+from emsapp.data.loading import CATEGORICAL_FIELDS
+from emsapp.data.process import Process
+from emsapp.data.splitters import ColumnSplitter, NullSplitter
+from emsapp.data.transformers import DateHistogram
+from emsapp.i18n import _
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class GroupRow(SimpleNamespace):
+    """values of the columns grouped by, seen as an entry by the splitters"""
+
+    district = Entry.district
+
+
+class SqlBackend:
+    """
+    Runs the filters, splitters and transformers of a process on a SQLite table
+    written by `materialize`, without loading the entries : SQLite counts the rows
+    of each group for each pair of dates with a GROUP BY query, and the transformers
+    work from these counts (see `Transformer.from_histogram`). Only the groupers
+    run on the final data as usual. The result is the same as loading the table and
+    running the process, including the order of the groups.
+
+    A process can be run this way if (see `supports`)
+    - every filter provides a predicate (see `Filter.predicate`)
+    - every splitter splits by the value of a column
+    - every transformer can work from a histogram of dates
+
+    Example
+    -------
+    ```
+    backend = SqlBackend("data.sqlite")
+    process = Process.from_config()
+    if backend.supports(process):
+        data_sets = backend(process)
+    ```
+    """
+
+    path: Optional[Path]
+
+    def __init__(self, path: os.PathLike = None):
+        """
+        Parameters
+        ----------
+        path : os.PathLike, optional
+            SQLite database, by default the db_path of the settings of the process
+        """
+        self.path = path and Path(path)
+
+    @staticmethod
+    def supports(process: Process) -> bool:
+        return (
+            all(
+                isinstance(flt, NullFilter) or flt.predicate() is not None
+                for flt in process.filters
+            )
+            and all(
+                isinstance(splitter, NullSplitter)
+                or (
+                    isinstance(splitter, ColumnSplitter)
+                    and splitter.col in (*CATEGORICAL_FIELDS, "district")
+                )
+                for splitter in process.splitters
+            )
+            and all(trans.histogram_fields for trans in process.transformers)
+        )
+
+    def __call__(self, process: Process, report: RunReport = None) -> list[DataSet]:
+        """runs the whole process, like `Process.__call__` on the loaded table
+
+        Parameters
+        ----------
+        process : Process
+            process to run, see `supports`
+        report : RunReport, optional
+            where to record how long each stage took. A new one is created if not
+            given. In any case, it's available as `process.last_report` afterwards.
+        """
+        if not self.supports(process):
+            raise ValueError(
+                _("process {name!r} cannot be run by the SQL backend").format(
+                    name=process.config.name if process.config else ""
+                )
+            )
+        report = process.last_report = report or RunReport()
+        if process.settings is None:
+            process.bind(Config().snapshot())
+        data_conf = process.settings.data
+        path = self.path or Path(data_conf.db_path)
+        columns = {key: getattr(data_conf, f"col_{key}") for key in Entry.fields()}
+        where, params = self.where_clause(process, columns)
+        table = quote(data_conf.table_name)
+        uri = f"{path.resolve().as_uri()}?mode=ro"
+
+        splitters = [s for s in process.splitters if isinstance(s, ColumnSplitter)]
+        group_fields = list(
+            dict.fromkeys(
+                "location" if s.col == "district" else s.col for s in splitters
+            )
+        )
+        date_fields = [
+            key
+            for key in ("date_start", "date_end")
+            if any(key in t.histogram_fields for t in process.transformers)
+        ]
+        selected = ", ".join(quote(columns[k]) for k in group_fields + date_fields)
+        query = (
+            f"select {selected + ', ' if selected else ''}count(*), min(rowid)"
+            f" from {table}{where}" + (f" group by {selected}" if selected else "")
+        )
+        logger.debug("%s %r", query, params)
+
+        with report.tracing():
+            with report.measure("query", items_in=1) as stats, closing(
+                sqlite3.connect(uri, uri=True)
+            ) as conn:
+                rows = conn.execute(query, params).fetchall()
+                stats.items_out = len(rows)
+            if process.needs_districts:
+                # ask the user for unknown districts up front, and only once each
+                i = group_fields.index("location")
+                locations = {row[i] for row in rows}
+                with report.measure("districts", items_in=len(locations)):
+                    process.bind(process.settings.with_districts(locations))
+            with report.measure("transformer", items_in=len(rows)) as stats:
+                final_data = self.transform(
+                    process, splitters, group_fields, date_fields, rows
+                )
+                stats.items_out = len(final_data)
+            data_sets = process.group(final_data, report)
+        report.log()
+        return data_sets
+
+    @staticmethod
+    def where_clause(process: Process, columns: dict[str, str]) -> tuple[str, list]:
+        """WHERE clause keeping the rows that give valid entries (see `load_data`)
+        accepted by every filter"""
+        conditions = []
+        params = []
+        for key, column in columns.items():
+            if key in ("date_start", "date_end"):
+                # dates that couldn't be parsed are stored as they were
+                conditions.append(f"date({quote(column)}) = {quote(column)}")
+            else:
+                conditions.append(
+                    f"{quote(column)} is not null and {quote(column)} <> ''"
+                )
+        for flt in process.filters:
+            predicate = flt.predicate()
+            if predicate is None:
+                continue
+            condition, predicate_params = predicate._replace(
+                column=columns[predicate.column]
+            ).sql(quote)
+            conditions.append(condition)
+            params.extend(map(sql_value, predicate_params))
+        return " where " + " and ".join(conditions), params
+
+    @staticmethod
+    def transform(
+        process: Process,
+        splitters: list[ColumnSplitter],
+        group_fields: list[str],
+        date_fields: list[str],
+        rows: list[tuple],
+    ) -> list[FinalData]:
+        """splits the rows of the query like the entries they stand for, then
+        applies every transformer to each group"""
+        keys = [s.key() for s in splitters]
+        num_fields = len(group_fields)
+        # the same values of the columns grouped by always give the same group
+        split_keys: dict[tuple, tuple] = {}
+        groups: dict[tuple, list[int]] = {}
+        group_first_rowid: dict[tuple, int] = {}
+        for i, row in enumerate(rows):
+            values = row[:num_fields]
+            try:
+                key = split_keys[values]
+            except KeyError:
+                entry = GroupRow(**dict(zip(group_fields, values)))
+                key = split_keys[values] = tuple(k(entry) for k in keys)
+            groups.setdefault(key, []).append(i)
+            if row[-1] < group_first_rowid.get(key, row[-1] + 1):
+                group_first_rowid[key] = row[-1]
+        if not splitters:
+            # an empty table still gives one (empty) group, as with entries
+            groups.setdefault((), [])
+
+        # groups are ordered like ColumnSplitter does, by first appearance of each
+        # value in the table, after the values of the previous splitters
+        first_rowid: dict[tuple, int] = {}
+        for key, rowid in group_first_rowid.items():
+            for n in range(1, len(key) + 1):
+                first_rowid[key[:n]] = min(first_rowid.get(key[:n], rowid), rowid)
+        order = sorted(
+            groups,
+            key=lambda key: [first_rowid[key[:n]] for n in range(1, len(key) + 1)],
+        )
+
+        dates = {
+            key: np.array([row[num_fields + j] for row in rows], dtype=DATE_DTYPE)
+            for j, key in enumerate(date_fields)
+        }
+        counts = np.array([row[-2] for row in rows], dtype=COUNT_DTYPE)
+        final_data = []
+        for key in order:
+            indices = np.array(groups[key], dtype=np.int64)
+            report = DataReport(
+                splitters={s.name: value for s, value in zip(splitters, key)}
+            )
+            histogram = DateHistogram(
+                dates["date_start"][indices] if "date_start" in dates else None,
+                dates["date_end"][indices] if "date_end" in dates else None,
+                counts[indices],
+            )
+            for trans in process.transformers:
+                final_data.append(trans.from_histogram(histogram, report))
+        return final_data
@@ -2,29 +2,50 @@ from __future__ import annotations
 
 import datetime
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
 
 import numpy as np
 
-from emsapp.config import TransformerConfig
-from emsapp.data import DataType, FinalData
-from emsapp.data.loading import Entries, Entry
+from emsapp.config import RunSettings, TransformerConfig
+from emsapp.const import OUTBREAK_WINDOW
+from emsapp.data import (
+    COUNT_DTYPE,
+    DATE_DTYPE,
+    DataReport,
+    DataType,
+    FinalData,
+    to_datetime64,
+)
+from emsapp.data.loading import Entries
 from emsapp.i18n import N_, _
-from emsapp.validators import register_valid
+from emsapp.plugin import REGISTRY
+
+
+class DateHistogram(NamedTuple):
+    """
+    Number of entries for each distinct pair of start and end dates, all as arrays of
+    the same length. `ends` is only given if the transformer asks for it in
+    `histogram_fields`, and counts of None stand for one entry per pair.
+    """
+
+    starts: np.ndarray
+    ends: Optional[np.ndarray] = None
+    counts: Optional[np.ndarray] = None
 
 
 class Transformer(ABC):
     name: str
-    _registered: dict[str, type[Transformer]] = {}
+    settings: RunSettings = None
+    # date fields needed by from_histogram, empty if it isn't available
+    histogram_fields: tuple[str, ...] = ()
 
     @classmethod
     def register(cls, name, new_cls):
-        Transformer._registered[name] = new_cls
-        register_valid("transformer_type", name)
+        REGISTRY.register("transformer", name, new_cls)
 
     @classmethod
     def create(cls, conf: TransformerConfig) -> Transformer:
-        cls = Transformer._registered.get(conf.type)
+        cls = REGISTRY.get("transformer", conf.type)
         if cls:
             return cls(conf)
 
@@ -39,36 +60,50 @@ class Transformer(ABC):
     def __call__(self, entries: Entries) -> FinalData:
         ...
 
+    def from_histogram(self, histogram: DateHistogram, report: DataReport) -> FinalData:
+        """gives the same result as `__call__` from the number of entries per
+        pair of dates, for instance computed by a database (see SqlBackend)
+
+        Parameters
+        ----------
+        histogram : DateHistogram
+            dates of the entries, with the fields listed in `histogram_fields`
+        report : DataReport
+            report of the entries the histogram was computed from
+        """
+        raise NotImplementedError
+
 
 class NewTransformer(Transformer):
+    histogram_fields = ("date_start",)
+
     def __call__(self, entries: Entries) -> FinalData:
         """
         transforms entries into data representing how many new cases occur
         on a particuar date.
         """
-        cases = defaultdict(int)
-
-        min_date = datetime.date.today()
-        max_date = datetime.date.today()
-
-        for entry in entries:
-            date = entry.date_start
-            min_date = min(min_date, date)
-            max_date = max(max_date, date)
-            cases[date] += 1
-
-        x = [
-            min_date + datetime.timedelta(d)
-            for d in range((max_date - min_date).days + 1)
-        ]
-        y = [cases[d] for d in x]
+        starts = to_datetime64((e.date_start for e in entries), len(entries.l))
+        return self.from_histogram(DateHistogram(starts), entries.report)
+
+    def from_histogram(self, histogram: DateHistogram, report: DataReport) -> FinalData:
+        starts = histogram.starts
+        today = np.datetime64(datetime.date.today(), "D")
+        min_date = min(starts.min(), today) if len(starts) else today
+        max_date = max(starts.max(), today) if len(starts) else today
+
+        x = np.arange(min_date, max_date + 1)
+        y = np.bincount(
+            (starts - min_date).astype(np.int64),
+            weights=histogram.counts,
+            minlength=len(x),
+        )
 
-        report = entries.report.copy()
+        report = report.copy()
         report.transformer = self.name
 
         return FinalData(
-            np.array(x),
-            np.array(y),
+            x,
+            y.astype(COUNT_DTYPE),
             DataType.BAR,
             description=N_("New cases"),
             report=report,
@@ -76,86 +111,135 @@ class NewTransformer(Transformer):
 
 
 class CumulativeTransformer(Transformer):
+    histogram_fields = ("date_start", "date_end")
+
     def __call__(self, entries: Entries) -> FinalData:
         """
         transforms data to show how many people were isolated on a particular date
         """
-        cases = defaultdict(int)
-
-        min_date = datetime.date.today()
-        max_date = datetime.date.today()
-
-        for entry in entries:
-            start = entry.date_start
-            end = entry.date_end
-            min_date = min(min_date, start)
-            max_date = max(max_date, end)
-            for d in range((end - start).days + 1):
-                cases[start + datetime.timedelta(d)] += 1
-
-        x = (
-            [min_date - datetime.timedelta(1)]
-            + [
-                min_date + datetime.timedelta(d)
-                for d in range((max_date - min_date).days + 1)
-            ]
-            + [max_date + datetime.timedelta(1)]
+        starts = to_datetime64((e.date_start for e in entries), len(entries.l))
+        ends = to_datetime64((e.date_end for e in entries), len(entries.l))
+        return self.from_histogram(DateHistogram(starts, ends), entries.report)
+
+    def from_histogram(self, histogram: DateHistogram, report: DataReport) -> FinalData:
+        starts, ends, counts = histogram
+        today = np.datetime64(datetime.date.today(), "D")
+        min_date = min(starts.min(), today) if len(starts) else today
+        max_date = max(ends.max(), today) if len(ends) else today
+
+        # one day of margin on each side, so that the line starts and ends at 0
+        x = np.arange(min_date - 1, max_date + 2)
+        # each entry adds one person on its first day and removes them after its
+        # last day, the number of people on a given day is the cumulative sum
+        valid = ends >= starts
+        first = (starts[valid] - x[0]).astype(np.int64)
+        after_last = (ends[valid] - x[0]).astype(np.int64) + 1
+        weights = None if counts is None else counts[valid]
+        changes = np.bincount(first, weights, minlength=len(x)) - np.bincount(
+            after_last, weights, minlength=len(x)
         )
-        y = [cases[d] for d in x]
+        y = np.cumsum(changes[: len(x)])
 
-        report = entries.report.copy()
+        report = report.copy()
         report.transformer = self.name
 
         return FinalData(
-            np.array(x),
-            np.array(y),
+            x,
+            y.astype(COUNT_DTYPE),
             DataType.LINE,
             description=N_("People in confinment"),
             report=report,
         )
 
 
+class Periods(NamedTuple):
+    start: np.ndarray
+    end: np.ndarray
+    count: np.ndarray
+
+
+def find_periods(
+    starts: np.ndarray, windows: Iterable[int] = (OUTBREAK_WINDOW,)
+) -> dict[int, Periods]:
+    """finds outbreak periods for several window lengths in one pass
+
+    Parameters
+    ----------
+    starts : np.ndarray
+        sorted array of datetime64[D] start dates of the cases
+    windows : Iterable[int], optional
+        a period goes on as long as a new case starts at most this many days after
+        the previous one, by default (OUTBREAK_WINDOW,)
+
+    Returns
+    -------
+    dict[int, Periods]
+        start, end and number of cases of each period, for each window
+    """
+    starts = np.asarray(starts, dtype=DATE_DTYPE)
+    gaps = np.diff(starts).astype(np.int64)
+    out = {}
+    for window in windows:
+        breaks = np.flatnonzero(gaps > window) + 1
+        first = np.concatenate(([0], breaks))
+        last = np.concatenate((breaks, [len(starts)])) - 1
+        if len(starts) == 0:
+            first = last = np.zeros(0, dtype=np.int64)
+        out[window] = Periods(
+            starts[first], starts[last] + np.timedelta64(window, "D"), last - first + 1
+        )
+    return out
+
+
 class PeriodTransformer(Transformer):
-    def __call__(self, entries: Entries) -> FinalData:
-        """
-        Tranforms entries into data representing periods of outbreaks.
-        """
-        dur = datetime.timedelta(9)
-
-        sorted_entries = sorted(entries.l, key=lambda en: en.date_start)
-        x = []
-        y = []
-
-        periods: list[list[Entry]] = []
-
-        start = sorted_entries[0].date_start
-        curr_end = start + dur
-        entry_list = [sorted_entries[0]]
-        for entry in sorted_entries[1:]:
-            if entry.date_start <= curr_end:
-                entry_list.append(entry)
-                curr_end = entry.date_start + dur
-            else:
-                periods.append(entry_list)
-                x += [start, curr_end]
-                y += [len(entry_list)] * 2
-                start = entry.date_start
-                curr_end = start + dur
-                entry_list = [entry]
-        periods.append(entry_list)
-        x += [start, curr_end]
-        y += [len(entry_list)] * 2
-
-        report = entries.report.copy()
-        report.transformer = self.name
+    """
+    Tranforms entries into data representing periods of outbreaks. A period lasts
+    until no new case occured during `window` days.
+    """
 
-        return FinalData(
-            np.array(x),
-            np.array(y),
-            DataType.PERIOD,
-            description=N_("Period in question"),
-            report=report,
-        )
+    window: int
+    histogram_fields = ("date_start",)
+
+    def __init__(self, conf: TransformerConfig):
+        super().__init__(conf)
+        self.window = conf.window
+
+    def __call__(self, entries: Entries) -> FinalData:
+        return self.compare(entries, [self.window])[self.window]
+
+    def from_histogram(self, histogram: DateHistogram, report: DataReport) -> FinalData:
+        starts = histogram.starts
+        if histogram.counts is not None:
+            starts = np.repeat(starts, histogram.counts)
+        return self.periods(np.sort(starts), [self.window], report)[self.window]
+
+    def compare(self, entries: Entries, windows: Iterable[int]) -> dict[int, FinalData]:
+        """computes periods for several window lengths, sorting the entries only once,
+        to compare different definitions of an outbreak"""
+        starts = np.sort(to_datetime64(e.date_start for e in entries))
+        return self.periods(starts, windows, entries.report)
+
+    def periods(
+        self, starts: np.ndarray, windows: Iterable[int], report: DataReport
+    ) -> dict[int, FinalData]:
+        """periods of the sorted start dates, for each window length"""
+        out = {}
+        for window, periods in find_periods(starts, windows).items():
+            x = np.empty(2 * len(periods.start), dtype=DATE_DTYPE)
+            x[0::2] = periods.start
+            x[1::2] = periods.end
+
+            window_report = report.copy()
+            window_report.transformer = self.name
+
+            out[window] = FinalData(
+                x,
+                np.repeat(periods.count, 2).astype(COUNT_DTYPE),
+                DataType.PERIOD,
+                description=N_("Period in question"),
+                report=window_report,
+            )
+        return out
 
 
 Transformer.register("new", NewTransformer)
@@ -1,14 +1,13 @@
 import sys
 
-import pkg_resources
 from PyQt5 import QtGui, QtWidgets, QtCore
 
+from emsapp.utils import package_path
+
 
 def main():
     app = QtWidgets.QApplication(sys.argv)
-    pixmap = QtGui.QPixmap(
-        pkg_resources.resource_filename("emsapp", "package_data/covid19.jpg")
-    )
+    pixmap = QtGui.QPixmap(str(package_path("package_data/covid19.jpg")))
     splash = QtWidgets.QSplashScreen(pixmap)
     splash.show()
     app.processEvents()
@@ -16,6 +15,9 @@ def main():
     from emsapp import startup
     from emsapp.i18n import _
     from emsapp.widgets import exception_hook
+
+    startup.configure_logging()
+    startup.load_plugins()
     from emsapp.widgets.main_window import MainWindow
 
     splash.showMessage(_("Loading data..."))
@@ -4,7 +4,7 @@ import sys
 from typing import Protocol, Union
 from weakref import WeakValueDictionary
 
-import pkg_resources
+from emsapp.utils import package_path
 
 AVAILABLE = ["fr", "de"]
 
@@ -39,11 +39,12 @@ def set_lang(lang: Union[str, list[str]] = None):
             lang = [locale.windows_locale[windll.GetUserDefaultUILanguage()]]
         else:
             lang = None
-    locale.setlocale(locale.LC_ALL, lang[0])
     try:
-        trans = gettext.translation(
-            "messages", pkg_resources.resource_filename("emsapp", "locale"), lang
-        )
+        locale.setlocale(locale.LC_ALL, lang[0] if lang else "")
+    except locale.Error:
+        pass
+    try:
+        trans = gettext.translation("messages", package_path("locale"), lang)
         module_gettext = trans.gettext
         module_ngettext = trans.ngettext
     except FileNotFoundError:
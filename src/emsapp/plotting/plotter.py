@@ -1,20 +1,30 @@
 import datetime
 import io
 import itertools
+import threading
 from collections import defaultdict
+from contextlib import contextmanager
 from enum import Enum
-from typing import Optional
+from typing import Iterator, Optional
 
 import matplotlib.dates as mdates
 import numpy as np
-from matplotlib import pyplot as plt
+from matplotlib import image as mimage
+from matplotlib import rcParams
+from matplotlib.artist import Artist
+from matplotlib.axes import Axes
+from matplotlib.colors import to_rgba
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.ticker import MaxNLocator
 
-from emsapp.config import Config, LegendLoc
+from emsapp.config import Config, LegendLoc, RunSettings
 from emsapp.const import COLORS, DATE_OUTPUT_FMT
 from emsapp.data import DataSet, DataType, FinalData
 from emsapp.i18n import _, ngettext
 
+EXPORT_DPI = 200
+
 
 class PlotType(Enum):
     LINE = "line"
@@ -32,14 +42,18 @@ class Plotter:
     title: str
     data: dict[DataType, list[FinalData]]
     plot_type: PlotType
-    legend_handles: list[plt.Artist]
+    legend_handles: list[Artist]
     legend_labels: list[str]
     lims: Optional[tuple[datetime.date, datetime.date]]
+    settings: RunSettings
     _extra_info: list[str]
     _sec_ax = None
     _ymax = None
 
-    def __init__(self, data_set: DataSet, ax: plt.Axes = None):
+    def __init__(
+        self, data_set: DataSet, ax: Axes = None, settings: RunSettings = None
+    ):
+        self.settings = settings or Config().snapshot()
         self.indices: dict[DataType, int] = defaultdict(int)
         self.legend_handles = []
         self.legend_labels = []
@@ -49,7 +63,9 @@ class Plotter:
             self.ax = ax
             self.fig = self.ax.get_figure()
         else:
-            self.fig, self.ax = plt.subplots(figsize=Config().plot.figsize)
+            self.fig = Figure(figsize=self.settings.figsize)
+            FigureCanvasAgg(self.fig)
+            self.ax = self.fig.add_subplot(111)
         self.title = data_set.title
         self.data = defaultdict(list)
         tpe = self.plot_type = PlotType.MIXED
@@ -73,28 +89,56 @@ class Plotter:
         self.line_styles = itertools.cycle(["-"] * n + ["--"] * n)
 
     def update_lims(self):
-        if Config().plot.show_everything:
-            self.lims = None
-            return
-        self.lims = (Config().plot.date_start, Config().plot.date_end)
+        self.lims = self.settings.lims
 
-    def update_ymax(self, xs, ys):
+    def update_ymax(self, xs: np.ndarray, ys: np.ndarray):
         if self.lims and len(xs) > 0:
-            self._ymax = max(
-                self._ymax or 1,
-                max(
-                    [y for x, y in zip(xs, ys) if self.lims[0] <= x <= self.lims[1]]
-                    or [1]
-                ),
-            )
+            left, right = (np.datetime64(d, "D") for d in self.lims)
+            visible = ys[(xs >= left) & (xs <= right)]
+            self._ymax = max(self._ymax or 1, visible.max() if len(visible) else 1)
 
     @property
     def extra_info(self) -> str:
         return "\n".join(self._extra_info)
 
+    def as_rgba(self) -> np.ndarray:
+        """renders the figure with a single Agg draw pass and returns the pixels
+        of the drawn elements, padded by savefig.pad_inches like
+        savefig(bbox_inches="tight") would. Their extent is read from the pixels,
+        which costs much less than measuring every artist again with get_tightbbox
+
+        Returns
+        -------
+        np.ndarray, shape (height, width, 4), dtype uint8
+            rgba pixels, in row-major order starting from the top left corner
+        """
+        canvas = self.fig.canvas
+        if not isinstance(canvas, FigureCanvasAgg):
+            canvas = FigureCanvasAgg(self.fig)
+        canvas.draw()
+        buffer = np.asarray(canvas.buffer_rgba())
+        height, width, _n = buffer.shape
+        background = np.array(
+            [round(255 * c) for c in to_rgba(self.fig.get_facecolor())], dtype=np.uint8
+        )
+        # one comparison per pixel rather than per channel
+        drawn = buffer.view(np.uint32)[..., 0] != background.view(np.uint32)[0]
+        rows = np.flatnonzero(drawn.any(axis=1))
+        cols = np.flatnonzero(drawn.any(axis=0))
+        if len(rows) == 0:
+            return np.ascontiguousarray(buffer)
+        pad = round(rcParams["savefig.pad_inches"] * self.fig.dpi)
+        top = max(0, rows[0] - pad)
+        bottom = min(height, rows[-1] + 1 + pad)
+        left = max(0, cols[0] - pad)
+        right = min(width, cols[-1] + 1 + pad)
+        return np.ascontiguousarray(buffer[top:bottom, left:right])
+
     def as_bytes(self) -> bytes:
+        """renders the figure as png. Only use this to write files, as_rgba
+        avoids the cost of encoding the image"""
         with io.BytesIO() as buffer:
-            self.fig.savefig(buffer, bbox_inches="tight", format="png", dpi=200)
+            mimage.imsave(buffer, self.as_rgba(), format="png", dpi=self.fig.dpi)
             return buffer.getvalue()
 
     def plot(self):
@@ -106,10 +150,10 @@ class Plotter:
                 self.plot_bars(datas)
             elif tpe == DataType.PERIOD:
                 self.plot_periods(datas)
-        self.legend(Config().plot.legend_loc)
+        self.legend(self.settings.legend_loc)
         if self.plot_type is not PlotType.PERIOD:
             self.ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-        if Config().plot.show_today:
+        if self.settings.show_today:
             self.ax.axvline(datetime.date.today(), c="r", lw=2)
         self.ax.relim()
         self.ax.autoscale()
@@ -173,7 +217,7 @@ class Plotter:
             if self.plot_type == PlotType.MIXED:
                 self.legend_labels.append(_(data.description))
             else:
-                self.legend_labels.append(data.report.final_label)
+                self.legend_labels.append(data.label)
 
     def plot_bars(self, data_list: list[FinalData]):
         """plots some bars
@@ -184,14 +228,14 @@ class Plotter:
             data as returned by a Transformer
         """
         n = len(data_list)
-        total_width = datetime.timedelta(1) / 1.1
+        total_width = 1 / 1.1
         offset = total_width / n
         start = 0.5 * (-total_width + offset)
+        self.ax.xaxis_date()
         for i, data in enumerate(data_list):
             self.update_ymax(data.x, data.y)
-            x = np.array([datetime.datetime(d.year, d.month, d.day) for d in data.x])
             cont = self.ax.bar(
-                x + start + i * offset,
+                mdates.date2num(data.x) + start + i * offset,
                 data.y,
                 offset,
                 color=next(self.bar_colors),
@@ -215,8 +259,9 @@ class Plotter:
     def plot_many_periods(self, data_list):
         labels = []
         for i, data in enumerate(data_list):
-            labels.append(data.report.final_label)
-            for start, end, ppl in zip(data.x[::2], data.x[1::2], data.y[::2]):
+            labels.append(data.label)
+            x = data.x.tolist()
+            for start, end in zip(x[::2], x[1::2]):
                 self.ax.plot([start, end], [i, i], c="k")
                 self.ax.plot([start, start], [i - 0.1, i + 0.1], c="k")
                 self.ax.plot([end, end], [i - 0.1, i + 0.1], c="k")
@@ -228,7 +273,9 @@ class Plotter:
         all_periods_s = []
         h = 0.7
         line = None
-        for start, end, ppl in zip(data.x[::2], data.x[1::2], data.y[::2]):
+        # few periods, described one by one with datetime.date objects
+        x = data.x.tolist()
+        for start, end, ppl in zip(x[::2], x[1::2], data.y[::2].tolist()):
             if self.lims and (start > self.lims[1] or end < self.lims[0]):
                 continue
             s = fmt_period_short(start, end, ppl)
@@ -244,7 +291,7 @@ class Plotter:
             self.ax.plot([start, start], [h - 0.02, h + 0.02], c="k", transform=tr)
             self.ax.plot([end, end], [h - 0.02, h + 0.02], c="k", transform=tr)
 
-        if Config().plot.show_periods_info:
+        if self.settings.show_periods_info:
             for x, y, per in all_periods_s:
                 self.period_info(per, x, y)
         if line:
@@ -266,6 +313,83 @@ class Plotter:
         )
 
 
+class FigurePool:
+    """
+    Hands out Figure objects, each attached to its own Agg canvas, and takes them back
+    once a plot has been rendered. Figures are cleared and resized between uses and are
+    never registered with pyplot, so rendering any number of plots uses a constant
+    amount of memory.
+
+    Example
+    -------
+    ```
+    with FIGURE_POOL.figure((8, 4), dpi=200) as fig:
+        ax = fig.add_subplot(111)
+        ...
+    ```
+    """
+
+    max_size: int
+    _free: list[Figure]
+
+    def __init__(self, max_size: int = 4):
+        self.max_size = max_size
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, figsize: tuple[float, float] = None, dpi: float = None) -> Figure:
+        """returns a blank figure of the requested size. It must be given back
+        with `release` once it's not needed anymore"""
+        with self._lock:
+            fig = self._free.pop() if self._free else None
+        if fig is None:
+            fig = Figure(tight_layout=True)
+            FigureCanvasAgg(fig)
+        fig.set_size_inches(figsize or Config().plot.figsize, forward=False)
+        fig.set_dpi(dpi or rcParams["figure.dpi"])
+        return fig
+
+    def release(self, fig: Figure):
+        fig.clear()
+        with self._lock:
+            if len(self._free) < self.max_size and fig not in self._free:
+                self._free.append(fig)
+
+    @contextmanager
+    def figure(
+        self, figsize: tuple[float, float] = None, dpi: float = None
+    ) -> Iterator[Figure]:
+        fig = self.acquire(figsize, dpi)
+        try:
+            yield fig
+        finally:
+            self.release(fig)
+
+
+FIGURE_POOL = FigurePool()
+
+
+@contextmanager
+def rendering(
+    data_set: DataSet,
+    figsize: tuple[float, float] = None,
+    dpi: float = EXPORT_DPI,
+    settings: RunSettings = None,
+) -> Iterator[Plotter]:
+    """plots a data set on a pooled figure. The figure is reset and given back
+    to the pool when leaving the context, so the Plotter must not be used afterwards.
+
+    Example
+    -------
+    ```
+    with rendering(data_set, dpi=EXPORT_DPI) as plotter:
+        png = plotter.as_bytes()
+    ```
+    """
+    with FIGURE_POOL.figure(figsize, dpi) as fig:
+        yield Plotter(data_set, fig.add_subplot(111), settings)
+
+
 def fmt_period_short(start: datetime.date, end: datetime.date, people: int) -> str:
     num_days = (end - start).days + 1
     days = _("{days} d.").format(days=num_days)
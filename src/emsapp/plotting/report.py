@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import datetime
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from emsapp.config import Config, RunSettings
+from emsapp.const import DATE_OUTPUT_FMT
+from emsapp.data import DataSet, DataType
+from emsapp.i18n import _
+from emsapp.plotting.plotter import FIGURE_POOL, Plotter
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+MARGIN = 0.6
+TITLE_SIZE = 14
+TEXT_SIZE = 9
+LINE_SPACING = 1.6
+
+
+@dataclass
+class TextPage:
+    title: str
+    lines: list[tuple[str, str]] = field(default_factory=list)
+
+
+class PdfReport:
+    """
+    Writes a list of DataSet to a single multi-page pdf file. One figure is taken
+    from the pool and reused for every page so that memory usage doesn't depend on
+    the number of plots.
+
+    The report is made of a table of contents, one page per data set and, if
+    any of the data sets shows periods, an appendix listing them.
+    """
+
+    figsize: tuple[float, float]
+    data_sets: list[DataSet]
+    settings: RunSettings
+    fig: Figure = None
+
+    def __init__(
+        self,
+        data_sets: Iterable[DataSet],
+        figsize: tuple[float, float] = None,
+        settings: RunSettings = None,
+    ):
+        self.data_sets = list(data_sets)
+        self.settings = settings or Config().snapshot()
+        self.figsize = figsize or self.settings.figsize
+
+    @property
+    def lines_per_page(self) -> int:
+        h = self.figsize[1]
+        line_height = TEXT_SIZE * LINE_SPACING / 72
+        return max(1, int((h - 2 * MARGIN) / line_height) - 3)
+
+    @property
+    def has_periods(self) -> bool:
+        return any(d.data_type is DataType.PERIOD for ds in self.data_sets for d in ds)
+
+    def toc_pages(self) -> list[TextPage]:
+        """returns the table of contents, already split into pages"""
+        lines = [(ds.title, "") for ds in self.data_sets]
+        if self.has_periods:
+            lines.append((_("Periods description"), ""))
+
+        n = self.lines_per_page
+        num_pages = (len(lines) - 1) // n + 1
+        lines = [
+            (title, str(num_pages + i + 1)) for i, (title, _page) in enumerate(lines)
+        ]
+        today = _(DATE_OUTPUT_FMT).format(dt=datetime.date.today())
+        return [
+            TextPage(_("Contents ({date})").format(date=today), lines[i : i + n])
+            for i in range(0, len(lines), n)
+        ]
+
+    def write(self, path: os.PathLike, progress: Callable[[int, int], None] = None):
+        """writes the report
+
+        Parameters
+        ----------
+        path : os.PathLike
+            destination pdf file
+        progress : Callable[[int, int], None], optional
+            called with (number of plots done, total number of plots) after each plot
+        """
+        periods: list[tuple[str, str]] = []
+        total = len(self.data_sets)
+        with FIGURE_POOL.figure(self.figsize) as self.fig, PdfPages(path) as pdf:
+            for page in self.toc_pages():
+                self.draw_text_page(page)
+                pdf.savefig(self.fig)
+
+            for i, data_set in enumerate(self.data_sets):
+                info = self.draw_plot_page(data_set)
+                pdf.savefig(self.fig)
+                if info:
+                    periods.append((data_set.title, ""))
+                    periods.extend(("", line) for line in info.splitlines())
+                if progress:
+                    progress(i + 1, total)
+
+            if self.has_periods:
+                if not periods:
+                    periods.append((_("No period in the selected date range"), ""))
+                n = self.lines_per_page
+                for i in range(0, len(periods), n):
+                    self.draw_text_page(
+                        TextPage(_("Periods description"), periods[i : i + n])
+                    )
+                    pdf.savefig(self.fig)
+        self.fig = None
+        logger.info("exported %d plots to %s", total, path)
+
+    def draw_plot_page(self, data_set: DataSet) -> str:
+        """draws one data set on the shared figure and returns the description
+        of the periods shown on it"""
+        self.fig.clear()
+        ax = self.fig.add_subplot(111)
+        plotter = Plotter(data_set, ax, self.settings)
+        self.fig.suptitle(data_set.title, fontsize=TITLE_SIZE)
+        return plotter.extra_info
+
+    def draw_text_page(self, page: TextPage):
+        """draws a page of text made of (left, right) pairs of strings"""
+        self.fig.clear()
+        w, h = self.fig.get_size_inches()
+        x_left = MARGIN / w
+        x_right = 1 - MARGIN / w
+        y = 1 - MARGIN / h
+        self.fig.text(x_left, y, page.title, fontsize=TITLE_SIZE, va="top")
+        y -= 3 * TEXT_SIZE * LINE_SPACING / 72 / h
+        for left, right in page.lines:
+            if left:
+                self.fig.text(x_left, y, left, fontsize=TEXT_SIZE, va="top")
+            if right:
+                self.fig.text(
+                    x_right, y, right, fontsize=TEXT_SIZE, va="top", ha="right"
+                )
+            y -= TEXT_SIZE * LINE_SPACING / 72 / h
+
+
+def export_pdf(
+    data_sets: Iterable[DataSet],
+    path: os.PathLike,
+    progress: Callable[[int, int], None] = None,
+    figsize: Optional[tuple[float, float]] = None,
+    settings: Optional[RunSettings] = None,
+):
+    """writes all data sets in a single pdf file. See PdfReport"""
+    PdfReport(data_sets, figsize, settings).write(path, progress)
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
 import importlib
+import importlib.metadata
 import importlib.util
 import os
+from collections import defaultdict
 from pathlib import Path
-from typing import Callable, Generic, TypeVar, Union
+from typing import Any, Callable, Generic, Optional, TypeVar, Union
 
-from emsapp.config import Config
-from emsapp.data.loading import DataLoaderFactory
 from emsapp.utils import get_logger
+from emsapp.validators import register_valid
 
 logger = get_logger(__name__)
 
 T = TypeVar("T")
 
+KINDS = ["filter", "splitter", "transformer", "grouper", "data_loader"]
+ENTRY_POINT_GROUP = "emsapp.{kind}"
+
 
 class PluginLoadError(ImportError):
     ...
@@ -25,6 +29,156 @@ class PlugginInterface(Generic[T]):
         ...
 
 
+class PluginRegistry:
+    """
+    Single registry for everything that can be provided by a plugin : data loaders and
+    each kind of stage of a process (filter, splitter, transformer, grouper).
+
+    Classes can be registered directly or by reference ("package.module:ClassName").
+    Referenced modules are only imported the first time the corresponding name is
+    requested, so plugins that are never used cost nothing at startup. References are
+    found in the `emsapp.<kind>` entry point groups of installed packages, where the
+    entry point name is the name under which the class is registered (the file
+    extension for data loaders). For example, in the setup.cfg of a plugin package :
+
+    ```
+    [options.entry_points]
+    emsapp.transformer =
+        weekly = my_plugin.transformers:WeeklyTransformer
+    emsapp.data_loader =
+        .csv = my_plugin.loaders:CsvDataLoader
+    ```
+    """
+
+    _loaded: dict[str, dict[str, type]]
+    _lazy: dict[str, dict[str, str]]
+    _pending: dict[str, list[str]]
+    _discovered: bool
+
+    def __init__(self):
+        self._loaded = defaultdict(dict)
+        self._lazy = defaultdict(dict)
+        self._pending = defaultdict(list)
+        self._discovered = False
+
+    def register(self, kind: str, name: str, new_cls: type):
+        """registers a class that is already imported"""
+        self._loaded[kind][name] = new_cls
+        self._lazy[kind].pop(name, None)
+        self._register_valid(kind, name)
+
+    def register_lazy(self, kind: str, name: str, reference: str):
+        """registers a class by reference ("package.module:ClassName") without
+        importing it"""
+        if name in self._loaded[kind]:
+            return
+        self._lazy[kind][name] = reference
+        self._register_valid(kind, name)
+
+    def add_module(self, kind: str, mod_descr: Union[os.PathLike, str]):
+        """adds a plugin module exposing a `register` function. Since the names it
+        provides are only known once it's imported, the module is imported the first
+        time a name of that kind cannot be found otherwise."""
+        mod_descr = str(mod_descr)
+        known_modules = {ref.split(":")[0] for ref in self._lazy[kind].values()}
+        known_modules.update(c.__module__ for c in self._loaded[kind].values())
+        if mod_descr in known_modules:
+            logger.debug("plugin %r already registered by reference", mod_descr)
+            return
+        if mod_descr not in self._pending[kind]:
+            self._pending[kind].append(mod_descr)
+
+    def get(self, kind: str, name: str) -> Optional[type]:
+        """returns the class registered under name, importing it if necessary.
+        Raises PluginLoadError if it's registered by reference but can't be
+        imported, in which case the reference is kept and the import tried again
+        the next time"""
+        if name in self._loaded[kind]:
+            return self._loaded[kind][name]
+        if name in self._lazy[kind]:
+            reference = self._lazy[kind][name]
+            try:
+                self._loaded[kind][name] = _load_reference(reference)
+            except Exception as e:
+                logger.error("Error while importing %s", reference, exc_info=True)
+                raise PluginLoadError(f"cannot import {reference} : {e}") from e
+            del self._lazy[kind][name]
+            return self._loaded[kind][name]
+        if self._pending[kind]:
+            self.import_pending(kind)
+            return self._loaded[kind].get(name)
+        return None
+
+    def names(self, kind: str) -> list[str]:
+        """returns all the names registered for this kind of plugin, without
+        importing anything that is registered by reference"""
+        self.import_pending(kind)
+        return [*self._loaded[kind], *self._lazy[kind]]
+
+    def __contains__(self, item: tuple[str, str]) -> bool:
+        kind, name = item
+        if name in self._loaded[kind] or name in self._lazy[kind]:
+            return True
+        self.import_pending(kind)
+        return name in self._loaded[kind]
+
+    def discover(self):
+        """registers, by reference, the plugins declared through entry points by
+        installed packages. Only runs once."""
+        if self._discovered:
+            return
+        self._discovered = True
+        all_entry_points = importlib.metadata.entry_points()
+        for kind in KINDS:
+            group = ENTRY_POINT_GROUP.format(kind=kind)
+            if hasattr(all_entry_points, "select"):
+                entry_points = all_entry_points.select(group=group)
+            else:
+                entry_points = all_entry_points.get(group, [])
+            for entry_point in entry_points:
+                self.register_lazy(kind, entry_point.name, entry_point.value)
+                logger.debug("found %s plugin %r", kind, entry_point.name)
+
+    def import_pending(self, kind: str):
+        while self._pending[kind]:
+            mod_descr = self._pending[kind].pop(0)
+            try:
+                import_plugin(mod_descr, self.registration_callback(kind))
+            except ImportError:
+                logger.error("Error while importing %s", mod_descr, exc_info=True)
+
+    def registration_callback(self, kind: str) -> Callable[[tuple[Any, type]], None]:
+        """returns a function registering the output of a plugin's `register`
+        function, i.e. a (name(s), class) tuple"""
+
+        def register_spec(spec: tuple[Union[str, tuple[str]], type]):
+            names, new_cls = spec
+            if isinstance(names, str):
+                names = (names,)
+            for name in names:
+                self.register(kind, name, new_cls)
+
+        return register_spec
+
+    @staticmethod
+    def _register_valid(kind: str, name: str):
+        if kind != "data_loader":
+            register_valid(f"{kind}_type", name)
+
+
+REGISTRY = PluginRegistry()
+
+
+def _load_reference(reference: str) -> Any:
+    mod_name, _sep, attr = reference.partition(":")
+    obj = importlib.import_module(mod_name.strip())
+    for part in attr.strip().split("."):
+        if part:
+            obj = getattr(obj, part)
+    logger.debug("loaded plugin %r", reference)
+    return obj
+
+
 def _load_module(mod_descr) -> PlugginInterface:
     mod_path = Path(mod_descr)
     if mod_path.is_file():
@@ -38,10 +192,10 @@ def _load_module(mod_descr) -> PlugginInterface:
             spec.loader.exec_module(mod)
         except Exception as e:
             raise PluginLoadError(str(e)) from None
-        logger.debug(f"loaded module from file {mod_path} as {new_mod_name!r}")
+        logger.debug("loaded module from file %s as %r", mod_path, new_mod_name)
     else:
         mod = importlib.import_module(mod_descr)
-        logger.debug(f"Loaded module {mod_descr!r}")
+        logger.debug("Loaded module %r", mod_descr)
     return mod
 
 
@@ -55,10 +209,23 @@ def import_plugin(descr: Union[os.PathLike, str], register_fn: Callable[[T], Non
 
 
 def load_all_plugins():
-    for plugin in Config().plugins.data_loader:
-        try:
-            import_plugin(plugin, DataLoaderFactory.register)
-        except (PluginLoadError, ModuleNotFoundError):
-            msg = f"Error while importing {plugin}"
-            logger.error(msg, exc_info=True)
-            continue
+    """
+    Registers the plugins listed in the config and the ones declared through entry
+    points. Each entry of the config can either be a reference of the form
+    "name = package.module:ClassName", which is imported on first use, or a module
+    (or path to a python file) exposing a `register` function. Modules providing data
+    loaders are only imported when an unknown extension is requested while other
+    modules are imported right away, since processes refer to them by name.
+    """
+    from emsapp.config import Config
+
+    REGISTRY.discover()
+    for kind in KINDS:
+        for plugin in getattr(Config().plugins, kind):
+            name, sep, reference = plugin.partition("=")
+            if sep:
+                REGISTRY.register_lazy(kind, name.strip(), reference.strip())
+            else:
+                REGISTRY.add_module(kind, plugin)
+        if kind != "data_loader":
+            REGISTRY.import_pending(kind)
@@ -1,14 +1,36 @@
-import matplotlib
-import pkg_resources
-import PyQt5
-from matplotlib.pyplot import style
-
-from emsapp.data import process
-from emsapp.plugin import load_all_plugins
-
-load_all_plugins()
-matplotlib.set_loglevel("info")
-matplotlib.use("Qt5Agg")
-style.use(
-    pkg_resources.resource_filename("emsapp", "package_data/default_style.mplstyle")
-)
+"""
+Initialisation steps of the GUI, split so that the main window can be shown before
+the heavy modules (matplotlib, data loaders) are imported.
+"""
+
+from emsapp.utils import package_path, setup_logging
+
+_plotting_ready = False
+
+
+def configure_logging():
+    """applies the log level of the config"""
+    from emsapp.config import Config
+
+    setup_logging(Config().log.level)
+
+
+def load_plugins():
+    """registers the plugins. Modules are only imported when first used"""
+    from emsapp.plugin import load_all_plugins
+
+    load_all_plugins()
+
+
+def init_plotting():
+    """imports and configures matplotlib. Can safely be called more than once"""
+    global _plotting_ready
+    if _plotting_ready:
+        return
+    import matplotlib
+    import matplotlib.style
+
+    matplotlib.set_loglevel("info")
+    matplotlib.use("Qt5Agg")
+    matplotlib.style.use(package_path("package_data/default_style.mplstyle"))
+    _plotting_ready = True
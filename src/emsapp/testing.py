@@ -0,0 +1,211 @@
+"""
+Seeded generator of synthetic EMIR-like data, so that the whole pipeline can be
+measured and tested without access to the real (confidential) database. Used by
+the benchmarks and the tests.
+
+The cardinalities roughly follow the real data : about a hundred institutions
+spread over the communes of the 7 districts, mostly EMS, a handful of roles, and
+cases clustered in outbreaks over two years.
+
+Example
+-------
+```
+data = SyntheticData(100_000)
+entries = load_data(data.loader(), data.settings())
+data.write_xlsx("synthetic.xlsx")
+```
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import os
+import random
+import tempfile
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable
+
+from emsapp.config import Config, DataConfig, RunSettings
+from emsapp.const import DISTRICTS
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+SEED = 12345
+
+FIRST_DAY = datetime.date(2020, 3, 1)
+NUM_DAYS = 730
+NUM_INSTITUTIONS = 120
+NUM_LOCATIONS = 150
+ROLES = [
+    ("Résident", 0.55),
+    ("Collaborateur", 0.35),
+    ("Collaborateur autre", 0.07),
+    ("Visiteur", 0.03),
+]
+INSTITUTION_TYPES = [
+    ("EMS", 0.7),
+    ("Foyer", 0.15),
+    ("Hôpital", 0.1),
+    ("Clinique", 0.05),
+]
+TABLE_NAME = "ci"
+# files written by the cached_* methods
+CACHE_DIR = Path(
+    os.environ.get("EMSAPP_BENCH_DATA")
+    or Path(tempfile.gettempdir()) / "emsapp_synthetic"
+)
+
+
+def _weighted(rng: random.Random, choices: list[tuple[str, float]], k: int):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights, k=k)
+
+
+class SyntheticData:
+    """
+    Deterministic table of `num_rows` cases, with the column names of the default
+    config. Rows are generated once and shared by every loader created from it.
+    """
+
+    num_rows: int
+    seed: int
+    config: DataConfig
+    locations: dict[str, str]
+
+    def __init__(self, num_rows: int, seed: int = SEED):
+        self.num_rows = num_rows
+        self.seed = seed
+        self.config = Config.default().data.copy(
+            update=dict(table_name=TABLE_NAME, db_path=Path(f"synthetic_{num_rows}"))
+        )
+        rng = random.Random(seed)
+        self.locations = {
+            f"Commune {i:03d}": rng.choice(DISTRICTS) for i in range(NUM_LOCATIONS)
+        }
+        locations = list(self.locations)
+        institution_types = _weighted(rng, INSTITUTION_TYPES, NUM_INSTITUTIONS)
+        self.institutions = [
+            (f"{tpe} {i:03d}", tpe, rng.choice(locations))
+            for i, tpe in enumerate(institution_types)
+        ]
+        self._rows = None
+
+    @property
+    def headers(self) -> list[str]:
+        return self.config.columns
+
+    @property
+    def rows(self) -> list[list]:
+        if self._rows is None:
+            self._rows = self._generate()
+        return self._rows
+
+    def _generate(self) -> list[list]:
+        rng = random.Random(self.seed + 1)
+        # each institution goes through a few outbreaks, during which cases
+        # start within a couple of weeks of each other
+        outbreaks = [
+            (inst, rng.randrange(NUM_DAYS))
+            for inst in self.institutions
+            for _i in range(rng.randint(2, 8))
+        ]
+        roles = _weighted(rng, ROLES, self.num_rows)
+        rows = []
+        for role in roles:
+            (name, tpe, location), day = rng.choice(outbreaks)
+            start = FIRST_DAY + datetime.timedelta(
+                min(NUM_DAYS, max(0, day + int(rng.gauss(0, 5))))
+            )
+            end = start + datetime.timedelta(rng.randint(5, 14))
+            rows.append([start, end, role, name, tpe, location])
+        return rows
+
+    def settings(self) -> RunSettings:
+        """snapshot of the default config pointing to this data, with every district
+        already known so that nothing is asked to the user"""
+        settings = Config.default().snapshot()
+        return dataclasses.replace(
+            settings, data=self.config, districts=MappingProxyType(self.locations)
+        )
+
+    def loader(self) -> SyntheticDataLoader:
+        return SyntheticDataLoader(self)
+
+    def write_xlsx(self, path: os.PathLike) -> Path:
+        """writes the data as a table of an excel file, as exported from EMIR"""
+        import openpyxl
+        from openpyxl.utils import get_column_letter
+        from openpyxl.worksheet.table import Table, TableColumn
+
+        path = Path(path)
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(TABLE_NAME)
+        ws.append(self.headers)
+        for row in self.rows:
+            ws.append(row)
+        ref = f"A1:{get_column_letter(len(self.headers))}{len(self.rows) + 1}"
+        table = Table(displayName=TABLE_NAME, ref=ref)
+        table.tableColumns = [
+            TableColumn(id=i + 1, name=name) for i, name in enumerate(self.headers)
+        ]
+        ws.add_table(table)
+        wb.save(path)
+        return path
+
+    def write_csv(self, path: os.PathLike) -> Path:
+        """writes the data as a csv file, with dates formatted as in the exports"""
+        import csv
+
+        path = Path(path)
+        with open(path, "w", encoding="utf-8-sig", newline="") as file:
+            writer = csv.writer(file, delimiter=";")
+            writer.writerow(self.headers)
+            for start, end, *others in self.rows:
+                writer.writerow(
+                    [start.strftime("%d.%m.%Y"), end.strftime("%d.%m.%Y"), *others]
+                )
+        return path
+
+    def cached_xlsx(self) -> Path:
+        """path to the excel version of the data, written the first time only"""
+        return self._cached(".xlsx", self.write_xlsx)
+
+    def cached_csv(self) -> Path:
+        """path to the csv version of the data, written the first time only"""
+        return self._cached(".csv", self.write_csv)
+
+    def cached_parquet(self) -> Path:
+        """path to the parquet version of the data, sorted by start date, written
+        the first time only. Requires pyarrow"""
+        from emsapp.data.loaders.arrow_loader import write_table
+
+        return self._cached(
+            ".parquet",
+            lambda path: write_table(
+                path, self.headers, self.rows, sort_by=self.config.col_date_start
+            ),
+        )
+
+    def _cached(self, suffix: str, write: Callable[[os.PathLike], Path]) -> Path:
+        path = CACHE_DIR / f"synthetic_{self.num_rows}_{self.seed}{suffix}"
+        if not path.exists():
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            write(path.with_suffix(f".tmp{suffix}")).replace(path)
+        return path
+
+
+class SyntheticDataLoader:
+    """in-memory data loader serving a SyntheticData table"""
+
+    def __init__(self, data: SyntheticData):
+        self.data = data
+
+    def tables(self, config: DataConfig) -> list[str]:
+        return [TABLE_NAME]
+
+    def headers(self, config: DataConfig) -> list[str]:
+        return self.data.headers
+
+    def load_data(self, config: DataConfig) -> tuple[list[str], list[list]]:
+        return self.data.headers, self.data.rows
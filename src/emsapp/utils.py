@@ -1,25 +1,263 @@
 """python convenience objects that have nothing to do with the topic of the project"""
 
+import atexit
+import importlib.resources
 import inspect
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Optional, Union
 
-import pkg_resources
 
-LOG_FILE = pkg_resources.resource_filename("emsapp", "logs/emsapp.log")
-Path(LOG_FILE).parent.mkdir(exist_ok=True)
-ROT_FILE_HANDLER = RotatingFileHandler(
-    LOG_FILE, maxBytes=512000, backupCount=5, encoding="utf-8"
-)
+def package_path(resource: str) -> Path:
+    """returns the path to a file of the emsapp package. The package is installed
+    unzipped (zip_safe = False) so the resources are regular files.
 
+    Example
+    -------
+    ```
+    package_path("package_data/default_config.toml")
+    ```
+    """
+    return Path(str(importlib.resources.files("emsapp"))) / resource
+
+
+def user_data_dir() -> Path:
+    """per-user directory of the files written by the app, such as the log. Can be
+    set with the EMSAPP_DATA_DIR environment variable"""
+    if os.environ.get("EMSAPP_DATA_DIR"):
+        return Path(os.environ["EMSAPP_DATA_DIR"])
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Application Support"
+    else:
+        base = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(base) / "emsapp"
+
+
+LOG_FILE = user_data_dir() / "emsapp.log"
+RUN_REPORT_FILE = LOG_FILE.with_name("last_run.json")
+LOG_FORMAT = "%(asctime)s %(levelname)-8s %(name)s: %(message)s"
+DEFAULT_LOG_LEVEL = "INFO"
+APP_LOGGER = "emsapp"
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Rate limits similar log records, i.e. records coming from the same place with
+    the same (unformatted) message. Only `burst` of them are let through every
+    `period` seconds. The number of records that were dropped is added to the next
+    one that goes through as its `dropped_similar` attribute, for `LogFormatter`
+    to show, or logged by `flush`. Errors are never dropped.
+    """
+
+    def __init__(self, burst: int = 5, period: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._lock = threading.Lock()
+        # key -> [start of the current period, records let through, records dropped]
+        self._counts: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno, record.msg)
+        now = record.created
+        with self._lock:
+            counts = self._counts.setdefault(key, [now, 0, 0])
+            if now - counts[0] > self.period:
+                if counts[2]:
+                    record.dropped_similar = counts[2]
+                counts[:] = [now, 0, 0]
+            if counts[1] >= self.burst:
+                counts[2] += 1
+                return False
+            counts[1] += 1
+        return True
+
+    def flush(self, logger: logging.Logger = None):
+        """logs how many records were dropped since the last time each of them went
+        through. Called when the program exits"""
+        with self._lock:
+            dropped = [(k, c[2]) for k, c in self._counts.items() if c[2]]
+            self._counts.clear()
+        for (name, level, _path, _line, msg), num in dropped:
+            (logger or logging.getLogger(name)).log(
+                level, "%d more messages like %r were dropped", num, msg
+            )
+
+
+class LogFormatter(logging.Formatter):
+    """adds the number of similar records dropped by `RepeatFilter` to the message"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        text = super().formatMessage(record)
+        dropped = getattr(record, "dropped_similar", 0)
+        if dropped:
+            text += f" (+{dropped} similar messages dropped)"
+        return text
+
+
+class _LocalQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # records never leave the process, so there is no need to format them
+        # in the calling thread to make them picklable
+        return record
+
+
+REPEAT_FILTER = RepeatFilter()
+_log_queue = queue.SimpleQueue()
+_queue_handler = _LocalQueueHandler(_log_queue)
+_queue_handler.addFilter(REPEAT_FILTER)
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: Union[str, int] = None):
+    """sends the log records of the emsapp loggers to the log file, through a queue
+    that is emptied by a background thread so that logging never waits for the disk.
+    Records of other libraries are left to them. Can be called again to change
+    the level"""
+    global _listener
+    app_logger = logging.getLogger(APP_LOGGER)
+    if _listener is None:
+        LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            LOG_FILE, maxBytes=512000, backupCount=5, encoding="utf-8", delay=True
+        )
+        file_handler.setFormatter(LogFormatter(LOG_FORMAT))
+        _listener = QueueListener(_log_queue, file_handler, respect_handler_level=True)
+        app_logger.addHandler(_queue_handler)
+        _listener.start()
+        atexit.register(_stop_logging)
+        if level is None:
+            level = DEFAULT_LOG_LEVEL
+    if level is not None:
+        app_logger.setLevel(level)
 
-def get_logger(name=None):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    if ROT_FILE_HANDLER not in logger.handlers:
-        logger.addHandler(ROT_FILE_HANDLER)
-    return logger
+
+def _stop_logging():
+    REPEAT_FILTER.flush()
+    _listener.stop()
+
+
+def get_logger(name=None) -> logging.Logger:
+    """returns a logger whose records end up in the log file once `setup_logging`
+    has been called, the emsapp logger by default. The level is set globally, so
+    messages should be formatted lazily : `logger.debug("loaded %d rows", n)`
+    rather than with an f-string"""
+    return logging.getLogger(name or APP_LOGGER)
+
+
+def atomic_write(path: os.PathLike, text: str, encoding: str = "utf-8"):
+    """writes text to a temporary file next to path, then renames it. path
+    thus either contains the previous content or the new one, never a partial write"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DebouncedWriter:
+    """
+    Coalesces frequent requests to save a file. The content is only written, by a
+    background thread, once no new request came in for `delay` seconds. It is
+    produced by the caller, so that the background thread never reads objects that
+    may be modified meanwhile. Pending changes are written when the interpreter
+    exits or when `flush` is called.
+
+    Example
+    -------
+    ```
+    writer = DebouncedWriter("state.json", delay=1.0)
+    for i in range(1000):
+        state["i"] = i
+        writer.schedule(json.dumps(state)) # file written once, 1s later
+    writer.flush()
+    ```
+    """
+
+    path: Path
+    delay: float
+
+    def __init__(self, path: os.PathLike, delay: float = 1.0):
+        self.path = Path(path)
+        self.delay = delay
+        self._pending: Optional[str] = None
+        self._deadline = 0.0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        atexit.register(self.flush)
+
+    @property
+    def dirty(self) -> bool:
+        """whether a write is pending"""
+        return self._pending is not None
+
+    def schedule(self, text: str):
+        """requests a write of text, the whole content of the file"""
+        with self._cond:
+            self._pending = text
+            self._deadline = time.monotonic() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"writer {self.path.name}", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """writes pending changes right away, in the calling thread"""
+        self._write_pending()
+
+    def write_now(self, text: str):
+        """discards pending changes and writes text right away"""
+        with self._cond:
+            self._pending = None
+        with self._write_lock:
+            atomic_write(self.path, text)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                while (remaining := self._deadline - time.monotonic()) > 0:
+                    self._cond.wait(remaining)
+            self._write_pending()
+
+    def _write_pending(self):
+        with self._write_lock:
+            with self._cond:
+                text, self._pending = self._pending, None
+            if text is None:
+                return
+            try:
+                atomic_write(self.path, text)
+            except Exception:
+                get_logger(__name__).error(
+                    "could not write %s", self.path, exc_info=True
+                )
 
 
 class AutoList:
@@ -0,0 +1,20 @@
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from PyQt5 import QtCore
+
+from emsapp.config import Config
+
+
+class MplCanvas(FigureCanvasQTAgg):
+    fig: Figure
+    ax: Axes
+    fig_size: QtCore.QSize
+
+    def __init__(self, parent=None):
+        w, h = Config().plot.figsize
+        self.fig = Figure(figsize=(w, h), tight_layout=True)
+        dpi = self.fig.dpi
+        self.ax = self.fig.add_subplot(111)
+        self.fig_size = QtCore.QSize(int(self.fig.dpi * w), int(self.fig.dpi * h))
+        super().__init__(self.fig)
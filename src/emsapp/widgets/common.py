@@ -2,8 +2,9 @@ from __future__ import annotations
 
 from typing import Iterable, Optional, TypeVar
 
+import numpy as np
 from PyQt5.QtCore import QSortFilterProxyModel, Qt, pyqtSignal, QObject, QEvent
-from PyQt5.QtGui import QMouseEvent, QShowEvent, QKeyEvent
+from PyQt5.QtGui import QImage, QMouseEvent, QShowEvent, QKeyEvent
 from PyQt5.QtWidgets import (
     QApplication,
     QComboBox,
@@ -251,3 +252,13 @@ def get_user_input(msg: str, parent=None) -> Optional[str]:
     if parent:
         parent.activateWindow()
     return input_win.value
+
+
+def rgba_to_qimage(pixels: np.ndarray) -> QImage:
+    """converts a (height, width, 4) uint8 array, as returned by Plotter.as_rgba,
+    into a QImage that owns its own copy of the pixels"""
+    height, width, _n = pixels.shape
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    return QImage(
+        pixels.data, width, height, pixels.strides[0], QImage.Format_RGBA8888
+    ).copy()
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import os
+from typing import Any
+
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer
+from PyQt5.QtWidgets import (
+    QApplication,
+    QDialog,
+    QFileDialog,
+    QGridLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QTableView,
+    QTextEdit,
+)
+
+from emsapp.const import MSG_DURATION
+from emsapp.data import DataSet, FinalData
+from emsapp.i18n import _
+from emsapp.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def format_column(arr: np.ndarray) -> list[str]:
+    """converts a whole column to strings at once"""
+    if arr.dtype.kind == "M":
+        return np.datetime_as_string(arr, unit="D").tolist()
+    if arr.dtype.kind == "O":
+        return [v.isoformat() if isinstance(v, datetime.date) else str(v) for v in arr]
+    return arr.astype(str).tolist()
+
+
+def format_value(value: Any) -> str:
+    if isinstance(value, np.datetime64):
+        return np.datetime_as_string(value, unit="D")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+class FinalDataTableModel(QAbstractTableModel):
+    """
+    Shows the x and y values of each FinalData of a DataSet as a pair of columns.
+    Cells are read from the arrays only when the view asks for them, so opening
+    the table costs the same whatever the length of the series.
+    """
+
+    data_set: DataSet
+    series: list[FinalData]
+    num_rows: int
+
+    def __init__(self, data_set: DataSet, parent=None):
+        super().__init__(parent)
+        self.data_set = data_set
+        self.series = list(data_set)
+        self.num_rows = max((len(d.x) for d in self.series), default=0)
+
+    def series_label(self, data: FinalData) -> str:
+        label = _(data.description)
+        if data.label:
+            label = f"{data.label} - {label}"
+        return label
+
+    def headers(self) -> list[str]:
+        out = []
+        for data in self.series:
+            label = self.series_label(data)
+            out.append(f"{label} ({_('date')})")
+            out.append(f"{label} ({_('value')})")
+        return out
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.num_rows
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else 2 * len(self.series)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        data = self.series[index.column() // 2]
+        row = index.row()
+        if row >= len(data.x):
+            return None
+        arr = data.y if index.column() % 2 else data.x
+        return format_value(arr[row])
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Vertical:
+            return str(section + 1)
+        data = self.series[section // 2]
+        kind = _("value") if section % 2 else _("date")
+        return f"{self.series_label(data)}\n{kind}"
+
+    def to_csv(self, delimiter: str = ",") -> str:
+        """returns the whole table as csv, converting each column in one go"""
+        columns = []
+        for data in self.series:
+            for arr in (data.x, data.y):
+                column = format_column(np.asarray(arr))
+                column.extend([""] * (self.num_rows - len(column)))
+                columns.append(column)
+        with io.StringIO() as buffer:
+            writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+            writer.writerow(self.headers())
+            writer.writerows(zip(*columns))
+            return buffer.getvalue()
+
+
+class DataView(QDialog):
+    """dialog showing all the values of a DataSet, along with extra information
+    such as the description of periods"""
+
+    model: FinalDataTableModel
+
+    def __init__(self, data_set: DataSet, extra_info: str = "", parent=None):
+        super().__init__(parent)
+        self.model = FinalDataTableModel(data_set, self)
+        table = QTableView(self)
+        table.setModel(self.model)
+        v_header = table.verticalHeader()
+        v_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        v_header.setDefaultSectionSize(table.fontMetrics().height() + 6)
+
+        self.b_copy = QPushButton(_("Copy"))
+        self.b_export = QPushButton(_("Export to csv..."))
+        self.b_ok = QPushButton(_("ok"))
+        self.b_copy.clicked.connect(self.copy)
+        self.b_export.clicked.connect(self.export)
+        self.b_ok.clicked.connect(self.close)
+
+        layout = QGridLayout()
+        self.setLayout(layout)
+        layout.addWidget(QLabel(data_set.title), 0, 0, 1, 3)
+        layout.addWidget(table, 1, 0, 1, 3)
+        layout.setRowStretch(1, 3)
+        if extra_info:
+            info_field = QTextEdit()
+            info_field.setReadOnly(True)
+            info_field.setPlainText(extra_info)
+            layout.addWidget(info_field, 2, 0, 1, 3)
+            layout.setRowStretch(2, 1)
+        layout.addWidget(self.b_copy, 3, 0, 1, 1)
+        layout.addWidget(self.b_export, 3, 1, 1, 1)
+        layout.addWidget(self.b_ok, 3, 2, 1, 1)
+
+        self.resize(800, 600)
+        self.setWindowTitle(data_set.title)
+
+    def copy(self):
+        """copies the table as tab separated values, which spreadsheets understand"""
+        QApplication.clipboard().setText(self.model.to_csv("\t"))
+        logger.debug("data of %r copied to the clipboard", self.model.data_set.title)
+        self.b_copy.setText(_("Copied !"))
+        QTimer.singleShot(MSG_DURATION, lambda: self.b_copy.setText(_("Copy")))
+
+    def export(self):
+        path = QFileDialog.getSaveFileName(
+            self, _("Export data"), "", f"{_('csv files')} (*.csv)"
+        )[0]
+        if path:
+            self.write_csv(path)
+
+    def write_csv(self, path: os.PathLike):
+        with open(path, "w", encoding="utf-8-sig", newline="") as file:
+            file.write(self.model.to_csv())
+        logger.info("data of %r written to %s", self.model.data_set.title, path)
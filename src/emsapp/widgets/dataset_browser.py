@@ -0,0 +1,437 @@
+from __future__ import annotations
+
+import unicodedata
+from collections import defaultdict
+from typing import Any, Iterable, Optional, Sequence
+
+import numpy as np
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt, pyqtSignal
+from PyQt5.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QListView,
+    QVBoxLayout,
+)
+
+from emsapp import i18n
+from emsapp.i18n import N_, _
+from emsapp.widgets.common import QWidgetWithHelp
+
+FETCH_SIZE = 256
+FUZZY_THRESHOLD = 0.6
+ALL_GROUPS = N_("All groups")
+ALL_VALUES = N_("All values")
+
+
+def normalize(s: str) -> str:
+    """lower case version of s without accents, used for searching"""
+    decomposed = unicodedata.normalize("NFKD", s.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def trigrams(normalized: str) -> set[str]:
+    """trigrams of each word of an already normalized string. Words are padded
+    with spaces so that even one-letter words produce a trigram"""
+    grams = set()
+    for word in normalized.replace(",", " ").split():
+        padded = f" {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex:
+    """
+    Trigram index over a list of strings, built once so that each search only
+    looks at the strings sharing at least one trigram with the query.
+
+    Searching is accent and case insensitive. Strings containing every word of the
+    query come first, followed by the ones sharing at least `threshold` of the
+    trigrams of the query, which tolerates typos.
+    """
+
+    normalized: list[str]
+    grams: dict[str, np.ndarray]
+
+    def __init__(self, texts: Sequence[str]):
+        self.normalized = [normalize(t) for t in texts]
+        grams: dict[str, list[int]] = defaultdict(list)
+        for i, text in enumerate(self.normalized):
+            for gram in trigrams(text):
+                grams[gram].append(i)
+        self.grams = {k: np.array(v, dtype=np.int32) for k, v in grams.items()}
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    def search(self, query: str, threshold: float = FUZZY_THRESHOLD) -> list[int]:
+        """returns the indices of the strings matching query, best matches first
+
+        Parameters
+        ----------
+        query : str
+            text typed by the user
+        threshold : float, optional
+            minimum fraction of the trigrams of the query a string must contain to be
+            considered a fuzzy match, by default FUZZY_THRESHOLD
+
+        Returns
+        -------
+        list[int]
+            matching indices. Matches of equal quality are kept in the original order
+        """
+        words = normalize(query).replace(",", " ").split()
+        if not words:
+            return list(range(len(self)))
+
+        query_grams = trigrams(" ".join(words))
+        counts = np.zeros(len(self), dtype=np.int32)
+        for gram in query_grams:
+            indices = self.grams.get(gram)
+            if indices is not None:
+                counts[indices] += 1
+
+        if sum(len(w) for w in words) < 3:
+            # too short for fuzzy matching to mean anything
+            candidates = range(len(self))
+        else:
+            min_count = max(1, int(np.ceil(threshold * len(query_grams))))
+            candidates = np.flatnonzero(counts >= min_count)
+
+        exact = []
+        fuzzy = []
+        for i in candidates:
+            if all(w in self.normalized[i] for w in words):
+                exact.append(i)
+            elif counts[i]:
+                fuzzy.append(i)
+        fuzzy.sort(key=lambda i: -counts[i])
+        return [int(i) for i in exact + fuzzy]
+
+
+class DataSetListModel(QAbstractListModel):
+    """
+    List of data set titles, filtered by group, by splitter value and by a search
+    query. Rows are handed out to the view in batches of FETCH_SIZE as it scrolls, so
+    that showing thousands of titles doesn't create thousands of items up front.
+    """
+
+    titles: list[str]
+    groups: list[Optional[str]]
+    splitter_values: list[frozenset[tuple[str, str]]]
+    title_index: TitleIndex
+    rows: list[int]
+    fetched: int = 0
+    _title_indices: dict[str, int]
+    _row_of_index: dict[int, int]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.titles = []
+        self.groups = []
+        self.splitter_values = []
+        self.title_index = TitleIndex([])
+        self.rows = []
+        self._title_indices = {}
+        self._row_of_index = {}
+        self.query = ""
+        self.group = None
+        self.splitter_value = None
+
+    def set_titles(
+        self,
+        titles: Sequence[str],
+        groups: Sequence[Optional[str]],
+        splitter_values: Sequence[Iterable[tuple[str, str]]] = None,
+    ):
+        """replaces the titles, keeping the current filter. splitter_values gives
+        the (splitter name, value) pairs of the data of each title"""
+        self.beginResetModel()
+        self.titles = list(titles)
+        self.groups = list(groups)
+        if splitter_values is None:
+            splitter_values = [()] * len(self.titles)
+        self.splitter_values = [frozenset(values) for values in splitter_values]
+        self.title_index = TitleIndex(self.titles)
+        self._title_indices = {title: i for i, title in enumerate(self.titles)}
+        self._apply_filter()
+        self.endResetModel()
+
+    def set_filter(
+        self,
+        query: str = None,
+        group: Optional[str] = ...,
+        splitter_value: Optional[tuple[str, str]] = ...,
+    ):
+        """filters the titles. Arguments that are not given are left unchanged"""
+        self.beginResetModel()
+        if query is not None:
+            self.query = query
+        if group is not ...:
+            self.group = group
+        if splitter_value is not ...:
+            self.splitter_value = splitter_value
+        self._apply_filter()
+        self.endResetModel()
+
+    def _apply_filter(self):
+        rows = self.title_index.search(self.query)
+        if self.group is not None:
+            rows = [i for i in rows if self.groups[i] == self.group]
+        if self.splitter_value is not None:
+            rows = [i for i in rows if self.splitter_value in self.splitter_values[i]]
+        self.rows = rows
+        self._row_of_index = {i: row for row, i in enumerate(rows)}
+        self.fetched = min(FETCH_SIZE, len(rows))
+
+    def title(self, row: int) -> str:
+        return self.titles[self.rows[row]]
+
+    def row_of(self, title: str) -> int:
+        """row at which the title is shown, -1 if it's filtered out. Rows are
+        fetched up to that one if necessary"""
+        row = self._row_of_index.get(self._title_indices.get(title), -1)
+        if row < 0:
+            return -1
+        self.fetch_until(row)
+        return row
+
+    def fetch_until(self, row: int):
+        while self.fetched <= row and self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self.fetched
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and self.fetched < len(self.rows)
+
+    def fetchMore(self, parent: QModelIndex):
+        if parent.isValid():
+            return
+        num = min(FETCH_SIZE, len(self.rows) - self.fetched)
+        if num <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.fetched, self.fetched + num - 1)
+        self.fetched += num
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or index.row() >= self.fetched:
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return self.title(index.row())
+        return None
+
+
+class DataSetBrowser(QWidgetWithHelp):
+    """
+    Lets the user pick a data set among potentially thousands, by scrolling through
+    a list, restricting it to one grouper or to one value of a splitter, or
+    searching titles. Updating the titles only resets the model, the widgets
+    themselves are created once.
+    """
+
+    sig_selection_changed = pyqtSignal(str)
+    values: list[str]
+    splitter_choices: list[tuple[str, str]]
+    _value: str = ""
+
+    def __init__(self, label: str):
+        super().__init__()
+        self.name = label
+        self.values = []
+        self.splitter_choices = []
+        self.label = QLabel(self)
+        self.search = QLineEdit(self)
+        self.search.setClearButtonEnabled(True)
+        self.group_box = QComboBox(self)
+        self.group_box.setSizeAdjustPolicy(QComboBox.SizeAdjustPolicy.AdjustToContents)
+        self.splitter_box = QComboBox(self)
+        self.splitter_box.setSizeAdjustPolicy(
+            QComboBox.SizeAdjustPolicy.AdjustToContents
+        )
+        self.model = DataSetListModel(self)
+        self.view = QListView(self)
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+        filter_layout.addWidget(self.search, 1)
+        filter_layout.addWidget(self.group_box, 0)
+        filter_layout.addWidget(self.splitter_box, 0)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+        self.search.textChanged.connect(self.search_changed)
+        self.group_box.currentIndexChanged.connect(self.group_changed)
+        self.splitter_box.currentIndexChanged.connect(self.splitter_changed)
+        self.view.selectionModel().currentChanged.connect(self.row_changed)
+        self.update_groups([])
+        self.update_splitter_values([])
+        i18n.register(self)
+
+    @property
+    def value(self) -> str:
+        return self._value
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.values)
+
+    @property
+    def visible_values(self) -> list[str]:
+        """titles passing the current filter, in display order"""
+        return [self.model.title(row) for row in range(len(self.model.rows))]
+
+    def update_values(
+        self,
+        values: list[str],
+        selection: str = None,
+        always_emit=False,
+        groups: Iterable[Optional[str]] = None,
+        splitter_values: Iterable[Iterable[tuple[str, str]]] = None,
+    ):
+        """update the data sets that can be browsed
+
+        Parameters
+        ----------
+        values : list[str]
+            titles of the data sets. Will override any existing ones
+        selection : str, optional
+            if given, selects this value
+        always_emit : bool, optional
+            if the current selection is present in the new list of values,
+            sig_selection_changed will not emit unless this flag is set to True
+        groups : Iterable[Optional[str]], optional
+            name of the grouper that produced each data set, used to filter them
+        splitter_values : Iterable[Iterable[tuple[str, str]]], optional
+            (splitter name, value) pairs of the data of each data set (see
+            `DataReport.splitters`), used to filter them
+        """
+        selected = selection or self._value
+        self.values = list(values)
+        groups = list(groups) if groups is not None else [None] * len(self.values)
+        if splitter_values is not None:
+            splitter_values = [frozenset(values) for values in splitter_values]
+        else:
+            splitter_values = [frozenset()] * len(self.values)
+        self.update_groups(groups)
+        self.update_splitter_values(splitter_values)
+        self.model.set_titles(self.values, groups, splitter_values)
+
+        if selected in self.values:
+            must_emit = always_emit
+        else:
+            selected = self.values[0] if self.values else ""
+            must_emit = True
+        self._value = selected
+        self.show_selection()
+        self.view.setDisabled(not self.valid)
+        if must_emit:
+            self.sig_selection_changed.emit(self._value)
+
+    def update_groups(self, groups: list[Optional[str]]):
+        current = self.group_box.currentData()
+        names = sorted({g for g in groups if g is not None})
+        self.group_box.blockSignals(True)
+        self.group_box.clear()
+        self.group_box.addItem(_(ALL_GROUPS), None)
+        for name in names:
+            self.group_box.addItem(name, name)
+        self.group_box.setCurrentIndex(max(0, self.group_box.findData(current)))
+        self.group_box.setVisible(bool(names))
+        self.group_box.blockSignals(False)
+        self.model.group = self.group_box.currentData()
+
+    def update_splitter_values(self, splitter_values: list[frozenset[tuple[str, str]]]):
+        index = self.splitter_box.currentData()
+        current = self.splitter_choices[index] if index is not None else None
+        self.splitter_choices = sorted(
+            set().union(*splitter_values), key=lambda pair: tuple(map(str, pair))
+        )
+        self.splitter_box.blockSignals(True)
+        self.splitter_box.clear()
+        self.splitter_box.addItem(_(ALL_VALUES), None)
+        for i, (name, value) in enumerate(self.splitter_choices):
+            self.splitter_box.addItem(f"{name} : {value}", i)
+        if current in self.splitter_choices:
+            self.splitter_box.setCurrentIndex(self.splitter_choices.index(current) + 1)
+        else:
+            self.splitter_box.setCurrentIndex(0)
+        self.splitter_box.setVisible(bool(self.splitter_choices))
+        self.splitter_box.blockSignals(False)
+        self.model.splitter_value = self.current_splitter_value()
+
+    def current_splitter_value(self) -> Optional[tuple[str, str]]:
+        index = self.splitter_box.currentData()
+        return None if index is None else self.splitter_choices[index]
+
+    def select(self, title: str):
+        if title == self._value or title not in self.values:
+            return
+        self._value = title
+        self.show_selection()
+        self.sig_selection_changed.emit(title)
+
+    def select_row(self, row: int):
+        if 0 <= row < len(self.model.rows):
+            self.model.fetch_until(row)
+            self.select(self.model.title(row))
+
+    def select_next(self):
+        self.select_row(self.model.row_of(self._value) + 1)
+
+    def select_prev(self):
+        row = self.model.row_of(self._value)
+        if row > 0:
+            self.select_row(row - 1)
+
+    def show_selection(self):
+        """highlights the selected data set if it passes the current filter"""
+        row = self.model.row_of(self._value)
+        selection_model = self.view.selectionModel()
+        selection_model.blockSignals(True)
+        if row < 0:
+            selection_model.clear()
+        else:
+            index = self.model.index(row)
+            selection_model.setCurrentIndex(
+                index, selection_model.SelectionFlag.ClearAndSelect
+            )
+            self.view.scrollTo(index)
+        selection_model.blockSignals(False)
+        self.view.viewport().update()
+
+    def search_changed(self, text: str):
+        self.model.set_filter(query=text)
+        self.show_selection()
+
+    def group_changed(self, _index: int):
+        self.model.set_filter(group=self.group_box.currentData())
+        self.show_selection()
+
+    def splitter_changed(self, _index: int):
+        self.model.set_filter(splitter_value=self.current_splitter_value())
+        self.show_selection()
+
+    def row_changed(self, current: QModelIndex, _previous: QModelIndex):
+        if current.isValid():
+            self.select(self.model.title(current.row()))
+
+    def update_text(self):
+        self.label.setText(_(self.name))
+        self.search.setPlaceholderText(_("Search..."))
+        self.group_box.setItemText(0, _(ALL_GROUPS))
+        self.splitter_box.setItemText(0, _(ALL_VALUES))
@@ -2,12 +2,21 @@ import os
 import re
 import sys
 from pathlib import Path
+from typing import Any, Callable, Optional
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 from emsapp import const
-from emsapp.config import Config
-from emsapp.data.loading import DataLoader, DataLoaderFactory, Entry, RawData
+from emsapp.config import Config, ConfigurationValueError
+from emsapp.data.loading import (
+    DataLoader,
+    DataLoaderFactory,
+    Entry,
+    RawData,
+    RawDataLoader,
+    load_data,
+    load_sample,
+)
 from emsapp.i18n import _, ngettext
 from emsapp.utils import get_logger
 from emsapp.widgets.common import AcceptCancel, ValuesSelector
@@ -15,8 +24,120 @@ from emsapp.widgets.common import AcceptCancel, ValuesSelector
 logger = get_logger()
 
 
-class DataLoadingError(ValueError):
-    ...
+class DataLoadingError(ValueError): ...
+
+
+class Task(QtCore.QThread):
+    """
+    Runs a function in a background thread. sig_done is emitted with the result
+    and None, or with None and the exception that was raised.
+    """
+
+    sig_done = QtCore.pyqtSignal(object, object)
+    # tasks that outlive their parent, kept alive until they finish
+    detached: "set[Task]" = set()
+
+    def __init__(self, kind: str, func: Callable[[], Any], callback: Callable, parent):
+        super().__init__(parent)
+        self.kind = kind
+        self.func = func
+        self.callback = callback
+
+    def run(self):
+        try:
+            result = self.func()
+        except Exception as e:
+            logger.debug("%s task failed", self.kind, exc_info=True)
+            self.sig_done.emit(None, e)
+        else:
+            self.sig_done.emit(result, None)
+
+    def detach(self):
+        """drops the result and lets the task finish on its own, without blocking
+        the caller, even if its parent is deleted meanwhile"""
+        self.sig_done.disconnect()
+        self.setParent(None)
+        Task.detached.add(self)
+        self.finished.connect(self.release)
+        if self.isFinished():
+            self.release()
+
+    def release(self):
+        if self in Task.detached:
+            Task.detached.discard(self)
+            self.deleteLater()
+
+
+class BackgroundTasks(QtCore.QObject):
+    """
+    Calls functions in background tasks, then their callback with the result and
+    the exception raised, if any, in the thread of the event loop. Tasks have a
+    kind, and only the last task of each kind gets its callback called, the result
+    of older ones being outdated. sig_changed is emitted when the set of pending
+    tasks changes.
+    """
+
+    sig_changed = QtCore.pyqtSignal()
+    tasks: set[Task]
+    pending: dict[str, Task]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tasks = set()
+        self.pending = {}
+
+    def run(
+        self,
+        kind: str,
+        message: str,
+        func: Callable[[], Any],
+        callback: Callable[[Any, Optional[Exception]], None],
+    ):
+        task = Task(kind, func, callback, self)
+        task.setObjectName(message)
+        task.sig_done.connect(self.task_done)
+        task.finished.connect(self.task_finished)
+        self.tasks.add(task)
+        self.pending[kind] = task
+        self.sig_changed.emit()
+        task.start()
+
+    def cancel(self, kind: str):
+        """drops the result of the pending task of this kind, if any"""
+        if self.pending.pop(kind, None) is not None:
+            self.sig_changed.emit()
+
+    def detach_all(self):
+        """drops every result without waiting for the tasks to finish"""
+        self.pending.clear()
+        for task in self.tasks:
+            task.detach()
+        self.tasks.clear()
+        self.sig_changed.emit()
+
+    def messages(self) -> list[str]:
+        return [task.objectName() for task in self.pending.values()]
+
+    @QtCore.pyqtSlot(object, object)
+    def task_done(self, result: Any, error: Optional[Exception]):
+        task = self.sender()
+        if self.pending.get(task.kind) is not task:
+            return
+        del self.pending[task.kind]
+        self.sig_changed.emit()
+        task.callback(result, error)
+
+    @QtCore.pyqtSlot()
+    def task_finished(self):
+        task = self.sender()
+        if task in self.tasks:
+            self.tasks.discard(task)
+            task.deleteLater()
+
+
+def open_file(path: Path, config) -> tuple[DataLoader, list[str]]:
+    loader = DataLoaderFactory.create(path)
+    return loader, loader.tables(config)
 
 
 class FileSelector(QtWidgets.QWidget):
@@ -112,61 +233,174 @@ class ColumnSelector(QtWidgets.QWidget):
 
 
 class ImportWindow(QtWidgets.QDialog):
+    """
+    Lets the user choose the data source, the table and which column holds each
+    field of the entries. Files are opened and previews loaded in background tasks,
+    so that the dialog stays responsive with slow files or network shares. The
+    first PREVIEW_ROWS rows are shown as they would be loaded, to check the choice
+    of columns before loading everything.
+    """
+
     did_accept: bool
     data_loader: DataLoader = None
+    sample: Optional[RawData] = None
+    background: BackgroundTasks
 
     def __init__(self, default_path: os.PathLike = None):
         super().__init__()
         layout = QtWidgets.QVBoxLayout()
         self.setLayout(layout)
         self.did_accept = False
+        self.background = BackgroundTasks(self)
 
         self.file_selector = FileSelector(default_path=default_path)
         self.table_selector = TableSelector()
         self.column_selector = ColumnSelector()
         self.finish_buttons = AcceptCancel()
 
+        self.progress_bar = QtWidgets.QProgressBar()
+        # busy indicator, the duration of the tasks is unknown
+        self.progress_bar.setRange(0, 0)
+        self.progress_label = QtWidgets.QLabel()
+        progress_layout = QtWidgets.QHBoxLayout()
+        progress_layout.addWidget(self.progress_label)
+        progress_layout.addWidget(self.progress_bar)
+
+        self.preview_label = QtWidgets.QLabel()
+        self.preview_label.setWordWrap(True)
+        self.preview_table = QtWidgets.QTableWidget(0, len(Entry.fields()))
+        self.preview_table.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+        )
+        self.preview_table.setMinimumHeight(200)
+
         self.file_selector.sig_path_changed.connect(self.file_changed)
         self.table_selector.sig_selection_changed.connect(self.table_changed)
         self.column_selector.sig_column_changed.connect(self.columns_changed)
         self.finish_buttons.sig_clicked.connect(self.finish_import)
+        self.background.sig_changed.connect(self.update_progress)
 
         layout.addWidget(self.file_selector)
         layout.addWidget(self.table_selector)
         layout.addWidget(self.column_selector)
+        layout.addLayout(progress_layout)
+        layout.addWidget(self.preview_label)
+        layout.addWidget(self.preview_table)
         layout.addWidget(self.finish_buttons)
 
         self.setWindowModality(QtCore.Qt.WindowModality.ApplicationModal)
         self.setWindowFlag(QtCore.Qt.WindowType.WindowCloseButtonHint, False)
+        self.update_progress()
+        self.update_preview()
 
+        # asks for another file if this one can't be opened
+        self.first_file = True
         self.file_changed(Config().data.db_path)
-        if self.data_loader is None:
-            self.file_selector.choose_path()
+
+    def update_progress(self):
+        messages = self.background.messages()
+        self.progress_bar.setVisible(bool(messages))
+        self.progress_label.setVisible(bool(messages))
+        self.progress_label.setText("\n".join(messages))
+        disabled = "file" in self.background.pending
+        self.table_selector.setDisabled(disabled)
+        self.column_selector.setDisabled(disabled)
 
     def file_changed(self, new_path: Path):
-        tables = None
-        if DataLoaderFactory.valid(new_path):
-            try:
-                self.data_loader = DataLoaderFactory.create(new_path)
-                tables = self.data_loader.tables(Config().data)
-            except Exception:
-                pass
+        self.data_loader = None
+        self.sample = None
+        self.background.cancel("sample")
+        self.update_ok_button()
+        self.update_preview()
+        if not DataLoaderFactory.valid(new_path):
+            self.background.cancel("file")
+            self.file_opened(new_path, None, None)
+            return
+        config = Config().data.copy()
+        self.background.run(
+            "file",
+            _("Opening {name}...").format(name=Path(new_path).name),
+            lambda: open_file(new_path, config),
+            lambda result, error: self.file_opened(new_path, result, error),
+        )
+
+    def file_opened(
+        self,
+        path: Path,
+        result: Optional[tuple[DataLoader, list[str]]],
+        error: Optional[Exception],
+    ):
+        loader, tables = result or (None, None)
+        if error is not None:
+            logger.info("could not open %s : %s", path, error)
         if not tables:
-            self.data_loader = None
+            loader = None
             tables = []
-        self.finish_buttons.ok_button.setDisabled(self.data_loader is None)
+        self.data_loader = loader
         self.table_selector.update_values(tables, Config().data.table_name)
         self.table_changed()
+        if self.first_file:
+            self.first_file = False
+            if self.data_loader is None:
+                self.file_selector.choose_path()
 
     def table_changed(self):
+        self.sample = None
         if self.data_loader:
             self.column_selector.update_headers(self.data_loader.headers(Config().data))
+            self.load_preview()
+        self.update_preview()
         self.update_ok_button()
 
     def columns_changed(self, col_key: str, new_name: str):
-        logger.debug(f"Column changed : {col_key} = {new_name}")
+        logger.debug("Column changed : %s = %s", col_key, new_name)
+        if self.sample is not None and new_name not in self.sample.headers:
+            # some loaders only sample the columns that were selected
+            self.load_preview()
+        self.update_preview()
         self.update_ok_button()
 
+    def load_preview(self):
+        loader = self.data_loader
+        config = Config().data.copy()
+        self.background.run(
+            "sample",
+            _("Loading a preview..."),
+            lambda: load_sample(loader, config, const.PREVIEW_ROWS),
+            self.preview_loaded,
+        )
+
+    def preview_loaded(self, sample: Optional[RawData], error: Optional[Exception]):
+        if error is not None:
+            logger.info("could not load a preview : %s", error)
+        self.sample = sample
+        self.update_preview()
+
+    def update_preview(self):
+        """shows the entries of the sample as they would be loaded with the current
+        choice of columns, along with the rows that would be rejected"""
+        self.preview_table.setRowCount(0)
+        self.preview_table.setHorizontalHeaderLabels([_(f) for f in Entry.fields()])
+        if self.sample is None or not self.column_selector.valid:
+            self.preview_label.setText("")
+            return
+        try:
+            entries = load_data(RawDataLoader(self.sample), Config().snapshot())
+        except ConfigurationValueError as e:
+            self.preview_label.setText(str(e))
+            return
+        self.preview_label.setText(
+            _("Preview of the first {n} rows").format(n=len(self.sample.rows))
+            + "\n"
+            + entries.rejections.summary()
+        )
+        self.preview_table.setRowCount(len(entries.l))
+        for i, entry in enumerate(entries.l):
+            for j, key in enumerate(Entry.fields()):
+                value = getattr(entry, key)
+                text = value.isoformat() if key.startswith("date") else str(value)
+                self.preview_table.setItem(i, j, QtWidgets.QTableWidgetItem(text))
+
     def update_ok_button(self):
         valid = (
             self.data_loader is not None
@@ -179,6 +413,11 @@ class ImportWindow(QtWidgets.QDialog):
         self.did_accept = accept
         self.close()
 
+    def done(self, result: int):
+        # closing never waits for a slow file, whose result is simply dropped
+        self.background.detach_all()
+        super().done(result)
+
 
 def configure_db(parent: QtWidgets.QWidget = None) -> bool:
     with Config().hold():
@@ -4,7 +4,7 @@ from enum import Enum
 from typing import Any, Callable, Iterable, Optional, TypeVar, Union
 
 from PyQt5.QtCore import QSortFilterProxyModel, Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtGui import QFontDatabase, QMouseEvent
 from PyQt5.QtWidgets import (
     QApplication,
     QDialog,
@@ -27,12 +27,15 @@ class InfoBox(QDialog):
     b_copy: QPushButton
     b_ok: QPushButton
 
-    def __init__(self, header: str, msg: str, parent=None):
+    def __init__(self, header: str, msg: str, parent=None, monospace=False):
         super().__init__(parent)
         self.header = header
         self.msg = msg
         msg_field = QTextEdit()
         msg_field.setReadOnly(True)
+        if monospace:
+            msg_field.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+            msg_field.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
         msg_field.setPlainText(msg)
 
         self.b_copy = QPushButton(_("Copy"))
@@ -56,6 +59,6 @@ class InfoBox(QDialog):
 
     def copy(self):
         QApplication.clipboard().setText(self.msg)
-        logger.debug(f"InfoBox({self.header})'s content copied to the clipboard")
+        logger.debug("InfoBox(%s)'s content copied to the clipboard", self.header)
         self.b_copy.setText(_("Copied !"))
         QTimer.singleShot(MSG_DURATION, lambda: self.b_copy.setText(_("Copy")))
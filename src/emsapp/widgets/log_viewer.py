@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtWidgets import (
+    QApplication,
+    QDialog,
+    QGridLayout,
+    QPlainTextEdit,
+    QPushButton,
+)
+
+from emsapp.const import MSG_DURATION
+from emsapp.i18n import _
+from emsapp.utils import LOG_FILE
+
+TAIL_BYTES = 64 * 1024
+MAX_LINES = 5000
+POLL_INTERVAL = 500
+
+
+class LogTail:
+    """
+    Follows a log file like `tail -f`. The first read returns the last `tail_bytes`
+    bytes of the file, later ones what has been appended since. Only complete lines
+    are returned, and rotation of the file is detected.
+    """
+
+    path: Path
+    tail_bytes: int
+    position: int = None
+
+    def __init__(self, path: os.PathLike, tail_bytes: int = TAIL_BYTES):
+        self.path = Path(path)
+        self.tail_bytes = tail_bytes
+
+    def read(self) -> str:
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return ""
+        first_read = self.position is None
+        if first_read:
+            self.position = max(0, size - self.tail_bytes)
+        elif size < self.position:
+            # the file was rotated
+            self.position = 0
+        if size == self.position:
+            return ""
+        with open(self.path, "rb") as file:
+            file.seek(self.position)
+            data = file.read(size - self.position)
+        if first_read and self.position > 0:
+            # don't show the end of a line without its beginning
+            start = data.find(b"\n") + 1
+            self.position += start
+            data = data[start:]
+        end = data.rfind(b"\n") + 1
+        self.position += end
+        return data[:end].decode("utf-8", errors="replace")
+
+
+class LogViewer(QDialog):
+    """shows the end of the log file and keeps it up to date while open"""
+
+    def __init__(self, path: os.PathLike = LOG_FILE, parent=None):
+        super().__init__(parent)
+        self.tail = LogTail(path)
+        self.text_field = QPlainTextEdit()
+        self.text_field.setReadOnly(True)
+        self.text_field.setMaximumBlockCount(MAX_LINES)
+        self.text_field.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.text_field.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+
+        self.b_copy = QPushButton(_("Copy"))
+        self.b_ok = QPushButton(_("ok"))
+        self.b_copy.clicked.connect(self.copy)
+        self.b_ok.clicked.connect(self.close)
+
+        layout = QGridLayout()
+        self.setLayout(layout)
+        layout.addWidget(self.text_field, 0, 0, 1, 2)
+        layout.addWidget(self.b_copy, 1, 0, 1, 1)
+        layout.addWidget(self.b_ok, 1, 1, 1, 1)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_logs)
+        self.timer.start(POLL_INTERVAL)
+        self.update_logs()
+
+        self.resize(1000, 600)
+        self.setWindowTitle(_("Most recent logs"))
+
+    def update_logs(self):
+        text = self.tail.read()
+        if not text:
+            return
+        scroll_bar = self.text_field.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        self.text_field.appendPlainText(text.rstrip("\n"))
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def copy(self):
+        QApplication.clipboard().setText(self.text_field.toPlainText())
+        self.b_copy.setText(_("Copied !"))
+        QTimer.singleShot(MSG_DURATION, lambda: self.b_copy.setText(_("Copy")))
+
+    def done(self, result: int):
+        self.timer.stop()
+        super().done(result)
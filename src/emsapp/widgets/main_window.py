@@ -1,31 +1,36 @@
 import datetime
 from typing import Any, Optional
 
-import pkg_resources
-from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtGui import QImage, QShowEvent, QIcon, QCloseEvent
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QShowEvent, QIcon, QCloseEvent
 from PyQt5.QtWidgets import (
     QApplication,
+    QFileDialog,
     QGridLayout,
     QHBoxLayout,
     QMainWindow,
+    QProgressDialog,
     QPushButton,
+    QVBoxLayout,
     QWidget,
 )
 
-from emsapp import i18n
+from emsapp import i18n, startup
 from emsapp.config import Config, LegendLoc, PlotConfig
 from emsapp.const import PLOT_MAX_WIDTH, PLOT_MIN_WIDTH
-from emsapp.data import DataSet
+from emsapp.data import DataSet, RejectionReport
+from emsapp.data.instrumentation import RunReport
 from emsapp.data.loading import Entries, load_data
-from emsapp.data.process import Process
+from emsapp.data.process import ProcessGraph
 from emsapp.i18n import N_, _
-from emsapp.plotting.plotter import Plotter
-from emsapp.utils import get_logger
-from emsapp.widgets.common import ExtendedComboBox, ValuesSelector
+from emsapp.utils import LOG_FILE, RUN_REPORT_FILE, get_logger, package_path
+from emsapp.widgets.common import rgba_to_qimage
 from emsapp.widgets.config_form import ConfigForm, ControlSpecs, set_value
+from emsapp.widgets.data_view import DataView
+from emsapp.widgets.dataset_browser import DataSetBrowser
 from emsapp.widgets.importation import configure_db
 from emsapp.widgets.info_box import InfoBox
+from emsapp.widgets.log_viewer import LogViewer
 from emsapp.widgets.preview import PlotPreview
 
 logger = get_logger()
@@ -94,24 +99,21 @@ CONFIG_SPECS = [
 class MainWindow(QMainWindow):
 
     processed_data: dict[str, DataSet] = None
+    run_report: RunReport = None
+    rejections: RejectionReport = None
     sig_loading_event = pyqtSignal(str)
 
     def __init__(self):
         super().__init__()
         self.sig_loading_event.emit(_("opening database..."))
-        self.setWindowIcon(
-            QIcon(
-                pkg_resources.resource_filename(
-                    "emsapp", "package_data/building_icon.png"
-                )
-            )
-        )
+        self.setWindowIcon(QIcon(str(package_path("package_data/building_icon.png"))))
         layout = QGridLayout()
         mw = QWidget(self)
         mw.setLayout(layout)
         self.setCentralWidget(mw)
 
-        select_layout = QHBoxLayout()
+        select_layout = QVBoxLayout()
+        prev_next_layout = QHBoxLayout()
         w_selection = QWidget()
         w_selection.setLayout(select_layout)
 
@@ -126,10 +128,16 @@ class MainWindow(QMainWindow):
 
         self.a_logs = self.m_file.addAction("")
         self.a_logs.triggered.connect(self.show_logs)
+        self.a_performance = self.m_file.addAction("")
+        self.a_performance.triggered.connect(self.show_performance)
+        self.a_rejections = self.m_file.addAction("")
+        self.a_rejections.triggered.connect(self.show_rejections)
 
         self.m_plot = menu_bar.addMenu("")
         self.a_copy_plot = self.m_plot.addAction("")
         self.a_copy_plot.setShortcut("Ctrl+C")
+        self.a_export_pdf = self.m_plot.addAction("")
+        self.a_export_pdf.setShortcut("Ctrl+P")
 
         self.a_show_data = self.m_plot.addAction("")
         self.a_next_plot = self.m_plot.addAction("")
@@ -137,6 +145,8 @@ class MainWindow(QMainWindow):
 
         self.m_option = menu_bar.addMenu("")
         self.m_lang = self.m_option.addMenu("")
+        self.a_trace_memory = self.m_option.addAction("")
+        self.a_trace_memory.setCheckable(True)
         self.a_lang_list = []
         for lang in i18n.AVAILABLE:
             action = self.m_lang.addAction(lang)
@@ -144,9 +154,7 @@ class MainWindow(QMainWindow):
             self.a_lang_list.append(action)
 
         self.preview = PlotPreview()
-        self.data_selector = ValuesSelector(
-            N_("Select data to preview"), ComboBoxClass=ExtendedComboBox
-        )
+        self.data_selector = DataSetBrowser(N_("Select data to preview"))
         self.b_copy_plot = QPushButton()
         self.b_show_data = QPushButton()
         self.b_reset_config = QPushButton()
@@ -157,31 +165,32 @@ class MainWindow(QMainWindow):
         )
 
         select_layout.addWidget(self.data_selector)
-        select_layout.addWidget(self.b_prev_plot)
-        select_layout.addWidget(self.b_next_plot)
+        select_layout.addLayout(prev_next_layout)
+        prev_next_layout.addWidget(self.b_prev_plot)
+        prev_next_layout.addWidget(self.b_next_plot)
         select_layout.setStretchFactor(self.data_selector, 1)
-        select_layout.setStretchFactor(self.b_next_plot, 0)
-        select_layout.setStretchFactor(self.b_prev_plot, 0)
-
-        layout.addWidget(w_selection, 0, 0, 1, 1)
-        layout.addWidget(self.preview, 1, 0, 2, 1)
-        layout.addWidget(self.p_config_options, 0, 1, 2, 2)
-        layout.addWidget(self.b_copy_plot, 2, 1, 1, 1)
-        layout.addWidget(self.b_show_data, 2, 2, 1, 1)
+
+        layout.addWidget(w_selection, 0, 0, 3, 1)
+        layout.addWidget(self.preview, 0, 1, 3, 1)
+        layout.addWidget(self.p_config_options, 0, 2, 2, 2)
+        layout.addWidget(self.b_copy_plot, 2, 2, 1, 1)
+        layout.addWidget(self.b_show_data, 2, 3, 1, 1)
         layout.setRowStretch(0, 0)
         layout.setRowStretch(1, 1)
-        layout.setColumnStretch(0, 1)
-        layout.setColumnStretch(1, 0)
+        layout.setColumnStretch(0, 0)
+        layout.setColumnStretch(1, 1)
         layout.setColumnStretch(2, 0)
+        layout.setColumnStretch(3, 0)
         # self.resize(1000, 700)
 
         i18n.register(self)
 
-        self.process = Process.from_config()
+        self.processes = ProcessGraph.from_config()
 
         self.data_selector.sig_selection_changed.connect(self.update_ui)
         self.p_config_options.sig_value_changed.connect(self.plot_config_changed)
         self.a_copy_plot.triggered.connect(self.copy_plot)
+        self.a_export_pdf.triggered.connect(self.export_pdf)
         self.a_show_data.triggered.connect(self.show_data)
         self.b_copy_plot.clicked.connect(self.a_copy_plot.trigger)
         self.b_show_data.clicked.connect(self.a_show_data.trigger)
@@ -203,9 +212,19 @@ class MainWindow(QMainWindow):
         self.a_open.setToolTip(_("Open a database"))
         self.a_logs.setText(_("Show &logs"))
         self.a_logs.setToolTip(_("Open the logs to attempt to solve a problem"))
+        self.a_performance.setText(_("Show &performance"))
+        self.a_performance.setToolTip(
+            _("Show how long each step of the last data processing took")
+        )
+        self.a_rejections.setText(_("Show &rejected entries"))
+        self.a_rejections.setToolTip(
+            _("Show which rows of the database could not be used, and why")
+        )
 
         self.a_copy_plot.setText(_("&Copy plot"))
         self.a_copy_plot.setToolTip(_("Copy current plot to clip board"))
+        self.a_export_pdf.setText(_("&Export to pdf..."))
+        self.a_export_pdf.setToolTip(_("Export all available plots to one pdf file"))
         self.a_show_data.setText(_("&Show data"))
         self.a_show_data.setToolTip(_("Show current data as text"))
         self.a_next_plot.setText(_("&Next"))
@@ -222,6 +241,10 @@ class MainWindow(QMainWindow):
         self.b_prev_plot.setToolTip(self.a_prev_plot.toolTip())
 
         self.m_option.setTitle(_("&Options"))
+        self.a_trace_memory.setText(_("Measure memory usage"))
+        self.a_trace_memory.setToolTip(
+            _("Record the memory used by each step of the processing (slower)")
+        )
         self.m_lang.setTitle(_("&Language"))
         for action, lang in zip(self.a_lang_list, i18n.AVAILABLE):
             action.setToolTip(
@@ -263,25 +286,57 @@ class MainWindow(QMainWindow):
 
     def load_and_process(self):
         while True:
+            settings = Config().snapshot()
+            report = RunReport(trace_memory=self.a_trace_memory.isChecked())
             try:
-                entries = load_data()
+                with report.tracing(), report.measure("loading") as stats:
+                    entries = load_data(
+                        settings=settings, predicates=self.processes.predicates()
+                    )
+                    stats.items_out = len(entries.l)
                 self.sig_loading_event.emit(_("data loaded"))
                 break
             except ValueError:
-                logger.info(
-                    _("couldn't load {path}").format(path=Config().data.db_path)
-                )
+                logger.info("couldn't load %s", Config().data.db_path)
                 if not configure_db(self):
                     self.close()
                     return
+        self.processes.bind(settings)
         self.processed_data = {}
-        for ds in self.process(entries):
-            self.processed_data[ds.title] = ds
+        groups = {}
+        splitter_values = {}
+        results = self.processes(entries, report)
+        for name, data_sets in results.items():
+            # titles are only prefixed when they could clash
+            prefix = f"{name} - " if len(results) > 1 else ""
+            for ds in data_sets:
+                self.processed_data[prefix + ds.title] = ds
+                groups[prefix + ds.title] = ds.grouper and prefix + ds.grouper
+                splitter_values[prefix + ds.title] = {
+                    pair for data in ds for pair in data.report.splitters.items()
+                }
+        self.run_report = report
+        self.rejections = entries.rejections
+        try:
+            report.dump(RUN_REPORT_FILE)
+        except OSError:
+            logger.warning("could not save the run report", exc_info=True)
         self.sig_loading_event.emit(_("data processed"))
+        titles = sorted(self.processed_data)
         self.data_selector.update_values(
-            sorted(self.processed_data), Config().data.last_selected
+            titles,
+            Config().data.last_selected,
+            groups=[groups[t] for t in titles],
+            splitter_values=[splitter_values[t] for t in titles],
         )
         self.update_ui()
+        if self.rejections and self.rejections.rejected:
+            self.status_bar.showMessage(
+                _("{rejected} of {total} rows were rejected").format(
+                    rejected=self.rejections.rejected, total=self.rejections.total
+                ),
+                5000,
+            )
 
     def get_selected_data(self) -> Optional[DataSet]:
         """returns an optional dataset representing the current user selection"""
@@ -306,7 +361,7 @@ class MainWindow(QMainWindow):
         dataset = self.get_selected_data()
         if not dataset:
             return
-        Config().save()
+        Config().save_later()
         self.preview.plot(dataset)
 
     def reset_plot_config(self):
@@ -321,35 +376,85 @@ class MainWindow(QMainWindow):
         if not data_set:
             self.status_bar.showMessage(_("Could not copy plot"), 3000)
             return False
-        plotter = Plotter(data_set)
-        buffer = plotter.as_bytes()
-        QApplication.clipboard().setImage(QImage.fromData(buffer))
+        startup.init_plotting()
+        from emsapp.plotting.plotter import rendering
+
+        with rendering(data_set) as plotter:
+            image = rgba_to_qimage(plotter.as_rgba())
+        QApplication.clipboard().setImage(image)
         self.status_bar.showMessage(_("Plot copied !"), 3000)
         return True
 
+    def export_pdf(self) -> bool:
+        """Writes every plot available in the selector to a single pdf file"""
+        if not self.processed_data:
+            self.status_bar.showMessage(_("Nothing to export"), 3000)
+            return False
+        path = QFileDialog.getSaveFileName(
+            self,
+            _("Export plots"),
+            str(Config().data.db_path.with_suffix(".pdf")),
+            f"{_('pdf files')} (*.pdf)",
+        )[0]
+        if not path:
+            return False
+        data_sets = [self.processed_data[title] for title in self.data_selector.values]
+        progress = QProgressDialog(
+            _("Exporting plots..."), None, 0, len(data_sets), self
+        )
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def update_progress(done: int, total: int):
+            progress.setValue(done)
+            QApplication.processEvents()
+
+        startup.init_plotting()
+        from emsapp.plotting.report import export_pdf
+
+        try:
+            export_pdf(data_sets, path, update_progress)
+        finally:
+            progress.close()
+        self.status_bar.showMessage(_("Plots exported !"), 3000)
+        return True
+
     def show_data(self):
         """opens a dialog box with the current data"""
-        msg = InfoBox(self.data_selector.value, self.preview.plotter.extra_info)
-        msg.exec()
+        data_set = self.get_selected_data()
+        if not data_set:
+            return
+        plotter = self.preview.plotter
+        DataView(data_set, plotter.extra_info if plotter else "", self).exec()
         self.focusWidget()
 
     def show_logs(self):
         """opens a dialog box with the logs of the program"""
-        msg = InfoBox(
-            _("Most recent logs"),
-            pkg_resources.resource_string("emsapp", "logs/emsapp.log").decode(),
-        )
+        LogViewer(LOG_FILE, self).exec()
+        self.focusWidget()
+
+    def show_performance(self):
+        """opens a dialog box with the time taken by each step of the last run"""
+        if self.run_report is None:
+            self.status_bar.showMessage(_("No data processed yet"), 3000)
+            return
+        msg = InfoBox(_("Performance"), self.run_report.summary(), monospace=True)
+        msg.exec()
+        self.focusWidget()
+
+    def show_rejections(self):
+        """opens a dialog box listing why rows of the database were rejected"""
+        if self.rejections is None:
+            self.status_bar.showMessage(_("No data loaded yet"), 3000)
+            return
+        msg = InfoBox(_("Rejected entries"), self.rejections.summary(), monospace=True)
         msg.exec()
         self.focusWidget()
 
     def show_next(self):
         """Show the next plot in the list"""
-        i = self.data_selector.box.currentIndex() + 1
-        if i < len(self.data_selector.values):
-            self.data_selector.box.setCurrentIndex(i)
+        self.data_selector.select_next()
 
     def show_prev(self):
         """Show the next plot in the list"""
-        i = self.data_selector.box.currentIndex() - 1
-        if i >= 0:
-            self.data_selector.box.setCurrentIndex(i)
+        self.data_selector.select_prev()
@@ -1,42 +1,49 @@
-from matplotlib.axes import Axes
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT
-from matplotlib.figure import Figure
-from PyQt5 import QtCore, QtWidgets
+from __future__ import annotations
 
-from emsapp.config import Config
-from emsapp.data import DataSet
-from emsapp.plotting.plotter import Plotter
+from typing import TYPE_CHECKING
 
+from PyQt5 import QtWidgets
 
-class MplCanvas(FigureCanvasQTAgg):
-    fig: Figure
-    ax: Axes
-    fig_size: QtCore.QSize
+from emsapp.data import DataSet
 
-    def __init__(self, parent=None):
-        w, h = Config().plot.figsize
-        self.fig = Figure(figsize=(w, h), tight_layout=True)
-        dpi = self.fig.dpi
-        self.ax = self.fig.add_subplot(111)
-        self.fig_size = QtCore.QSize(int(self.fig.dpi * w), int(self.fig.dpi * h))
-        super().__init__(self.fig)
+if TYPE_CHECKING:
+    from emsapp.plotting.plotter import Plotter
+    from emsapp.widgets.canvas import MplCanvas
 
 
 class PlotPreview(QtWidgets.QWidget):
+    """
+    Displays a plot. matplotlib is only imported when the first plot is shown,
+    so that the main window can appear as soon as possible.
+    """
+
     plotter: Plotter = None
+    canvas: MplCanvas = None
 
     def __init__(self):
         super().__init__()
         self.setMinimumSize(500, 350)
-        self.canvas = MplCanvas()
-        self.toolbar = NavigationToolbar2QT(self.canvas, self)
-
         layout = QtWidgets.QVBoxLayout()
         self.setLayout(layout)
-        layout.addWidget(self.toolbar)
-        layout.addWidget(self.canvas)
+
+    def init_canvas(self):
+        if self.canvas is not None:
+            return
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
+
+        from emsapp import startup
+        from emsapp.widgets.canvas import MplCanvas
+
+        startup.init_plotting()
+        self.canvas = MplCanvas()
+        self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        self.layout().addWidget(self.toolbar)
+        self.layout().addWidget(self.canvas)
 
     def plot(self, data_set: DataSet):
+        from emsapp.plotting.plotter import Plotter
+
+        self.init_canvas()
         self.canvas.ax.clear()
         self.plotter = Plotter(data_set, self.canvas.ax)
         self.canvas.draw()
@@ -48,14 +55,11 @@ def main():
 
     from PyQt5.QtWidgets import QApplication
 
-    import emsapp.startup
-
     app = QApplication(sys.argv)
     win = PlotPreview()
+    win.init_canvas()
     win.show()
     print(win.canvas.fig.get_size_inches())
-    win.canvas.resize_fig(20, 10)
-    print(win.canvas.fig.get_size_inches())
     app.exec()
 
 
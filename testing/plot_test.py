@@ -1,8 +1,9 @@
-from matplotlib import pyplot as plt
+from pathlib import Path
+
 from emsapp.config import Config, DataConfig
 from emsapp.data.loading import DataLoaderFactory, load_data
 from emsapp.data.process import current_processes
-from emsapp.plotting.plotter import Plotter
+from emsapp.plotting.plotter import rendering
 
 
 Config().data = DataConfig(
@@ -22,17 +23,17 @@ Config().data = DataConfig(
 
 
 def main():
+    out_dir = Path("plot_test_output")
+    out_dir.mkdir(exist_ok=True)
     loader = DataLoaderFactory.create(Config().data.db_path)
     entries = load_data(loader)
     for name, process in current_processes().items():
         print(name)
         processed = process(entries)
-        for dataset in processed[:3]:
+        for i, dataset in enumerate(processed):
             print(dataset.title)
-            plotter = Plotter()
-            plotter.plot(dataset)
-            plt.show()
-            plt.close()
+            with rendering(dataset) as plotter:
+                (out_dir / f"{name}_{i}.png").write_bytes(plotter.as_bytes())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from emsapp.data import DataReport, DataSet, DataType, FinalData
+from emsapp.widgets.data_view import FinalDataTableModel
+
+
+@pytest.fixture
+def model():
+    long = FinalData(
+        np.array(["2022-01-01", "2022-01-02"], dtype="datetime64[D]"),
+        np.array([3, 12], dtype=np.int64),
+        DataType.LINE,
+        "visits",
+        DataReport(),
+    )
+    short = FinalData(
+        np.array(["2022-02-01"], dtype="datetime64[D]"),
+        np.array([-1], dtype=np.int64),
+        DataType.BAR,
+        "stays",
+        DataReport(),
+        label="Glâne",
+    )
+    return FinalDataTableModel(DataSet("test", [long, short]))
+
+
+def test_csv_header_row(model):
+    header = model.to_csv().splitlines()[0]
+    assert header.split(",") == model.headers()
+    assert len(model.headers()) == model.columnCount()
+
+
+def test_csv_values_and_padding(model):
+    assert model.to_csv(";").splitlines()[1:] == [
+        "2022-01-01;3;2022-02-01;-1",
+        "2022-01-02;12;;",
+    ]
+
+
+def test_csv_matches_displayed_cells(model):
+    rows = [line.split("\t") for line in model.to_csv("\t").splitlines()[1:]]
+    for i in range(model.rowCount()):
+        for j in range(model.columnCount()):
+            assert rows[i][j] == (model.data(model.index(i, j)) or "")
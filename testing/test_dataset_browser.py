@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from emsapp.widgets.dataset_browser import DataSetListModel, TitleIndex
+
+TITLES = [
+    "districts, Glâne, Résident",
+    "districts, Sarine, Collaborateur",
+    "institutions, EMS Les Fauvettes, Résident",
+    "institutions, EMS Gruyère, Collaborateur",
+]
+
+
+@pytest.fixture
+def index():
+    return TitleIndex(TITLES)
+
+
+def test_empty_query_keeps_order(index):
+    assert index.search("") == [0, 1, 2, 3]
+
+
+def test_accents_and_case_are_ignored(index):
+    assert index.search("GLANE") == [0]
+    assert index.search("resident") == [0, 2]
+
+
+def test_matching_every_word_comes_first(index):
+    assert index.search("résident ems")[0] == 2
+
+
+def test_typos(index):
+    assert index.search("fauvetes")[0] == 2
+    assert index.search("colaborateur")[:2] == [1, 3]
+
+
+def test_filter_by_splitter_value():
+    model = DataSetListModel()
+    splitter_values = [
+        {("district", "Glâne"), ("role", "Résident")},
+        {("district", "Sarine"), ("role", "Collaborateur")},
+        {("role", "Résident")},
+        {("role", "Collaborateur"), ("role", "Résident")},
+    ]
+    model.set_titles(TITLES, [None] * 4, splitter_values)
+    model.set_filter(splitter_value=("role", "Résident"))
+    assert model.rows == [0, 2, 3]
+    model.set_filter(query="districts")
+    assert model.rows == [0]
+    model.set_filter(query="", splitter_value=None)
+    assert model.rows == [0, 1, 2, 3]
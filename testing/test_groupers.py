@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from emsapp.config import GrouperConfig
+from emsapp.data import COUNT_DTYPE, DataReport, DataType, FinalData
+from emsapp.data.groupers import GroupingIndex, StepNameGrouper
+
+
+def final_data(transformer, **splitters):
+    return FinalData(
+        np.arange(3),
+        np.ones(3),
+        DataType.LINE,
+        "description",
+        DataReport(splitters, transformer),
+    )
+
+
+def test_groups_share_data():
+    data = [
+        final_data("new", district="Glâne", role="Résident"),
+        final_data("new", district="Glâne", role="Collaborateur"),
+        final_data("periods", district="Glâne", role="Résident"),
+    ]
+    index = GroupingIndex(data)
+    by_district = StepNameGrouper(
+        GrouperConfig(name="g", splitter=["district"], transformer=["new"])
+    ).group(index)
+    by_role = StepNameGrouper(GrouperConfig(name="h", splitter=["role"])).group(index)
+
+    assert [ds.title for ds in by_district] == ["g, Glâne"]
+    assert [d.label for d in by_district[0]] == ["Résident", "Collaborateur"]
+    assert [ds.title for ds in by_role] == ["h, Résident", "h, Collaborateur"]
+    assert by_role[0].data[1].x is data[2].x
+    with pytest.raises(ValueError):
+        data[0].y[0] = 2
+
+
+def test_index_lookup():
+    data = [
+        final_data("new", district="Glâne", role="Résident"),
+        final_data("periods", district="Glâne", role="Résident"),
+        final_data("new", district="Sarine", role="Résident"),
+        final_data("new", district="Glâne", role="Résident"),
+    ]
+    index = GroupingIndex(data)
+    assert index.lookup("new", (("district", "Glâne"), ("role", "Résident"))) == [0, 3]
+    assert index.lookup("periods", (("district", "Sarine"), ("role", "Résident"))) == []
+    assert len(index.positions) == 3
+    assert index.groups(["new"], ("district",)) == {
+        ("Glâne",): [(0, "Résident"), (3, "Résident")],
+        ("Sarine",): [(2, "Résident")],
+    }
+    by_role = index.groups([], ("role",))
+    assert list(by_role) == [("Résident",)]
+    assert [i for i, _label in by_role[("Résident",)]] == [0, 1, 2, 3]
+
+
+def test_final_data_counts():
+    ints = FinalData(
+        np.arange(2), np.array([1, 2], dtype=object), DataType.LINE, "", DataReport()
+    )
+    floats = FinalData(
+        np.arange(2),
+        np.array([0.5, 2.0], dtype=object),
+        DataType.LINE,
+        "",
+        DataReport(),
+    )
+    assert ints.y.dtype == COUNT_DTYPE
+    assert floats.y.tolist() == [0.5, 2.0]
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5 import sip
+from PyQt5.QtCore import QCoreApplication
+
+from emsapp.widgets.importation import BackgroundTasks, Task
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def process_events_until(app, condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.01)
+    app.processEvents()
+    assert condition()
+
+
+def test_only_the_last_task_of_a_kind_is_kept(app):
+    background = BackgroundTasks()
+    gate = threading.Event()
+    results = []
+    background.run(
+        "file", "", lambda: gate.wait(5) and "old", lambda *r: results.append(r)
+    )
+    background.run("file", "", lambda: "new", lambda *r: results.append(r))
+    background.run("sample", "", lambda: 1 / 0, lambda *r: results.append(r))
+    assert sorted(background.pending) == ["file", "sample"]
+    gate.set()
+    process_events_until(app, lambda: not background.tasks)
+    assert sorted(r for r, e in results if e is None) == ["new"]
+    assert [type(e) for r, e in results if e is not None] == [ZeroDivisionError]
+    assert not background.pending
+
+
+def test_detached_tasks_finish_on_their_own(app):
+    background = BackgroundTasks()
+    gate = threading.Event()
+    results = []
+    background.run("file", "", lambda: gate.wait(5), lambda *r: results.append(r))
+    background.detach_all()
+    assert not background.tasks and not background.pending
+    sip.delete(background)
+    assert len(Task.detached) == 1
+    gate.set()
+    process_events_until(app, lambda: not Task.detached)
+    assert results == []
@@ -0,0 +1,38 @@
+import json
+
+from emsapp.data.instrumentation import RunReport
+
+
+def test_measure_accumulates():
+    report = RunReport()
+    for _i in range(3):
+        with report.measure("transformer", "new", items_in=2) as stats:
+            stats.items_out += 1
+    stats = report.stage("transformer", "new")
+    assert (stats.calls, stats.items_in, stats.items_out) == (3, 6, 3)
+    assert stats.wall >= 0 and stats.peak_memory is None
+
+
+def test_memory_and_json():
+    report = RunReport(trace_memory=True)
+    with report.tracing(), report.measure("loading"):
+        data = [0] * 100_000
+    assert report.stage("loading").peak_memory >= 800_000
+    dumped = json.loads(report.to_json())
+    assert [s["kind"] for s in dumped["stages"]] == ["loading"]
+    assert "loading" in report.summary()
+    del data
+
+
+def test_nested_memory():
+    report = RunReport(trace_memory=True)
+    with report.tracing(), report.measure("filter"):
+        with report.measure("filter", "a"):
+            data = [0] * 100_000
+            del data
+        with report.measure("filter", "b"):
+            pass
+    inner = report.stage("filter", "a").peak_memory
+    assert inner >= 800_000
+    assert report.stage("filter").peak_memory >= inner
+    assert report.stage("filter", "b").peak_memory < inner
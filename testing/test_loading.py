@@ -0,0 +1,240 @@
+import copy
+import dataclasses
+import datetime
+import pickle
+
+import openpyxl
+import pytest
+from openpyxl.worksheet.table import Table
+
+from emsapp.config import Config
+from emsapp.data import INVALID_DATE, MISSING_VALUE, Entry
+from emsapp.data.filters import BEFORE, IN, NOT_IN, Predicate, where_clause
+from emsapp.data.loaders.csv_loader import CsvDataLoader
+from emsapp.data.loaders.excel_loader import ExcelDataLoader
+from emsapp.data.loaders.sqlite_loader import SqliteDataLoader, materialize
+from emsapp.data.loading import RawDataLoader, load_data, load_sample
+from emsapp.data.process import Process
+from emsapp.testing import SyntheticData
+
+
+class ListLoader:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def load_data(self, config):
+        headers = [
+            getattr(config, f"col_{k}")
+            for k in [
+                "date_start",
+                "date_end",
+                "role",
+                "institution",
+                "institution_type",
+                "location",
+            ]
+        ]
+        return headers, self.rows
+
+
+def test_rejections():
+    rows = [
+        ["01.02.2021", "10.02.2021", "Résident", "inst", "EMS", "loc"],
+        ["01.02.2021", "not a date", "Résident", "inst", "EMS", "loc"],
+        ["01.02.2021", "10.02.2021", "", "inst", "EMS", "loc"],
+        ["32.02.2021", "10.02.2021", None, "inst", "EMS", "loc"],
+        [44500, "10.02.2021", "Résident", "inst", "EMS", "loc"],
+        [float("nan"), "10.02.2021", "Résident", float("nan"), "EMS", "loc"],
+    ]
+    entries = load_data(ListLoader(rows), Config.default().snapshot())
+
+    assert len(entries.l) == 2
+    assert entries.l[0] == Entry(
+        datetime.date(2021, 2, 1),
+        datetime.date(2021, 2, 10),
+        "Résident",
+        "inst",
+        "EMS",
+        "loc",
+    )
+    report = entries.rejections
+    assert report.total == 6
+    assert report.rejected == 4
+    assert report.counts == {
+        (MISSING_VALUE, "role"): 2,
+        (MISSING_VALUE, "date_start"): 1,
+        (MISSING_VALUE, "institution"): 1,
+        (INVALID_DATE, "date_end"): 1,
+    }
+    assert report.samples[(MISSING_VALUE, "role")] == [2, 3]
+    assert "3" in report.summary()
+
+
+def test_interned_entries():
+    rows = [
+        ["01.02.2021", "10.02.2021", "Résident", "inst", "EMS", "loc"],
+        ["03.02.2021", "12.02.2021", "".join(["Rési", "dent"]), "inst", "EMS", "loc"],
+    ]
+    first, second = load_data(ListLoader(rows), Config.default().snapshot()).l
+
+    assert first.role is second.role
+    assert not hasattr(first, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        first.role = "Collaborateur"
+
+
+def test_entries_copy_and_pickle():
+    rows = [["01.02.2021", "10.02.2021", "Résident", "inst", "EMS", "loc"]]
+    (entry,) = load_data(ListLoader(rows), Config.default().snapshot()).l
+
+    for clone in [
+        pickle.loads(pickle.dumps(entry)),
+        copy.copy(entry),
+        copy.deepcopy(entry),
+    ]:
+        assert clone == entry
+        assert hash(clone) == hash(entry)
+
+
+def test_access_pushdown_ignores_not_in():
+    access_loader = pytest.importorskip(
+        "emsapp.data.loaders.access_loader", exc_type=ImportError
+    )
+    types = {"role": str, "date": datetime.date, "text_date": str}
+    predicates = [
+        Predicate("role", IN, ("Résident",)),
+        Predicate("role", NOT_IN, ("Collaborateur",)),
+        Predicate("date", BEFORE, datetime.date(2021, 1, 1)),
+        Predicate("text_date", BEFORE, datetime.date(2021, 1, 1)),
+    ]
+    usable = access_loader.AccessDataLoader.usable_predicates(types, predicates)
+    assert usable == [predicates[0], predicates[2]]
+
+
+def test_exclusion_is_case_sensitive():
+    # Access would drop "collaborateur" for this predicate, so it isn't pushed down
+    predicate = Predicate("role", NOT_IN, ("Collaborateur",))
+    assert [
+        predicate.may_match(v) for v in ["Collaborateur", "collaborateur", "Résident"]
+    ] == [False, True, True]
+
+
+def test_pushdown(tmp_path):
+    data = SyntheticData(300)
+    settings = data.settings()
+    loader = ExcelDataLoader(data.write_xlsx(tmp_path / "data.xlsx"))
+    process = Process.from_config(settings)
+    predicates = process.predicates()
+
+    all_entries = load_data(loader, settings)
+    pushed = load_data(loader, settings, predicates)
+
+    assert len(pushed.l) < len(all_entries.l)
+    assert process.filter(pushed).l == process.filter(all_entries).l
+
+
+def test_where_clause():
+    predicates = [
+        Predicate("type", IN, ("EMS", "Foyer")),
+        Predicate("date", BEFORE, (datetime.date(2021, 1, 31),)),
+    ]
+    where, params = where_clause(predicates, lambda c: f"[{c}]")
+
+    assert where == " where [type] in (?, ?) and [date] < ?"
+    assert params == ["EMS", "Foyer", datetime.date(2021, 2, 1)]
+
+
+def test_csv_loader(tmp_path):
+    conf = Config.default().data
+    path = tmp_path / "export.csv"
+    path.write_bytes(
+        (
+            f"id;{conf.col_date_start};{conf.col_date_end};{conf.col_role};"
+            f"{conf.col_institution};{conf.col_institution_type};{conf.col_location}\n"
+            "1;01.02.2021;10.02.2021;Résident;inst;EMS;Avry\n"
+            "2;03.02.2021;not a date;Résident;inst;EMS;Avry\n"
+            "3;04.02.2021;12.02.2021;Collaborateur;inst;Foyer;Bulle\n"
+        ).encode("cp1252")
+    )
+    loader = CsvDataLoader(path)
+
+    assert loader.encoding == "cp1252"
+    assert loader.tables(conf) == ["export"]
+    assert loader.headers(conf)[0] == "id"
+    entries = load_data(loader, Config.default().snapshot())
+    assert [e.location for e in entries.l] == ["Avry", "Bulle"]
+    assert entries.l[1].date_start == datetime.date(2021, 2, 4)
+    assert entries.rejections.counts == {(INVALID_DATE, "date_end"): 1}
+
+
+def test_arrow_loader(tmp_path):
+    pytest.importorskip("pyarrow")
+    from emsapp.data.loaders.arrow_loader import ArrowDataLoader, write_table
+
+    data = SyntheticData(300)
+    settings = data.settings()
+    path = write_table(
+        tmp_path / "data.parquet",
+        data.headers,
+        data.rows,
+        sort_by=settings.data.col_date_start,
+        row_group_size=50,
+    )
+    loader = ArrowDataLoader(path)
+    process = Process.from_config(settings)
+
+    all_entries = load_data(loader, settings)
+    # rows are sorted by date in the file
+    key = dataclasses.astuple
+    expected = load_data(data.loader(), settings).l
+    assert sorted(all_entries.l, key=key) == sorted(expected, key=key)
+
+    pushed = load_data(loader, settings, process.predicates())
+    assert len(pushed.l) < len(all_entries.l)
+    assert process.filter(pushed).l == process.filter(all_entries).l
+
+
+def test_sqlite_loader(tmp_path):
+    data = SyntheticData(300)
+    settings = data.settings()
+    path = materialize(tmp_path / "data.sqlite", data.loader(), settings)
+    loader = SqliteDataLoader(path)
+    process = Process.from_config(settings)
+
+    all_entries = load_data(loader, settings)
+    assert all_entries.l == load_data(data.loader(), settings).l
+
+    pushed = load_data(loader, settings, process.predicates())
+    assert len(pushed.l) < len(all_entries.l)
+    assert process.filter(pushed).l == process.filter(all_entries).l
+
+
+def test_excel_tables(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.create_sheet("Data")
+    for row in [["a", "b"], [1, 2], [3, 4], ["total", 6]]:
+        ws.append([None] + row)
+    ws.append([None, "outside the table"])
+    ws.add_table(Table(displayName="values", ref="B1:C4", totalsRowCount=1))
+    wb.save(tmp_path / "tables.xlsx")
+
+    loader = ExcelDataLoader(tmp_path / "tables.xlsx")
+    config = Config.default().data.copy(update=dict(table_name="values"))
+    assert loader.tables(config) == ["values"]
+    assert loader.headers(config) == ["a", "b"]
+    assert loader.load_data(config) == (["a", "b"], [[1, 2], [3, 4]])
+
+
+def test_load_sample(tmp_path):
+    data = SyntheticData(300)
+    settings = data.settings()
+    csv_loader = CsvDataLoader(data.write_csv(tmp_path / "data.csv"))
+    sqlite_loader = SqliteDataLoader(
+        materialize(tmp_path / "data.sqlite", data.loader(), settings)
+    )
+    expected = load_data(data.loader(), settings).l[:20]
+
+    for loader in (csv_loader, sqlite_loader, data.loader()):
+        sample = load_sample(loader, settings.data, 20)
+        assert len(sample.rows) == 20
+        assert load_data(RawDataLoader(sample), settings).l == expected
@@ -0,0 +1,43 @@
+import logging
+
+from emsapp.utils import LOG_FORMAT, LogFormatter, RepeatFilter
+from emsapp.widgets.log_viewer import LogTail
+
+
+def make_record(msg="invalid entry : %s", created=0.0, level=logging.WARNING):
+    record = logging.LogRecord("emsapp", level, __file__, 1, msg, (1,), None)
+    record.created = created
+    return record
+
+
+def test_repeat_filter():
+    flt = RepeatFilter(burst=2, period=10)
+    assert [flt.filter(make_record(created=t)) for t in range(4)] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert flt.filter(make_record(level=logging.ERROR))
+    assert flt.filter(make_record("something else"))
+
+    later = make_record(created=20)
+    assert flt.filter(later)
+    assert later.getMessage() == "invalid entry : 1"
+    assert (
+        LogFormatter(LOG_FORMAT)
+        .format(later)
+        .endswith("invalid entry : 1 (+2 similar messages dropped)")
+    )
+
+
+def test_log_tail(tmp_path):
+    path = tmp_path / "test.log"
+    path.write_text("first line\nsecond line\nthird", encoding="utf-8")
+    tail = LogTail(path, tail_bytes=20)
+    assert tail.read() == "second line\n"
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(" line\n")
+    assert tail.read() == "third line\n"
+    path.write_text("rotated\n", encoding="utf-8")
+    assert tail.read() == "rotated\n"
@@ -0,0 +1,24 @@
+import pytest
+
+from emsapp.plugin import PluginLoadError, PluginRegistry
+
+
+def test_failed_import_keeps_reference():
+    registry = PluginRegistry()
+    registry.register_lazy("data_loader", ".broken", "emsapp.not_a_module:Loader")
+    for _ in range(2):
+        with pytest.raises(PluginLoadError, match="not_a_module"):
+            registry.get("data_loader", ".broken")
+    assert ".broken" in registry.names("data_loader")
+    assert ("data_loader", ".broken") in registry
+
+
+def test_lazy_import():
+    registry = PluginRegistry()
+    registry.register_lazy(
+        "data_loader", ".csv", "emsapp.data.loaders.csv_loader:CsvDataLoader"
+    )
+    from emsapp.data.loaders.csv_loader import CsvDataLoader
+
+    assert registry.get("data_loader", ".csv") is CsvDataLoader
+    assert registry.names("data_loader") == [".csv"]
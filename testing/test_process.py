@@ -0,0 +1,61 @@
+import dataclasses
+
+from emsapp.config import FilterConfig, ProcessConfig
+from emsapp.data.instrumentation import RunReport
+from emsapp.data.loaders.sqlite_loader import materialize
+from emsapp.data.loading import load_data
+from emsapp.data.process import Process, ProcessGraph
+from emsapp.data.sql_backend import SqlBackend
+from emsapp.testing import SyntheticData
+
+
+def describe(data_sets):
+    return [
+        (ds.title, ds.grouper, [(d.label, d.x.tolist(), d.y.tolist()) for d in ds])
+        for ds in data_sets
+    ]
+
+
+def test_graph_shares_stages():
+    data = SyntheticData(2000)
+    settings = data.settings()
+    entries = load_data(data.loader(), settings)
+    default = ProcessConfig.default()
+    staff_only = dataclasses.replace(
+        default,
+        name="staff",
+        filters={
+            # same filters as the default process, in another order
+            **dict(reversed(default.filters.items())),
+            "staff": FilterConfig("staff", "include", "role", value="Collaborateur"),
+        },
+    )
+    districts = dataclasses.replace(
+        default,
+        name="districts",
+        groupers={k: v for k, v in default.groupers.items() if k == "districts"},
+    )
+
+    graph = ProcessGraph.from_config(settings, [default, staff_only, districts])
+    report = RunReport()
+    out = graph(entries, report)
+
+    for conf in (default, staff_only, districts):
+        expected = Process.from_config(settings, conf)(entries)
+        assert describe(out[conf.name]) == describe(expected)
+    # ems_only, ems_only + no_other_staff, no_other_staff, all three
+    assert report.stage("filter").calls == 4
+    assert report.stage("transformer").calls == 2 * len(default.transformers)
+    assert report.stage("grouper").calls == 2 * len(default.groupers)
+
+
+def test_sql_backend(tmp_path):
+    data = SyntheticData(2000)
+    settings = data.settings()
+    path = materialize(tmp_path / "data.sqlite", data.loader(), settings)
+    expected = Process.from_config(settings)(load_data(data.loader(), settings))
+
+    process = Process.from_config(settings)
+    backend = SqlBackend(path)
+    assert backend.supports(process)
+    assert describe(backend(process)) == describe(expected)
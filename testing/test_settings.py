@@ -0,0 +1,42 @@
+import dataclasses
+import datetime
+
+import pytest
+
+from emsapp.config import Config
+from emsapp.data import parse_date
+
+
+@pytest.fixture
+def settings():
+    return Config().snapshot()
+
+
+def test_snapshot_is_immutable(settings):
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.lims = None
+    with pytest.raises(TypeError):
+        settings.districts["somewhere"] = "Sarine"
+    with pytest.raises(TypeError):
+        settings.data.db_path = "elsewhere.xlsx"
+
+
+def test_snapshot_is_detached_from_config():
+    config = Config().copy(deep=True)
+    settings = config.snapshot()
+    old_db_path = config.data.db_path
+    config.data.db_path = "elsewhere.xlsx"
+    config.data.date_formats.append("%Y")
+    assert settings.data.db_path == old_db_path
+    assert "%Y" not in settings.data.date_formats
+
+
+def test_parse_date(settings):
+    assert parse_date(44197, settings) == datetime.date(2021, 1, 1)
+    assert parse_date("2021-03-04", settings) == datetime.date(2021, 3, 4)
+    settings = dataclasses.replace(settings, date_formats=("%d.%m.%Y",))
+    assert parse_date(" 04.03.2021", settings) == datetime.date(2021, 3, 4)
+    with pytest.raises(ValueError):
+        parse_date("04/03/2021", settings)
+    with pytest.raises(ValueError):
+        parse_date(12, settings)
@@ -0,0 +1,75 @@
+"""
+Modules imported before the main window is shown and startup time budget,
+measured with `python -X importtime`. The budget is only checked when
+EMSAPP_STARTUP_BUDGET_MS is set, e.g. `EMSAPP_STARTUP_BUDGET_MS=600 pytest`.
+
+Run this file directly to print the slowest imports :
+    python testing/test_startup.py
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+# everything needed to show the main window, in milliseconds. Only checked when
+# set, as the time depends on the machine and the disk cache
+STARTUP_BUDGET_MS = os.environ.get("EMSAPP_STARTUP_BUDGET_MS")
+GUI_MODULE = "emsapp.widgets.main_window"
+DEFERRED_MODULES = [
+    "matplotlib",
+    "pyarrow",
+    "pyodbc",
+    "openpyxl",
+    "pkg_resources",
+    "emsapp.plotting",
+    "emsapp.data.loaders",
+]
+
+IMPORT_TIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_times(module: str) -> dict[str, int]:
+    """imports module in a fresh interpreter and returns the cumulative import
+    time of every module that got imported, in microseconds"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def test_heavy_modules_are_deferred():
+    imported = import_times(GUI_MODULE)
+    for heavy in DEFERRED_MODULES:
+        assert not [
+            name for name in imported if name == heavy or name.startswith(heavy + ".")
+        ], f"{heavy} must not be imported before the main window is shown"
+
+
+@pytest.mark.skipif(
+    not STARTUP_BUDGET_MS, reason="set EMSAPP_STARTUP_BUDGET_MS to check the budget"
+)
+def test_startup_budget():
+    # best of three, the first run may include compiling the bytecode
+    best = min(import_times(GUI_MODULE)[GUI_MODULE] for _ in range(3)) / 1000
+    assert best < float(STARTUP_BUDGET_MS), f"startup took {best:.0f}ms"
+
+
+if __name__ == "__main__":
+    times = import_times(GUI_MODULE)
+    for name, t in sorted(times.items(), key=lambda el: -el[1])[:20]:
+        print(f"{t / 1000:8.1f}ms  {name}")
@@ -0,0 +1,47 @@
+import datetime
+from datetime import timedelta
+
+import numpy as np
+
+from emsapp.config import TransformerConfig
+from emsapp.data import COUNT_DTYPE, DATE_DTYPE, Entries, Entry
+from emsapp.data.transformers import CumulativeTransformer, find_periods
+
+
+def test_find_periods():
+    starts = np.array(
+        ["2021-01-01", "2021-01-05", "2021-01-20", "2021-01-29", "2021-03-01"],
+        dtype="datetime64[D]",
+    )
+    periods = find_periods(starts, [9, 20])
+
+    short = periods[9]
+    assert short.start.tolist() == starts[[0, 2, 4]].tolist()
+    assert short.end.tolist() == (starts[[1, 3, 4]] + np.timedelta64(9, "D")).tolist()
+    assert short.count.tolist() == [2, 2, 1]
+
+    long = periods[20]
+    assert long.count.tolist() == [4, 1]
+
+
+def test_find_periods_empty():
+    periods = find_periods(np.array([], dtype="datetime64[D]"))
+    assert all(len(arr) == 0 for window in periods.values() for arr in window)
+
+
+def test_cumulative():
+    today = datetime.date.today()
+    entries = Entries(
+        [
+            Entry(today - timedelta(5), today - timedelta(3), "r", "i", "EMS", "l"),
+            Entry(today - timedelta(4), today - timedelta(4), "r", "i", "EMS", "l"),
+        ]
+    )
+    data = CumulativeTransformer(TransformerConfig(name="c", type="cumulative"))(
+        entries
+    )
+
+    assert data.x.dtype == DATE_DTYPE and data.y.dtype == COUNT_DTYPE
+    assert data.x[0] == np.datetime64(today - timedelta(6))
+    assert data.x[-1] == np.datetime64(today + timedelta(1))
+    assert data.y.tolist() == [0, 1, 2, 1, 0, 0, 0, 0]